@@ -0,0 +1,17 @@
+import os
+
+import django
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'omdb_project.settings')
+django.setup()
+
+
+def create_test_database(name=None):
+    """
+    Create migrated test database, so benchmarks don't touch development data.
+    :param name: Name of test database, SQLite test database is kept in memory by default.
+    """
+    from django.db import connection
+    if name is not None:
+        connection.settings_dict['TEST']['NAME'] = name
+    connection.creation.create_test_db(verbosity=0)
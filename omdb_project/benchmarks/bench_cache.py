@@ -0,0 +1,46 @@
+"""
+Compare reading cached search result of many movies from database cache and from tiered cache.
+Run in ./omdb_project/ directory:
+    python -m benchmarks.bench_cache
+"""
+import argparse
+import time
+
+from django.core.cache import caches
+
+from benchmarks import create_test_database
+from core.search_result import SearchResult
+
+
+def search_result(movies_count):
+    movies = [{'Title': f'Bird {number}', 'Year': '2000', 'imdbID': f'tt{number:07d}', 'Type': 'movie',
+               'Poster': f'https://m.media-amazon.com/images/M/{number:040d}@._V1_SX300.jpg',
+               'Genre': ['Drama', 'Comedy']}
+              for number in range(movies_count)]
+    return SearchResult(movies)
+
+
+def measure(cache, repeat):
+    cache.get('search:bird')
+    start = time.perf_counter()
+    for _ in range(repeat):
+        cache.get('search:bird')
+    return (time.perf_counter() - start) / repeat
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--movies', type=int, default=716)
+    parser.add_argument('--repeat', type=int, default=1000)
+    args = parser.parse_args()
+    create_test_database()
+
+    caches['default'].set('search:bird', search_result(args.movies))
+    print(f'Search result of {args.movies} movies')
+    print(f'shared (database) cache: {measure(caches["shared"], args.repeat) * 1e6:10.1f} us per hit')
+    print(f'tiered cache:            {measure(caches["default"], args.repeat) * 1e6:10.1f} us per hit')
+    print(caches['default'].get_stats())
+
+
+if __name__ == '__main__':
+    main()
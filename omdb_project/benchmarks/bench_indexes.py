@@ -0,0 +1,106 @@
+"""
+Compare query plans and times of movie_id lookups of reviews and favourite movies
+without indexes added by core migration 0003 and with them. Tables are seeded with generated rows.
+Run in ./omdb_project/ directory:
+    python -m benchmarks.bench_indexes [--reviews 1000000]
+"""
+import argparse
+import time
+
+from django.contrib.auth import get_user_model
+from django.db import connection, models
+
+from benchmarks import create_test_database
+from core.models import FavouriteMovie, MovieToWatch, Review
+
+MOVIES_PER_USER = 20
+
+
+def seed(reviews, favourites, movies):
+    """Insert rows by raw SQL, every user reviews and likes different movies from the same range"""
+    user_count = reviews // MOVIES_PER_USER + 1
+    get_user_model().objects.bulk_create(get_user_model()(username=f'user{number}', password='!')
+                                         for number in range(user_count))
+    user_ids = list(get_user_model().objects.values_list('id', flat=True))
+
+    def rows(count, columns):
+        for number in range(count):
+            user_number, position = divmod(number, MOVIES_PER_USER)
+            movie_id = f'tt{(user_number * 7919 + position) % movies:07d}'
+            yield (user_ids[user_number], movie_id, *columns(number))
+
+    with connection.cursor() as cursor:
+        cursor.executemany(f'INSERT INTO {Review._meta.db_table} (user_id, movie_id, rating, review) '
+                           f'VALUES (%s, %s, %s, %s)',
+                           rows(reviews, lambda number: (number % 10 + 1, 'Review text')))
+        cursor.executemany(f'INSERT INTO {FavouriteMovie._meta.db_table} (user_id, movie_id) VALUES (%s, %s)',
+                           rows(favourites, lambda number: ()))
+
+
+def querysets(movie_id, user_id):
+    return {
+        'reviews of movie': Review.objects.filter(movie_id=movie_id).order_by('id')[:10],
+        'rating of movie': Review.objects.filter(movie_id=movie_id).values('movie_id').annotate(models.Avg('rating')),
+        'fans of movie': FavouriteMovie.objects.filter(movie_id=movie_id).values_list('user_id'),
+        'reviews of user': Review.objects.filter(user_id=user_id).order_by('movie_id')[:10],
+    }
+
+
+def measure(movie_ids, user_id, repeat):
+    for name, queryset in querysets(movie_ids[0], user_id).items():
+        start = time.perf_counter()
+        for number in range(repeat):
+            list(querysets(movie_ids[number % len(movie_ids)], user_id)[name])
+        print(f'  {name:<17} {(time.perf_counter() - start) / repeat * 1000:9.3f} ms')
+        print('    ' + queryset.explain().replace('\n', '\n    '))
+
+
+def set_indexes(new):
+    """Create indexes of migration 0003 and drop index of user foreign key when `new`, otherwise reverse it"""
+    with connection.schema_editor() as schema_editor:
+        for model in (FavouriteMovie, MovieToWatch, Review):
+            user_index = models.Index(fields=['user'], name=f'{model._meta.db_table}_user_idx')
+            for index in model._meta.indexes:
+                if new:
+                    schema_editor.add_index(model, index)
+                else:
+                    schema_editor.remove_index(model, index)
+            if new:
+                schema_editor.remove_index(model, user_index)
+            else:
+                schema_editor.add_index(model, user_index)
+    with connection.cursor() as cursor:
+        cursor.execute('ANALYZE')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--reviews', type=int, default=1000000)
+    parser.add_argument('--favourites', type=int, default=200000)
+    parser.add_argument('--movies', type=int, default=50000, help='Number of different reviewed movies')
+    parser.add_argument('--repeat', type=int, default=100)
+    args = parser.parse_args()
+    create_test_database()
+
+    # Rows are inserted faster without indexes on movie_id
+    set_indexes(new=False)
+    start = time.perf_counter()
+    seed(args.reviews, args.favourites, args.movies)
+    print(f'Seeded {args.reviews} reviews and {args.favourites} favourite movies '
+          f'in {time.perf_counter() - start:.1f} s')
+    movie_ids = [f'tt{number:07d}' for number in range(0, args.movies, args.movies // 20)]
+    user_id = get_user_model().objects.values_list('id', flat=True).first()
+
+    print(f'Before migration 0003, {connection.vendor}')
+    with connection.cursor() as cursor:
+        cursor.execute('ANALYZE')
+    measure(movie_ids, user_id, args.repeat)
+
+    start = time.perf_counter()
+    set_indexes(new=True)
+    print(f'After migration 0003, indexes created in {time.perf_counter() - start:.1f} s')
+    measure(movie_ids, user_id, args.repeat)
+
+
+if __name__ == '__main__':
+    main()
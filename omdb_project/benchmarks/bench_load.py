@@ -0,0 +1,179 @@
+"""
+Load test of API endpoints with local fake OMDb server. Requests are sent by Django test client
+from many threads, every thread uses token of other user. For every scenario latency percentiles,
+throughput, number of requests sent to OMDb and failed responses by status and message are reported.
+Test database is SQLite file, it allows one write at a time. Writers wait for each other only when their
+transaction starts with write, transaction which reads before writing fails at once with "database is locked"
+while other one writes, such failures are listed in the report. Requests to OMDb are limited by rate limit
+and circuit breaker of settings, unless --without-throttling is given.
+Run in ./omdb_project/ directory:
+    python -m benchmarks.bench_load [--concurrency 1 8] [--requests 200] [--scenarios search review-add]
+"""
+from collections import Counter
+import argparse
+import itertools
+import os
+import re
+import statistics
+import tempfile
+import threading
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import Client
+from django.test.utils import setup_test_environment
+from rest_framework.authtoken.models import Token
+
+from benchmarks import create_test_database
+from core.models import FavouriteMovie, MovieDetail, MovieToWatch, Review
+from core.omdb import Omdb_API
+from core.throttling import clear as clear_throttling
+from core.tests.fake_omdb_server import GENRES, FakeOmdbServer
+
+PASSWORD = 'password'
+ERROR_MESSAGE_LENGTH = 120
+
+
+def search(client, title_count):
+    def request(number):
+        return client.get('/api/movie/', {'title': f'Title {number % title_count}', 'genre': GENRES[number % 4]})
+    return request
+
+
+def search_page(client, title_count):
+    def request(number):
+        return client.get('/api/movie/', {'title': f'Title {number % title_count}', 'page': number % 3 + 1})
+    return request
+
+
+def add(path):
+    def scenario(client, title_count):
+        return lambda number: client.post(path, {'movie_id': f'tt{number:07d}'})
+    return scenario
+
+
+def add_review(client, title_count):
+    return lambda number: client.post('/api/movie/review/', {'movie_id': f'tt{number:07d}', 'rating': number % 10 + 1})
+
+
+def get(path):
+    def scenario(client, title_count):
+        return lambda number: client.get(path)
+    return scenario
+
+
+def token(client, title_count):
+    # Anonymous client, it logs in as user of the thread
+    anonymous = Client()
+    return lambda number: anonymous.post('/api/user/token/', {'username': client.username, 'password': PASSWORD})
+
+
+SCENARIOS = {
+    'search': search,
+    'search-page': search_page,
+    'favourite-add': add('/api/movie/favourite/'),
+    'favourite-list': get('/api/movie/favourite/'),
+    'to-watch-add': add('/api/movie/to-watch/'),
+    'to-watch-list': get('/api/movie/to-watch/'),
+    'review-add': add_review,
+    'review-list': get('/api/movie/review/'),
+    'token': token,
+}
+
+
+def create_clients(count):
+    clients = []
+    for number in range(count):
+        user = get_user_model().objects.create_user(username=f'load{number}', password=PASSWORD)
+        token_key = Token.objects.create(user=user).key
+        client = Client(HTTP_AUTHORIZATION=f'Token {token_key}')
+        client.username = user.username
+        clients.append(client)
+    return clients
+
+
+def run(scenario, clients, requests, title_count):
+    """
+    Send `requests` requests of scenario by thread per client, return latencies, Counter of failed responses
+    by status and message and seconds
+    """
+    numbers = itertools.count()
+    latencies = []
+    errors = Counter()
+
+    def send_requests(client):
+        request = scenario(client, title_count)
+        while True:
+            number = next(numbers)
+            if number >= requests:
+                return
+            start = time.perf_counter()
+            response = request(number)
+            latencies.append(time.perf_counter() - start)
+            if response.status_code >= 400:
+                errors[response.status_code, error_message(response)] += 1
+
+    threads = [threading.Thread(target=send_requests, args=(client,)) for client in clients]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return latencies, errors, time.perf_counter() - start
+
+
+def error_message(response):
+    """Return beginning of response content, imdbIDs are masked, so errors of different movies are counted together"""
+    message = re.sub(r'tt\d+', 'tt*', response.content.decode(errors='replace'))
+    return message if len(message) <= ERROR_MESSAGE_LENGTH else message[:ERROR_MESSAGE_LENGTH] + '...'
+
+
+def report(name, concurrency, latencies, errors, seconds, omdb_calls):
+    percentiles = statistics.quantiles(latencies, n=100) if len(latencies) > 1 else latencies * 99
+    print(f'{name:<15} {concurrency:3} threads {len(latencies) / seconds:8.1f} req/s'
+          f'  p50 {percentiles[49] * 1000:7.1f} ms  p95 {percentiles[94] * 1000:7.1f} ms'
+          f'  p99 {percentiles[98] * 1000:7.1f} ms  errors {sum(errors.values()):4}  OMDb calls {omdb_calls:5}')
+    for (status_code, message), count in errors.most_common():
+        print(f'    {count:4} x {status_code} {message}')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--scenarios', nargs='+', choices=SCENARIOS, default=list(SCENARIOS))
+    parser.add_argument('--concurrency', type=int, nargs='+', default=[1, 8])
+    parser.add_argument('--requests', type=int, default=200, help='Number of requests of every scenario')
+    parser.add_argument('--titles', type=int, default=20, help='Number of titles in fake OMDb catalogue')
+    parser.add_argument('--results', type=int, default=25, help='Number of movies found for every title')
+    parser.add_argument('--latency', type=float, default=0.05, help='Latency of fake OMDb in seconds')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='Part of OMDb requests which fail')
+    parser.add_argument('--without-throttling', action='store_true', help='Disable rate limit and circuit breaker')
+    args = parser.parse_args()
+
+    setup_test_environment()
+    with tempfile.TemporaryDirectory() as directory:
+        # Database in file, it's locked by writes like in production, unlike database in memory
+        create_test_database(os.path.join(directory, 'bench_load.sqlite3'))
+        all_clients = create_clients(max(args.concurrency))
+        catalogue = {f'Title {number}': args.results for number in range(args.titles)}
+        with FakeOmdbServer(latency=args.latency, error_rate=args.error_rate, catalogue=catalogue) as server:
+            Omdb_API.OMDB_URL = server.url
+            if args.without_throttling:
+                Omdb_API.RATE_LIMIT = Omdb_API.CIRCUIT_FAILURE_THRESHOLD = None
+            print(f'{args.requests} requests per scenario, {args.titles} titles of {args.results} movies, '
+                  f'{args.latency * 1000:.0f} ms OMDb latency, {args.error_rate:.0%} OMDb errors')
+            for concurrency in args.concurrency:
+                # Every concurrency level starts with empty search cache, movie details and lists
+                cache.clear()
+                clear_throttling()
+                for model in (MovieDetail, FavouriteMovie, MovieToWatch, Review):
+                    model.objects.all().delete()
+                for name in args.scenarios:
+                    calls_before = len(server.calls)
+                    latencies, errors, seconds = run(SCENARIOS[name], all_clients[:concurrency], args.requests,
+                                                     args.titles)
+                    report(name, concurrency, latencies, errors, seconds, len(server.calls) - calls_before)
+
+
+if __name__ == '__main__':
+    main()
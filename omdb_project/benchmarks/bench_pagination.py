@@ -0,0 +1,71 @@
+"""
+Compare reading pages of review list with page number pagination (OFFSET and COUNT queries)
+and with cursor pagination used by ReviewViewSet, for pages at the start, middle and end of the list.
+Run in ./omdb_project/ directory:
+    python -m benchmarks.bench_pagination [--reviews 1000000]
+"""
+from urllib import parse
+import argparse
+import time
+
+from rest_framework.pagination import Cursor
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+
+from benchmarks import create_test_database
+from benchmarks.bench_indexes import seed
+from core.models import Review
+from core.pagination import DefaultPagination, ReviewCursorPagination
+from movies.serializers import ReviewSerializer
+
+PAGE_SIZE = 50
+
+
+def read_page(paginator, query_params):
+    request = Request(APIRequestFactory().get('/api/movie/review/', query_params, SERVER_NAME='localhost'))
+    page = paginator.paginate_queryset(Review.objects.order_by('id'), request)
+    return paginator.get_paginated_response(ReviewSerializer(page, many=True).data)
+
+
+def page_number_params(position):
+    return {'page': position // PAGE_SIZE + 1, 'page_size': PAGE_SIZE}
+
+
+def cursor_params(position):
+    """Return parameters of cursor pointing to review at position, like 'next' link of previous page"""
+    params = {'page_size': PAGE_SIZE}
+    if position:
+        last_id = Review.objects.order_by('id').values_list('id', flat=True)[position - 1]
+        paginator = ReviewCursorPagination()
+        paginator.base_url = '/'
+        next_url = paginator.encode_cursor(Cursor(offset=0, reverse=False, position=str(last_id)))
+        params.update(parse.parse_qsl(parse.urlsplit(next_url).query))
+    return params
+
+
+def measure(paginator_class, params, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        read_page(paginator_class(), params)
+    return (time.perf_counter() - start) / repeat
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--reviews', type=int, default=1000000)
+    parser.add_argument('--movies', type=int, default=50000, help='Number of different reviewed movies')
+    parser.add_argument('--repeat', type=int, default=20)
+    args = parser.parse_args()
+    create_test_database()
+    seed(args.reviews, 0, args.movies)
+
+    print(f'{args.reviews} reviews, {PAGE_SIZE} reviews per page')
+    for position in (0, args.reviews // 2, args.reviews - PAGE_SIZE):
+        page_number = measure(DefaultPagination, page_number_params(position), args.repeat)
+        cursor = measure(ReviewCursorPagination, cursor_params(position), args.repeat)
+        print(f'page starting at review {position:8}: page number {page_number * 1000:8.2f} ms, '
+              f'cursor {cursor * 1000:8.2f} ms')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,55 @@
+"""
+Compare fetching search pages one by one with concurrent fetching, using local fake OMDb server.
+With --with-genres whole search is measured, including fetching details of every movie.
+Requests are limited by rate limit and circuit breaker of settings, unless --without-throttling is given.
+Run in ./omdb_project/ directory:
+    python -m benchmarks.bench_search_pages [--with-genres] [--without-throttling]
+"""
+import argparse
+import time
+
+from benchmarks import create_test_database
+from core.models import MovieDetail
+from core.omdb import Omdb_API
+from core.throttling import clear as clear_throttling
+from core.tests.fake_omdb_server import FakeOmdbServer
+
+
+def measure(url, concurrency, repeat, with_genres, throttling):
+    api = Omdb_API()
+    api.OMDB_URL = url
+    api.MAX_CONCURRENCY = concurrency
+    if not throttling:
+        api.rate_limiter = api.circuit_breaker = None
+    seconds = 0
+    for _ in range(repeat):
+        MovieDetail.objects.all().delete()
+        # Every search starts with full bucket
+        clear_throttling()
+        start = time.perf_counter()
+        movies = api.search_movies('bird') if with_genres else api._get_movies_list('bird')
+        seconds += time.perf_counter() - start
+    return seconds / repeat, len(movies)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--results', type=int, default=716, help='Number of movies found by search')
+    parser.add_argument('--latency', type=float, default=0.05, help='Latency of fake OMDb in seconds')
+    parser.add_argument('--concurrency', type=int, nargs='+', default=[1, 4, 10, 20])
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--with-genres', action='store_true', help='Measure search_movies instead of paging only')
+    parser.add_argument('--without-throttling', action='store_true', help='Disable rate limit and circuit breaker')
+    args = parser.parse_args()
+    create_test_database()
+
+    with FakeOmdbServer(results=args.results, latency=args.latency) as server:
+        print(f'{args.results} results, {args.latency * 1000:.0f} ms latency')
+        for concurrency in args.concurrency:
+            seconds, count = measure(server.url, concurrency, args.repeat, args.with_genres,
+                                     not args.without_throttling)
+            print(f'concurrency {concurrency:>3}: {seconds * 1000:8.1f} ms per search ({count} movies)')
+
+
+if __name__ == '__main__':
+    main()
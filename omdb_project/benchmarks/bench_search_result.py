@@ -0,0 +1,68 @@
+"""
+Compare size and decode time of cached search result stored as pickled dict of movies and genres
+and as SearchResult in compact encoding. DatabaseCache stores pickles encoded in base64,
+time of reading movies from it is measured too.
+Run in ./omdb_project/ directory:
+    python -m benchmarks.bench_search_result
+"""
+import argparse
+import base64
+import pickle
+import time
+
+from django.core.cache import caches
+
+from benchmarks import create_test_database
+from benchmarks.bench_cache import search_result
+from core.search_result import genre_index
+
+
+def all_movies(result):
+    return result['movies'] if isinstance(result, dict) else result.movies
+
+
+def first_page(result):
+    return result['movies'][:10] if isinstance(result, dict) else result[:10]
+
+
+def measure_decode(data, read, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        read(pickle.loads(data))
+    return (time.perf_counter() - start) / repeat
+
+
+def measure_database_cache(value, read, repeat):
+    cache = caches['shared']
+    cache.set('search:bird', value)
+    start = time.perf_counter()
+    for _ in range(repeat):
+        read(cache.get('search:bird'))
+    return (time.perf_counter() - start) / repeat
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--movies', type=int, nargs='+', default=[10, 100, 716])
+    parser.add_argument('--repeat', type=int, default=200)
+    args = parser.parse_args()
+    create_test_database()
+
+    for movies_count in args.movies:
+        result = search_result(movies_count)
+        values = {
+            'pickled dict': {'movies': result.movies, 'genres': genre_index(result.movies)},
+            'SearchResult': result,
+        }
+        print(f'{movies_count} movies')
+        for name, value in values.items():
+            data = pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+            print(f'  {name:<13} {len(data):7} B, {len(base64.b64encode(data)):7} B in base64, decode all '
+                  f'{measure_decode(data, all_movies, args.repeat) * 1e6:7.1f} us, first page '
+                  f'{measure_decode(data, first_page, args.repeat) * 1e6:7.1f} us, database cache hit all '
+                  f'{measure_database_cache(value, all_movies, args.repeat) * 1e6:7.1f} us, first page '
+                  f'{measure_database_cache(value, first_page, args.repeat) * 1e6:7.1f} us')
+
+
+if __name__ == '__main__':
+    main()
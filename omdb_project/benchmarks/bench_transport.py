@@ -0,0 +1,43 @@
+"""
+Compare requests per second sent to local fake OMDb server with new connection for every request
+and with pooled keep-alive connections.
+Run in ./omdb_project/ directory:
+    python -m benchmarks.bench_transport
+"""
+import argparse
+import time
+
+from core.omdb import Omdb_API
+from core.tests.fake_omdb_server import FakeOmdbServer
+from core.transport import PooledTransport
+
+
+def measure(url, transport, concurrency, requests):
+    api = Omdb_API()
+    api.OMDB_URL = url
+    api.MAX_CONCURRENCY = concurrency
+    # Only OMDb requests are measured, they aren't throttled
+    api.rate_limiter = api.circuit_breaker = None
+    api.transport = transport
+    start = time.perf_counter()
+    api._run_concurrently(lambda number: api._run_query({'i': f'tt{number:07d}'}), range(requests))
+    return requests / (time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--requests', type=int, default=2000)
+    parser.add_argument('--concurrency', type=int, nargs='+', default=[1, 10])
+    args = parser.parse_args()
+
+    with FakeOmdbServer() as server:
+        for concurrency in args.concurrency:
+            pooled = PooledTransport(pool_size=concurrency)
+            urllib_rate = measure(server.url, None, concurrency, args.requests)
+            pooled_rate = measure(server.url, pooled, concurrency, args.requests)
+            pooled.close()
+            print(f'concurrency {concurrency:>3}: urllib {urllib_rate:8.0f} req/s, pooled {pooled_rate:8.0f} req/s')
+
+
+if __name__ == '__main__':
+    main()
@@ -3,6 +3,14 @@ from django.contrib import admin
 from core import models
 # Register your models here.
 
-admin.site.register(models.FavouriteMovie)
-admin.site.register(models.MovieToWatch)
-admin.site.register(models.Review)
+
+class UserMovieAdmin(admin.ModelAdmin):
+    # Users are shown by __str__ of every row
+    list_select_related = ['user']
+
+
+admin.site.register(models.FavouriteMovie, UserMovieAdmin)
+admin.site.register(models.MovieToWatch, UserMovieAdmin)
+admin.site.register(models.Review, UserMovieAdmin)
+admin.site.register(models.MovieDetail)
+admin.site.register(models.MovieRatingStats)
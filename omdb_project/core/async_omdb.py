@@ -0,0 +1,172 @@
+from urllib import parse
+import asyncio
+import json
+import time
+
+from asgiref.sync import sync_to_async
+
+from core import timing
+from core.omdb import Omdb_API
+from core.transport import get_async_transport
+
+
+class AsyncOmdb_API(Omdb_API):
+    """
+    Omdb_API running requests on asyncio event loop, so one thread can wait for many searches.
+    Search methods are coroutines and iter_movies is asynchronous generator, parsing and filtering are shared
+    with Omdb_API.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self.transport = get_async_transport()
+
+    async def search_movies(self, title, genre=None):
+        """
+        :param title: Movie title to search for.
+        :param genre: The genre of movies that should be returned.
+        :return: List of searched movies
+        """
+        movies = await sync_to_async(self._search_catalogue)(title)
+        if movies is None:
+            movies = await self._get_movies_list(title)
+            await self._add_genre_data_to_movies(movies)
+        if genre:
+            return self._filter_movies_by_genre(movies, genre)
+        return movies
+
+    async def search_movies_page(self, title, offset, limit):
+        """
+        Return part of search results, only OMDb pages containing requested movies are fetched
+        and only requested movies are enriched with genre.
+        :param offset: Position of first returned movie.
+        :param limit: Maximum number of returned movies.
+        :return: Tuple of movies list and total number of search results
+        """
+        movies = await sync_to_async(self._search_catalogue)(title)
+        if movies is not None:
+            return movies[offset:offset + limit], len(movies)
+        params = {'s': title, 'apikey': self.OMDB_API_KEY}
+        first_page = offset // 10 + 1
+        last_page = (offset + limit - 1) // 10 + 1
+
+        response = self._check_search_response(await self._run_query({**params, 'page': first_page}))
+        total_results = int(response['totalResults'])
+        if not response['Search']:
+            # Requested movies are after the last one, take total from the first page
+            if first_page > 1:
+                total_results = int(self._check_search_response(await self._run_query(params))['totalResults'])
+            return [], total_results
+
+        rest_page_numbers = range(first_page + 1, min(last_page, self._page_count(response)) + 1)
+        pages = await self._run_concurrently(lambda page: self._get_search_page(params, page), rest_page_numbers)
+        movies = self._join_pages(response['Search'], rest_page_numbers, pages)
+        start = offset - (first_page - 1) * 10
+        movies = movies[start:start + limit]
+        await self._add_genre_data_to_movies(movies)
+        return movies, total_results
+
+    async def iter_movies(self, title):
+        """
+        Yield searched movies enriched with genre. Movies of every page are yielded as soon as
+        the page and details of its movies are fetched, next pages are fetched in the meantime.
+        """
+        movies = await sync_to_async(self._search_catalogue)(title)
+        if movies is not None:
+            for movie in movies:
+                yield movie
+            return
+        params = {'s': title, 'apikey': self.OMDB_API_KEY}
+        response = self._check_search_response(await self._run_query(params))
+        rest_page_numbers = range(2, self._page_count(response) + 1)
+
+        semaphore = asyncio.Semaphore(self.MAX_CONCURRENCY)
+
+        async def get_page(page):
+            async with semaphore:
+                return await self._get_search_page(params, page)
+
+        tasks = [asyncio.ensure_future(get_page(page)) for page in rest_page_numbers]
+        try:
+            await self._add_genre_data_to_movies(response['Search'])
+            for movie in response['Search']:
+                yield movie
+            for task in tasks:
+                movies = await task
+                await self._add_genre_data_to_movies(movies)
+                for movie in movies:
+                    yield movie
+        finally:
+            for task in tasks:
+                task.cancel()
+
+    async def _get_movies_list(self, title):
+        """Return movies list with short description"""
+        params = {'s': title, 'apikey': self.OMDB_API_KEY}
+
+        response = self._check_search_response(await self._run_query(params))
+        rest_page_numbers = range(2, self._page_count(response) + 1)
+
+        pages = await self._run_concurrently(lambda page: self._get_search_page(params, page), rest_page_numbers)
+        return self._join_pages(response['Search'], rest_page_numbers, pages)
+
+    async def _get_search_page(self, params, page):
+        return self._check_search_response(await self._run_query({**params, 'page': page}))['Search']
+
+    async def _get_movie_genre(self, imdb_id):
+        return (await self._get_movies_details([imdb_id]))[imdb_id]['Genre'].split(', ')
+
+    async def _get_movies_details(self, imdb_ids):
+        """
+        Return dict of OMDb movie data by imdbID. Details are read from MovieDetail store,
+        only missing or outdated ones are fetched from OMDb and saved in store.
+        """
+        details, missing_ids = await sync_to_async(self._get_stored_details)(imdb_ids)
+        results = await self._run_concurrently(self._fetch_movie_details, missing_ids)
+        fetched_details = self._check_fetched_details(missing_ids, results)
+        if fetched_details:
+            await sync_to_async(self._store_details)(fetched_details)
+        details.update(fetched_details)
+        return details
+
+    async def _fetch_movie_details(self, imdb_id):
+        """Return movie data from OMDb"""
+        params = {'i': imdb_id, 'apikey': self.OMDB_API_KEY}
+        return self._check_movie_data(await self._run_query(params))
+
+    async def _add_genre_data_to_movies(self, movies):
+        details = await self._get_movies_details([movie["imdbID"] for movie in movies])
+        self._set_genres(movies, details)
+
+    async def _run_concurrently(self, func, items):
+        """
+        Await coroutine func for every item, at most MAX_CONCURRENCY at once.
+        :return: List of results in items order. Exception raised for an item is put in place of its result.
+        """
+        semaphore = asyncio.Semaphore(self.MAX_CONCURRENCY)
+
+        async def run(item):
+            async with semaphore:
+                return await func(item)
+
+        return await asyncio.gather(*(run(item) for item in items), return_exceptions=True)
+
+    async def _run_query(self, params):
+        """Return response for requested parameters"""
+        query_type = self._query_type(params)
+        wait = await sync_to_async(self._check_request_allowed)(query_type)
+        if wait:
+            with timing.phase('omdb-wait'):
+                await asyncio.sleep(wait)
+        url = self.OMDB_URL + parse.urlencode(params)
+        start = time.perf_counter()
+        try:
+            with timing.phase(f'omdb-{query_type}'):
+                response = json.loads(await self.transport.get(url))
+        except (OSError, ValueError):
+            self._count_query(query_type, start, None)
+            await sync_to_async(self._record_result)(success=False)
+            raise
+        self._count_query(query_type, start, response)
+        await sync_to_async(self._record_result)(success=True)
+        return response
@@ -0,0 +1,105 @@
+"""
+Token authentication keeping recently used tokens with their users in process memory, so authenticated requests
+don't query database. Entries are removed when token or user is saved or deleted in this process, changes made
+by other processes are seen after TOKEN_CACHE_TIMEOUT seconds at most.
+"""
+from collections import OrderedDict
+import copy
+import threading
+import time
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from rest_framework.authentication import TokenAuthentication
+from rest_framework.authtoken.models import Token
+
+from core import metrics
+
+
+class TokenUserCache:
+    """LRU of users and tokens by token key, entries expire after `timeout` seconds"""
+
+    def __init__(self, max_entries, timeout):
+        self.max_entries = max_entries
+        self.timeout = timeout
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._stats = {'hits': 0, 'misses': 0, 'evictions': 0}
+
+    def get(self, key):
+        """Return (user, token) of token key or None"""
+        with self._lock:
+            entry = self._entries.get(key)
+            hit = entry is not None and entry[0] > time.monotonic()
+            if hit:
+                self._entries.move_to_end(key)
+                self._stats['hits'] += 1
+            else:
+                self._stats['misses'] += 1
+        metrics.TOKEN_CACHE_LOOKUPS.inc(result='hit' if hit else 'miss')
+        return entry[1:] if hit else None
+
+    def set(self, key, user, token):
+        evictions = 0
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.timeout, user, token)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                evictions += 1
+            self._stats['evictions'] += evictions
+        if evictions:
+            metrics.TOKEN_CACHE_EVICTIONS.inc(evictions)
+
+    def delete(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def delete_user(self, user_id):
+        """Remove all tokens of user"""
+        with self._lock:
+            for key in [key for key, (expires_at, user, token) in self._entries.items() if user.pk == user_id]:
+                del self._entries[key]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def get_stats(self):
+        """Return numbers of hits, misses and evictions, hit rate and number of kept tokens"""
+        with self._lock:
+            lookups = self._stats['hits'] + self._stats['misses']
+            return {**self._stats, 'hit_rate': self._stats['hits'] / lookups if lookups else None,
+                    'entries': len(self._entries)}
+
+
+token_cache = TokenUserCache(settings.TOKEN_CACHE_MAX_ENTRIES, settings.TOKEN_CACHE_TIMEOUT)
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    """TokenAuthentication reading tokens from token_cache, only inactive users and invalid tokens aren't cached"""
+
+    def authenticate_credentials(self, key):
+        entry = token_cache.get(key)
+        if entry is None:
+            user, token = super().authenticate_credentials(key)
+            token_cache.set(key, user, token)
+        else:
+            user, token = entry
+        # Request gets its own copy of user, cached one is shared by threads
+        return copy.copy(user), token
+
+
+@receiver(post_save, sender=Token)
+@receiver(post_delete, sender=Token)
+def remove_cached_token(sender, instance, **kwargs):
+    token_cache.delete(instance.key)
+
+
+@receiver(post_save, sender=get_user_model())
+@receiver(post_delete, sender=get_user_model())
+def remove_cached_user(sender, instance, **kwargs):
+    # User may be deactivated or changed
+    token_cache.delete_user(instance.pk)
@@ -0,0 +1,140 @@
+from collections import OrderedDict
+import threading
+import time
+
+from django.core.cache import caches
+from django.core.cache.backends.base import DEFAULT_TIMEOUT, BaseCache
+
+from core import metrics
+from core import timing
+
+# Local tiers are shared by all threads of a process, Django creates cache backend object per thread
+_local_caches = {}
+_local_stats = {}
+_locks = {}
+_MISSING = object()
+
+
+class TieredCache(BaseCache):
+    """
+    Cache keeping recently used values in process memory in front of cache shared by processes.
+    Values read from local tier are not copied or unpickled, so they must not be modified by callers.
+    Local entries expire after LOCAL_TIMEOUT seconds, it limits time when value changed by other process is stale.
+    Reads and writes are recorded as 'cache' phase of request timing, hits, misses and evictions are counted
+    in metrics by cache location.
+
+    OPTIONS:
+        SHARED_CACHE: Alias of shared cache from CACHES setting.
+        LOCAL_MAX_ENTRIES: Maximum number of values kept in memory, the least recently used are removed first.
+        LOCAL_TIMEOUT: Maximum time in seconds a value is kept in memory.
+    """
+
+    def __init__(self, location, params):
+        super().__init__(params)
+        options = params.get('OPTIONS', {})
+        self._shared_alias = options.get('SHARED_CACHE', 'shared')
+        self._local_max_entries = options.get('LOCAL_MAX_ENTRIES', 1000)
+        self._local_timeout = options.get('LOCAL_TIMEOUT', 60)
+        self._location = location
+        self._local = _local_caches.setdefault(location, OrderedDict())
+        self._stats = _local_stats.setdefault(location, {'local_hits': 0, 'local_misses': 0, 'local_evictions': 0,
+                                                         'shared_hits': 0, 'shared_misses': 0})
+        self._lock = _locks.setdefault(location, threading.Lock())
+
+    @property
+    def shared(self):
+        return caches[self._shared_alias]
+
+    def get(self, key, default=None, version=None):
+        with timing.phase('cache'):
+            return self._get(key, default, version)
+
+    def _get(self, key, default, version):
+        local_key = self.make_key(key, version=version)
+        self.validate_key(local_key)
+        with self._lock:
+            entry = self._local.get(local_key)
+            hit = entry is not None and entry[0] > time.monotonic()
+            if hit:
+                self._local.move_to_end(local_key)
+                self._stats['local_hits'] += 1
+            else:
+                self._stats['local_misses'] += 1
+        self._count_lookup('local', hit)
+        if hit:
+            return entry[1]
+
+        value = self.shared.get(key, _MISSING, version=version)
+        hit = value is not _MISSING
+        with self._lock:
+            self._stats['shared_hits' if hit else 'shared_misses'] += 1
+        self._count_lookup('shared', hit)
+        if not hit:
+            return default
+        self._set_local(local_key, value, self._local_timeout)
+        return value
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        with timing.phase('cache'):
+            self.shared.set(key, value, timeout=timeout, version=version)
+        self._set_local(self.make_key(key, version=version), value, timeout)
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        with timing.phase('cache'):
+            added = self.shared.add(key, value, timeout=timeout, version=version)
+        if added:
+            self._set_local(self.make_key(key, version=version), value, timeout)
+        return added
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        self._delete_local(self.make_key(key, version=version))
+        return self.shared.touch(key, timeout=timeout, version=version)
+
+    def delete(self, key, version=None):
+        self._delete_local(self.make_key(key, version=version))
+        with timing.phase('cache'):
+            return self.shared.delete(key, version=version)
+
+    def incr(self, key, delta=1, version=None):
+        """Increment value in shared cache, so it's atomic between processes if shared cache supports it"""
+        self._delete_local(self.make_key(key, version=version))
+        return self.shared.incr(key, delta=delta, version=version)
+
+    def decr(self, key, delta=1, version=None):
+        self._delete_local(self.make_key(key, version=version))
+        return self.shared.decr(key, delta=delta, version=version)
+
+    def clear(self):
+        with self._lock:
+            self._local.clear()
+        self.shared.clear()
+
+    def get_stats(self):
+        """Return numbers of hits and misses of every tier, evictions and number of values kept in memory"""
+        with self._lock:
+            return {**self._stats, 'local_entries': len(self._local)}
+
+    def _set_local(self, local_key, value, timeout):
+        if timeout is DEFAULT_TIMEOUT:
+            timeout = self.default_timeout
+        if timeout is not None and timeout <= 0:
+            self._delete_local(local_key)
+            return
+        local_timeout = self._local_timeout if timeout is None else min(timeout, self._local_timeout)
+        evictions = 0
+        with self._lock:
+            self._local[local_key] = (time.monotonic() + local_timeout, value)
+            self._local.move_to_end(local_key)
+            while len(self._local) > self._local_max_entries:
+                self._local.popitem(last=False)
+                evictions += 1
+            self._stats['local_evictions'] += evictions
+        if evictions:
+            metrics.TIERED_CACHE_EVICTIONS.inc(evictions, cache=self._location)
+
+    def _count_lookup(self, tier, hit):
+        metrics.TIERED_CACHE_LOOKUPS.inc(cache=self._location, tier=tier, result='hit' if hit else 'miss')
+
+    def _delete_local(self, local_key):
+        with self._lock:
+            self._local.pop(local_key, None)
@@ -0,0 +1,135 @@
+"""
+Local catalogue of titles imported from IMDb dataset dump (title.basics.tsv), it answers searches without
+requests to OMDb. Dump is read and saved in batches, every batch in its own transaction, so memory use doesn't
+depend on its size. Titles are found by index of their words, which are normalized, so case and diacritics
+are ignored like in OMDb search. Titles already in catalogue are updated by import of newer dump.
+"""
+import csv
+import itertools
+import re
+import unicodedata
+
+from django.db import transaction
+
+from core.models import CatalogueTitle, CatalogueWord
+
+BATCH_SIZE = 2000
+# Searches matching more titles return only the first ones
+MAX_RESULTS = 1000
+# Dumps mark missing values by \N
+NULL = '\\N'
+# OMDb types of IMDb title types
+TYPES = {
+    'movie': 'movie',
+    'tvMovie': 'movie',
+    'short': 'movie',
+    'tvShort': 'movie',
+    'tvSpecial': 'movie',
+    'video': 'movie',
+    'tvSeries': 'series',
+    'tvMiniSeries': 'series',
+    'tvEpisode': 'episode',
+    'videoGame': 'game',
+}
+# Episodes are most of the titles in dumps and they are rarely searched
+DEFAULT_TYPES = tuple(title_type for title_type in TYPES if title_type != 'tvEpisode')
+TITLE_MAX_LENGTH = CatalogueTitle._meta.get_field('title').max_length
+WORD_MAX_LENGTH = CatalogueWord._meta.get_field('word').max_length
+
+
+class ImportReport:
+    """Numbers of read rows, created and updated titles and rows skipped because of their type or format"""
+
+    def __init__(self):
+        self.rows = 0
+        self.created = 0
+        self.updated = 0
+        self.skipped = 0
+
+    def __str__(self):
+        return f'{self.rows} rows: {self.created} created, {self.updated} updated, {self.skipped} skipped'
+
+
+def normalize(text):
+    """Return text in lower case without diacritics"""
+    return ''.join(char for char in unicodedata.normalize('NFKD', text) if not unicodedata.combining(char)).casefold()
+
+
+def title_words(text):
+    """Return distinct normalized words of text"""
+    return list(dict.fromkeys(word[:WORD_MAX_LENGTH] for word in re.findall(r'\w+', normalize(text))))
+
+
+def format_year(omdb_type, start_year, end_year):
+    """Return year in OMDb form, years of series are a range"""
+    if start_year == NULL:
+        return 'N/A'
+    if omdb_type == 'series':
+        return f"{start_year}–{'' if end_year == NULL else end_year}"
+    return start_year
+
+
+def read_titles(file, types=DEFAULT_TYPES):
+    """Yield CatalogueTitle of every row of dump, rows of other types or without needed columns are yielded as None"""
+    types = set(types)
+    for row in csv.DictReader(file, delimiter='\t', quoting=csv.QUOTE_NONE):
+        title_type = row.get('titleType')
+        if title_type not in types or title_type not in TYPES or None in (row.get('tconst'), row.get('genres')):
+            yield None
+            continue
+        omdb_type = TYPES[title_type]
+        yield CatalogueTitle(
+            imdb_id=row['tconst'],
+            title=row['primaryTitle'][:TITLE_MAX_LENGTH],
+            type=omdb_type,
+            year=format_year(omdb_type, row['startYear'], row['endYear']),
+            genre='N/A' if row['genres'] == NULL else ', '.join(row['genres'].split(',')),
+        )
+
+
+def import_batch(titles, report):
+    """Save titles with their words in one transaction"""
+    titles = {title.imdb_id: title for title in titles}
+    if not titles:
+        return
+    with transaction.atomic():
+        existing_ids = set(CatalogueTitle.objects.filter(imdb_id__in=titles).values_list('imdb_id', flat=True))
+        CatalogueTitle.objects.bulk_update([title for imdb_id, title in titles.items() if imdb_id in existing_ids],
+                                           ['title', 'type', 'year', 'genre'])
+        CatalogueTitle.objects.bulk_create([title for imdb_id, title in titles.items() if imdb_id not in existing_ids])
+        CatalogueWord.objects.filter(title__in=existing_ids).delete()
+        CatalogueWord.objects.bulk_create([CatalogueWord(word=word, title=title)
+                                           for title in titles.values() for word in title_words(title.title)])
+    report.created += len(titles) - len(existing_ids)
+    report.updated += len(existing_ids)
+
+
+def import_catalogue(file, types=DEFAULT_TYPES, batch_size=BATCH_SIZE, progress=None):
+    """
+    Save titles of IMDb types read from text file of dump and return ImportReport.
+    :param progress: Function called with report after every batch.
+    """
+    report = ImportReport()
+    rows = read_titles(file, types)
+    while True:
+        batch = list(itertools.islice(rows, batch_size))
+        if not batch:
+            return report
+        titles = [title for title in batch if title is not None]
+        report.rows += len(batch)
+        report.skipped += len(batch) - len(titles)
+        import_batch(titles, report)
+        if progress:
+            progress(report)
+
+
+def search(title, max_results=MAX_RESULTS):
+    """Return OMDb search results enriched with genre of catalogue titles having all words of title"""
+    words = title_words(title)
+    if not words:
+        return []
+    titles = CatalogueTitle.objects.all()
+    # Every word is joined from index, the longest one first, it's usually the rarest
+    for word in sorted(words, key=len, reverse=True):
+        titles = titles.filter(words__word=word)
+    return [title.as_search_result() for title in titles.order_by('imdb_id')[:max_results]]
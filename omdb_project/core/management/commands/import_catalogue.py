@@ -0,0 +1,26 @@
+import gzip
+
+from django.core.management.base import BaseCommand, CommandError
+
+from core import catalogue
+
+
+class Command(BaseCommand):
+    help = ('Import titles from IMDb title.basics dump (TSV file, optionally gzipped) to local catalogue, '
+            'titles already in catalogue are updated')
+
+    def add_arguments(self, parser):
+        parser.add_argument('path')
+        parser.add_argument('--types', nargs='+', choices=list(catalogue.TYPES), default=catalogue.DEFAULT_TYPES,
+                            help='IMDb title types to import, by default all except episodes')
+        parser.add_argument('--batch-size', type=int, default=catalogue.BATCH_SIZE)
+
+    def handle(self, path, **options):
+        opener = gzip.open if path.endswith('.gz') else open
+        try:
+            with opener(path, 'rt', encoding='utf-8', newline='') as file:
+                report = catalogue.import_catalogue(file, options['types'], options['batch_size'],
+                                                    progress=lambda report: self.stdout.write(str(report)))
+        except (OSError, UnicodeDecodeError) as e:
+            raise CommandError(f'Dump can not be read: {e}')
+        self.stdout.write(self.style.SUCCESS(f'Imported {report}'))
@@ -0,0 +1,31 @@
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+
+from core import review_import
+
+
+class Command(BaseCommand):
+    help = 'Import reviews of user from CSV or newline delimited JSON file, reviews of the same movies are updated'
+
+    def add_arguments(self, parser):
+        parser.add_argument('username')
+        parser.add_argument('path')
+        parser.add_argument('--format', choices=review_import.FORMATS,
+                            help='Format of file, by default read from its extension')
+        parser.add_argument('--batch-size', type=int, default=review_import.BATCH_SIZE)
+
+    def handle(self, username, path, **options):
+        try:
+            user = get_user_model().objects.get(username=username)
+        except get_user_model().DoesNotExist:
+            raise CommandError(f'User {username} does not exist')
+        file_format = options['format'] or review_import.format_of(path)
+        try:
+            with open(path, encoding='utf-8-sig', newline='') as file:
+                report = review_import.import_reviews(user, file, file_format, options['batch_size'],
+                                                      progress=lambda report: self.stdout.write(str(report)))
+        except (OSError, UnicodeDecodeError) as e:
+            raise CommandError(f'File can not be read: {e}')
+        for error in report.errors:
+            self.stderr.write(f"Row {error['row']}: {error['error']}")
+        self.stdout.write(self.style.SUCCESS(f'Imported {report}'))
@@ -0,0 +1,211 @@
+"""
+In-process registry of counters and histograms exposed in Prometheus text format.
+With METRICS_DIR setting every process also writes its values to its own file in that directory, at most
+every METRICS_WRITE_INTERVAL seconds and at exit, and exposition sums values of all files, so any worker
+process returns metrics of all of them. Only counters and histograms are supported, as their sum over
+processes is meaningful. Files of stopped processes are kept, so totals don't go down, the directory
+should be emptied when the whole service is restarted.
+"""
+from bisect import bisect_left
+import atexit
+import glob
+import json
+import math
+import os
+import threading
+import time
+
+from django.conf import settings
+
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, math.inf)
+COUNT_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, math.inf)
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+
+def format_value(value):
+    return '+Inf' if value == math.inf else repr(float(value))
+
+
+def escape_label_value(value):
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def format_labels(labels):
+    if not labels:
+        return ''
+    return '{' + ','.join(f'{name}="{escape_label_value(value)}"' for name, value in labels) + '}'
+
+
+class Registry:
+    """Metrics and values of their samples in this process, values are kept by sample name and labels"""
+
+    def __init__(self):
+        self.metrics = {}
+        self.values = {}
+        self._lock = threading.Lock()
+        self._written_at = 0
+
+    def counter(self, name, documentation, labelnames=()):
+        return self._register(Counter(self, name, documentation, labelnames))
+
+    def histogram(self, name, documentation, labelnames=(), buckets=DURATION_BUCKETS):
+        return self._register(Histogram(self, name, documentation, labelnames, buckets))
+
+    def _register(self, metric):
+        self.metrics[metric.name] = metric
+        return metric
+
+    def add(self, increments):
+        """Add values to samples given as (sample name, labels, value)"""
+        with self._lock:
+            for sample_name, labels, value in increments:
+                key = (sample_name, labels)
+                self.values[key] = self.values.get(key, 0) + value
+        if settings.METRICS_DIR and time.monotonic() - self._written_at >= settings.METRICS_WRITE_INTERVAL:
+            self.write()
+
+    def reset(self):
+        """Forget values, process forked from other one mustn't count them again"""
+        # Lock could be held by other thread of parent process while it was forked
+        self._lock = threading.Lock()
+        self.values = {}
+        self._written_at = 0
+
+    def write(self):
+        """Write values of this process to its file in METRICS_DIR"""
+        with self._lock:
+            self._written_at = time.monotonic()
+            samples = [[sample_name, labels, value] for (sample_name, labels), value in self.values.items()]
+        path = os.path.join(settings.METRICS_DIR, f'metrics_{os.getpid()}.json')
+        # File is replaced at once, so readers never see part of it
+        temporary_path = f'{path}.{threading.get_ident()}.tmp'
+        with open(temporary_path, 'w') as file:
+            json.dump(samples, file)
+        os.replace(temporary_path, path)
+
+    def write_at_exit(self):
+        if settings.METRICS_DIR and self.values:
+            self.write()
+
+    def collect(self):
+        """Return dict of values by sample name and labels, summed over processes when METRICS_DIR is set"""
+        if not settings.METRICS_DIR:
+            with self._lock:
+                return dict(self.values)
+        self.write()
+        values = {}
+        for path in glob.glob(os.path.join(settings.METRICS_DIR, 'metrics_*.json')):
+            try:
+                with open(path) as file:
+                    samples = json.load(file)
+            except (OSError, ValueError):
+                # File was removed in the meantime
+                continue
+            for sample_name, labels, value in samples:
+                key = (sample_name, tuple(map(tuple, labels)))
+                values[key] = values.get(key, 0) + value
+        return values
+
+    def exposition(self):
+        """Return all metrics in Prometheus text format"""
+        values = self.collect()
+        lines = []
+        for metric in self.metrics.values():
+            lines.append(f'# HELP {metric.name} {metric.documentation}')
+            lines.append(f'# TYPE {metric.name} {metric.type}')
+            lines.extend(f'{sample_name}{format_labels(labels)} {format_value(value)}'
+                         for sample_name, labels, value in metric.samples(values))
+        return '\n'.join(lines) + '\n'
+
+
+class Metric:
+    type = None
+
+    def __init__(self, registry, name, documentation, labelnames):
+        self.registry = registry
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+
+    def label_items(self, labels):
+        if labels.keys() != set(self.labelnames):
+            raise ValueError(f'Labels of {self.name} are: {", ".join(self.labelnames)}')
+        return tuple((name, str(labels[name])) for name in self.labelnames)
+
+    def samples(self, values):
+        """Yield sample name, labels and value of every sample of metric found in values"""
+        raise NotImplementedError
+
+
+class Counter(Metric):
+    type = 'counter'
+
+    def inc(self, amount=1, **labels):
+        self.registry.add([(self.name, self.label_items(labels), amount)])
+
+    def samples(self, values):
+        for (sample_name, labels), value in sorted(values.items()):
+            if sample_name == self.name:
+                yield sample_name, labels, value
+
+
+class Histogram(Metric):
+    """Histogram with cumulative buckets, the last bucket has to be infinity"""
+    type = 'histogram'
+
+    def __init__(self, registry, name, documentation, labelnames, buckets):
+        super().__init__(registry, name, documentation, labelnames)
+        self.buckets = tuple(buckets)
+        self.bucket_labels = tuple(('le', format_value(bucket)) for bucket in self.buckets)
+
+    def observe(self, value, **labels):
+        labels = self.label_items(labels)
+        self.registry.add([
+            *((f'{self.name}_bucket', (*labels, le), 1)
+              for le in self.bucket_labels[bisect_left(self.buckets, value):]),
+            (f'{self.name}_sum', labels, value),
+            (f'{self.name}_count', labels, 1),
+        ])
+
+    def samples(self, values):
+        # Buckets without observations are sent too
+        for labels in sorted(labels for sample_name, labels in values if sample_name == f'{self.name}_count'):
+            for le in self.bucket_labels:
+                yield f'{self.name}_bucket', (*labels, le), values.get((f'{self.name}_bucket', (*labels, le)), 0)
+            yield f'{self.name}_sum', labels, values[f'{self.name}_sum', labels]
+            yield f'{self.name}_count', labels, values[f'{self.name}_count', labels]
+
+
+registry = Registry()
+os.register_at_fork(after_in_child=registry.reset)
+atexit.register(registry.write_at_exit)
+
+REQUEST_DURATION = registry.histogram(
+    'http_request_duration_seconds', 'Duration of requests by view, action and status',
+    ['view', 'action', 'status'])
+REQUEST_DB_QUERIES = registry.histogram(
+    'http_request_db_queries', 'Number of database queries of request by view and action',
+    ['view', 'action'], buckets=COUNT_BUCKETS)
+OMDB_REQUESTS = registry.counter(
+    'omdb_requests_total',
+    'Requests to OMDb by type (search or details) and outcome (success, not_found, omdb_error, error, rejected)',
+    ['type', 'outcome'])
+OMDB_REQUEST_DURATION = registry.histogram(
+    'omdb_request_duration_seconds', 'Duration of requests sent to OMDb by type', ['type'])
+SEARCH_CACHE_LOOKUPS = registry.counter(
+    'search_cache_lookups_total',
+    'Lookups of search results by result (hit, miss, coalesced with running search, stale served)',
+    ['result'])
+CATALOGUE_LOOKUPS = registry.counter(
+    'catalogue_lookups_total', 'Searches in local movie catalogue by result (hit or miss sent to OMDb)', ['result'])
+TOKEN_CACHE_LOOKUPS = registry.counter(
+    'token_cache_lookups_total', 'Lookups of tokens kept in process memory by result (hit or miss)', ['result'])
+TOKEN_CACHE_EVICTIONS = registry.counter(
+    'token_cache_evictions_total', 'Tokens removed from process memory to keep at most TOKEN_CACHE_MAX_ENTRIES')
+TIERED_CACHE_LOOKUPS = registry.counter(
+    'tiered_cache_lookups_total',
+    'Lookups of tiered cache by location, tier (local or shared) and result (hit or miss)',
+    ['cache', 'tier', 'result'])
+TIERED_CACHE_EVICTIONS = registry.counter(
+    'tiered_cache_evictions_total',
+    'Values removed from local tier of tiered cache by location to keep at most LOCAL_MAX_ENTRIES', ['cache'])
@@ -0,0 +1,64 @@
+import time
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connection
+
+from core import metrics
+from core import query_budget
+from core import timing
+
+
+class MetricsMiddleware:
+    """
+    Count duration and number of database queries of requests by view and action,
+    requests over query budget of their view are logged when QUERY_BUDGET_WARNINGS setting is True.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        query_count = 0
+
+        def count_query(execute, sql, params, many, context):
+            nonlocal query_count
+            query_count += 1
+            return execute(sql, params, many, context)
+
+        start = time.perf_counter()
+        with connection.execute_wrapper(count_query):
+            response = self.get_response(request)
+        view_class, view, action = query_budget.resolve_view(request)
+        metrics.REQUEST_DURATION.observe(time.perf_counter() - start, view=view, action=action,
+                                         status=response.status_code)
+        metrics.REQUEST_DB_QUERIES.observe(query_count, view=view, action=action)
+        if settings.QUERY_BUDGET_WARNINGS:
+            query_budget.warn_over_budget(request, view_class, view, action, query_count)
+        return response
+
+
+class RequestTimingMiddleware:
+    """
+    Record durations of request phases and send them in Server-Timing header and log line of 'core.timing'
+    logger. It's removed from middleware chain when REQUEST_TIMING setting is False.
+    """
+
+    def __init__(self, get_response):
+        if not settings.REQUEST_TIMING:
+            raise MiddlewareNotUsed()
+        self.get_response = get_response
+
+    def __call__(self, request):
+        with timing.record() as request_timing, connection.execute_wrapper(timing.time_query):
+            response = self.get_response(request)
+        response['Server-Timing'] = request_timing.server_timing()
+        timing.log(request_timing, request.method, request.path, response.status_code)
+        return response
+
+    def process_template_response(self, request, response):
+        """Measure rendering of DRF response, which serializes its data"""
+        request_timing = timing.current()
+        start = time.perf_counter()
+        response.add_post_render_callback(lambda response: request_timing.add('render', time.perf_counter() - start))
+        return response
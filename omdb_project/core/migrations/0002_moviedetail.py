@@ -0,0 +1,21 @@
+# Generated by Django 3.0.1 on 2026-10-18 11:33
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MovieDetail',
+            fields=[
+                ('imdb_id', models.CharField(max_length=20, primary_key=True, serialize=False)),
+                ('data', models.TextField()),
+                ('fetched_at', models.DateTimeField()),
+            ],
+        ),
+    ]
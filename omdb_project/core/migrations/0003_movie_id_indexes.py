@@ -0,0 +1,58 @@
+# Generated by Django 3.0.1 on 2026-10-18 11:54
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('core', '0002_moviedetail'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='favouritemovie',
+            name='movie_id',
+            field=models.CharField(max_length=20),
+        ),
+        migrations.AlterField(
+            model_name='favouritemovie',
+            name='user',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='favourite_movies', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AlterField(
+            model_name='movietowatch',
+            name='movie_id',
+            field=models.CharField(max_length=20),
+        ),
+        migrations.AlterField(
+            model_name='movietowatch',
+            name='user',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='movies_to_watch', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AlterField(
+            model_name='review',
+            name='movie_id',
+            field=models.CharField(max_length=20),
+        ),
+        migrations.AlterField(
+            model_name='review',
+            name='user',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='reviewed_movies', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddIndex(
+            model_name='favouritemovie',
+            index=models.Index(fields=['movie_id', 'user'], name='core_fav_movie_user_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='movietowatch',
+            index=models.Index(fields=['movie_id', 'user'], name='core_towatch_movie_user_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='review',
+            index=models.Index(fields=['movie_id', 'id'], name='core_review_movie_id_idx'),
+        ),
+    ]
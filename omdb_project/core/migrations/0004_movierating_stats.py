@@ -0,0 +1,49 @@
+# Generated by Django 3.0.1 on 2026-10-18 11:56
+
+from django.db import migrations, models
+
+
+def create_stats_of_reviews(apps, schema_editor):
+    """Count ratings of reviews created before stats were kept"""
+    Review = apps.get_model('core', 'Review')
+    MovieRatingStats = apps.get_model('core', 'MovieRatingStats')
+    stats = {}
+    counts = Review.objects.values_list('movie_id', 'rating').annotate(count=models.Count('id')).order_by()
+    for movie_id, rating, count in counts.iterator():
+        movie_stats = stats.setdefault(movie_id, MovieRatingStats(movie_id=movie_id))
+        movie_stats.count += count
+        movie_stats.rating_sum += rating * count
+        setattr(movie_stats, f'rating_{rating}', count)
+    MovieRatingStats.objects.bulk_create(stats.values(), batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0003_movie_id_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MovieRatingStats',
+            fields=[
+                ('movie_id', models.CharField(max_length=20, primary_key=True, serialize=False)),
+                ('count', models.IntegerField(default=0)),
+                ('rating_sum', models.IntegerField(default=0)),
+                ('rating_1', models.IntegerField(default=0)),
+                ('rating_2', models.IntegerField(default=0)),
+                ('rating_3', models.IntegerField(default=0)),
+                ('rating_4', models.IntegerField(default=0)),
+                ('rating_5', models.IntegerField(default=0)),
+                ('rating_6', models.IntegerField(default=0)),
+                ('rating_7', models.IntegerField(default=0)),
+                ('rating_8', models.IntegerField(default=0)),
+                ('rating_9', models.IntegerField(default=0)),
+                ('rating_10', models.IntegerField(default=0)),
+            ],
+            options={
+                'verbose_name_plural': 'movie rating stats',
+            },
+        ),
+        migrations.RunPython(create_stats_of_reviews, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 3.0.1 on 2026-10-18 11:58
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0004_movierating_stats'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='review',
+            index=models.Index(fields=['user', 'id'], name='core_review_user_id_idx'),
+        ),
+    ]
@@ -0,0 +1,35 @@
+# Generated by Django 3.0.1 on 2026-10-18 12:13
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0005_review_user_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CatalogueTitle',
+            fields=[
+                ('imdb_id', models.CharField(max_length=20, primary_key=True, serialize=False)),
+                ('title', models.CharField(max_length=500)),
+                ('type', models.CharField(max_length=20)),
+                ('year', models.CharField(max_length=20)),
+                ('genre', models.CharField(max_length=200)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='CatalogueWord',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('word', models.CharField(max_length=100)),
+                ('title', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='words', to='core.CatalogueTitle')),
+            ],
+            options={
+                'unique_together': {('word', 'title')},
+            },
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 3.0.1 on 2026-10-18 12:17
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0006_movie_catalogue'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='moviedetail',
+            index=models.Index(fields=['fetched_at'], name='core_detail_fetched_at_idx'),
+        ),
+    ]
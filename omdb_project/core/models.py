@@ -1,38 +1,265 @@
-from django.db import models
+from datetime import timedelta
+import json
+
+from django.conf import settings
+from django.db import IntegrityError, models, transaction
+from django.db.models import F
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+from django.utils import timezone
 from django.contrib.auth import get_user_model
 from django.core.validators import MinValueValidator, MaxValueValidator
 
+# IMDb ids have form tt1234567, newer ones have more digits
+IMDB_ID_MAX_LENGTH = 20
+RATINGS = range(1, 11)
+
 
 class MovieToWatch(models.Model):
-    user = models.ForeignKey(get_user_model(), related_name='movies_to_watch', on_delete=models.CASCADE)
-    movie_id = models.CharField(max_length=400)
+    # Lookups by user use unique index of user and movie_id
+    user = models.ForeignKey(get_user_model(), related_name='movies_to_watch', on_delete=models.CASCADE,
+                             db_index=False)
+    movie_id = models.CharField(max_length=IMDB_ID_MAX_LENGTH)
 
     class Meta:
         unique_together = ['user', 'movie_id']
+        indexes = [
+            # Users who want to watch a movie are read from index only
+            models.Index(fields=['movie_id', 'user'], name='core_towatch_movie_user_idx'),
+        ]
 
     def __str__(self):
         return f'{self.user.username} want to watch {self.movie_id}'
 
 
 class FavouriteMovie(models.Model):
-    user = models.ForeignKey(get_user_model(), related_name='favourite_movies', on_delete=models.CASCADE)
-    movie_id = models.CharField(max_length=400)
+    # Lookups by user use unique index of user and movie_id
+    user = models.ForeignKey(get_user_model(), related_name='favourite_movies', on_delete=models.CASCADE,
+                             db_index=False)
+    movie_id = models.CharField(max_length=IMDB_ID_MAX_LENGTH)
 
     class Meta:
         unique_together = ['user', 'movie_id']
+        indexes = [
+            # Users who like a movie are read from index only
+            models.Index(fields=['movie_id', 'user'], name='core_fav_movie_user_idx'),
+        ]
 
     def __str__(self):
         return f'{self.user.username} really likes {self.movie_id}'
 
 
 class Review(models.Model):
-    user = models.ForeignKey(get_user_model(), related_name='reviewed_movies', on_delete=models.CASCADE)
-    movie_id = models.CharField(max_length=400)
-    rating = models.IntegerField(validators=[MaxValueValidator(10), MinValueValidator(1)])
+    # Lookups by user use unique index of user and movie_id
+    user = models.ForeignKey(get_user_model(), related_name='reviewed_movies', on_delete=models.CASCADE,
+                             db_index=False)
+    movie_id = models.CharField(max_length=IMDB_ID_MAX_LENGTH)
+    rating = models.IntegerField(validators=[MaxValueValidator(RATINGS[-1]), MinValueValidator(RATINGS[0])])
     review = models.TextField(blank=True, max_length=2000)
 
     class Meta:
         unique_together = ['user', 'movie_id']
+        indexes = [
+            # Reviews of a movie or user are listed in order of creation without sorting
+            models.Index(fields=['movie_id', 'id'], name='core_review_movie_id_idx'),
+            models.Index(fields=['user', 'id'], name='core_review_user_id_idx'),
+        ]
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        review = super().from_db(db, field_names, values)
+        review._stored_rating = (review.__dict__.get('movie_id'), review.__dict__.get('rating'))
+        return review
 
     def __str__(self):
         return f'{self.user.username} rates {self.movie_id} {self.rating} and think: {self.review}'
+
+
+class MovieRatingStatsQuerySet(models.QuerySet):
+    def add_rating(self, movie_id, rating, count=1):
+        """Add `count` ratings of movie, negative count removes them. Counters are updated atomically."""
+        changes = {'count': F('count') + count, 'rating_sum': F('rating_sum') + rating * count,
+                   f'rating_{rating}': F(f'rating_{rating}') + count}
+        if self.filter(movie_id=movie_id).update(**changes):
+            return
+        try:
+            with transaction.atomic():
+                self.create(movie_id=movie_id, count=count, rating_sum=rating * count, **{f'rating_{rating}': count})
+        except IntegrityError:
+            # Stats were created by other request in the meantime
+            self.filter(movie_id=movie_id).update(**changes)
+
+    def add_ratings(self, counts):
+        """
+        Add counts of many ratings given as dict of count by (movie_id, rating), negative count removes them.
+        Stats of all movies are locked and updated together by a few queries.
+        """
+        counts = {key: count for key, count in counts.items() if count}
+        if not counts:
+            return
+        movie_ids = {movie_id for movie_id, rating in counts}
+        with transaction.atomic():
+            self.bulk_create([self.model(movie_id=movie_id) for movie_id in movie_ids], ignore_conflicts=True)
+            stats = self.select_for_update().in_bulk(movie_ids)
+            for (movie_id, rating), count in counts.items():
+                movie_stats = stats[movie_id]
+                movie_stats.count += count
+                movie_stats.rating_sum += rating * count
+                setattr(movie_stats, f'rating_{rating}', getattr(movie_stats, f'rating_{rating}') + count)
+            self.bulk_update(stats.values(), ['count', 'rating_sum', *(f'rating_{rating}' for rating in RATINGS)])
+
+
+class MovieRatingStats(models.Model):
+    """Number, sum and histogram of ratings of movie, updated when review is saved or deleted"""
+    movie_id = models.CharField(max_length=IMDB_ID_MAX_LENGTH, primary_key=True)
+    count = models.IntegerField(default=0)
+    rating_sum = models.IntegerField(default=0)
+    rating_1 = models.IntegerField(default=0)
+    rating_2 = models.IntegerField(default=0)
+    rating_3 = models.IntegerField(default=0)
+    rating_4 = models.IntegerField(default=0)
+    rating_5 = models.IntegerField(default=0)
+    rating_6 = models.IntegerField(default=0)
+    rating_7 = models.IntegerField(default=0)
+    rating_8 = models.IntegerField(default=0)
+    rating_9 = models.IntegerField(default=0)
+    rating_10 = models.IntegerField(default=0)
+
+    objects = MovieRatingStatsQuerySet.as_manager()
+
+    class Meta:
+        verbose_name_plural = 'movie rating stats'
+
+    @property
+    def average(self):
+        return self.rating_sum / self.count if self.count else None
+
+    @property
+    def histogram(self):
+        """Dict of number of ratings by rating"""
+        return {rating: getattr(self, f'rating_{rating}') for rating in RATINGS}
+
+    def __str__(self):
+        return f'{self.movie_id} rated {self.count} times'
+
+
+@receiver(pre_save, sender=Review)
+def load_stored_rating(sender, instance, raw=False, using=None, **kwargs):
+    """
+    Read rating of updated review which wasn't loaded from database. In transaction it's always read after the row
+    is claimed, so concurrent update of the same review waits and doesn't move rating loaded before this one.
+    """
+    if raw or instance.pk is None:
+        return
+    if transaction.get_connection(using).in_atomic_block:
+        instance._stored_rating = claim_stored_rating(instance.pk, using)
+    elif not hasattr(instance, '_stored_rating'):
+        instance._stored_rating = Review.objects.using(using).filter(pk=instance.pk).values_list(
+            'movie_id', 'rating').first()
+
+
+def claim_stored_rating(review_id, using=None):
+    """
+    Return (movie_id, rating) of review saved in database or None when it doesn't exist. Row is written before
+    it's read, so transaction starts with write: SQLite waits for other writers instead of failing at once
+    with "database is locked" and other databases keep the row locked until the end of transaction.
+    """
+    reviews = Review.objects.using(using).filter(pk=review_id)
+    if not reviews.update(rating=F('rating')):
+        return None
+    return reviews.values_list('movie_id', 'rating').first()
+
+
+@receiver(post_save, sender=Review)
+def add_review_rating(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    rating = (instance.movie_id, instance.rating)
+    stored_rating = None if created else getattr(instance, '_stored_rating', None)
+    if rating != stored_rating:
+        if stored_rating is not None:
+            MovieRatingStats.objects.add_rating(*stored_rating, count=-1)
+        MovieRatingStats.objects.add_rating(*rating)
+    instance._stored_rating = rating
+
+
+@receiver(post_delete, sender=Review)
+def remove_review_rating(sender, instance, **kwargs):
+    MovieRatingStats.objects.add_rating(*getattr(instance, '_stored_rating', (instance.movie_id, instance.rating)),
+                                        count=-1)
+
+
+class MovieDetailQuerySet(models.QuerySet):
+    def fresh(self):
+        """Return details fetched not earlier than OMDB_DETAILS_TTL seconds ago"""
+        return self.filter(fetched_at__gte=timezone.now() - timedelta(seconds=settings.OMDB_DETAILS_TTL))
+
+    def store(self, details):
+        """
+        Insert or update details of many movies using bulk queries.
+        :param details: Dict of OMDb movie data by imdbID.
+        """
+        now = timezone.now()
+        movies = [MovieDetail(imdb_id=imdb_id, data=json.dumps(data), fetched_at=now)
+                  for imdb_id, data in details.items()]
+        # Transaction starts with write, SQLite can't upgrade read transaction to write one while other
+        # connection writes and fails at once instead of waiting for it
+        with transaction.atomic():
+            self.bulk_create(movies, ignore_conflicts=True)
+            # Rows inserted above have the new fetched_at, the other ones existed before
+            existing_ids = set(self.filter(imdb_id__in=details).exclude(fetched_at=now)
+                               .values_list('imdb_id', flat=True))
+            self.bulk_update([movie for movie in movies if movie.imdb_id in existing_ids], ['data', 'fetched_at'])
+
+
+class MovieDetail(models.Model):
+    """Full movie data returned by OMDb for imdbID"""
+    imdb_id = models.CharField(max_length=IMDB_ID_MAX_LENGTH, primary_key=True)
+    data = models.TextField()
+    fetched_at = models.DateTimeField()
+
+    objects = MovieDetailQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            # Details stored since the last read are read by title suggestions
+            models.Index(fields=['fetched_at'], name='core_detail_fetched_at_idx'),
+        ]
+
+    @property
+    def details(self):
+        return json.loads(self.data)
+
+    def __str__(self):
+        return f'Details of {self.imdb_id} fetched at {self.fetched_at}'
+
+
+class CatalogueTitle(models.Model):
+    """Title imported from IMDb dataset dump, fields have the form of OMDb search results"""
+    imdb_id = models.CharField(max_length=IMDB_ID_MAX_LENGTH, primary_key=True)
+    title = models.CharField(max_length=500)
+    type = models.CharField(max_length=20)
+    year = models.CharField(max_length=20)
+    # OMDb genres joined by ', '
+    genre = models.CharField(max_length=200)
+
+    def as_search_result(self):
+        """Return OMDb search result of title enriched with genre, dumps don't have posters"""
+        return {'Title': self.title, 'Year': self.year, 'imdbID': self.imdb_id, 'Type': self.type, 'Poster': 'N/A',
+                'Genre': self.genre.split(', ')}
+
+    def __str__(self):
+        return f'{self.title} ({self.year})'
+
+
+class CatalogueWord(models.Model):
+    """Normalized word of catalogue title, titles are searched by their words"""
+    word = models.CharField(max_length=100)
+    title = models.ForeignKey(CatalogueTitle, related_name='words', on_delete=models.CASCADE)
+
+    class Meta:
+        # Titles having a word are read from this index only
+        unique_together = ['word', 'title']
+
+    def __str__(self):
+        return f'{self.word} in {self.title_id}'
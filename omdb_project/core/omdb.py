@@ -1,12 +1,63 @@
+from concurrent.futures import ThreadPoolExecutor
+from contextvars import copy_context
 from urllib import parse, request
 import json
+import logging
+import time
 
 from django.conf import settings
+from django.db import DatabaseError
+
+from core import catalogue
+from core import metrics
+from core import timing
+from core.models import MovieDetail
+from core.throttling import CircuitBreaker, TokenBucket
+from core.transport import get_transport
+
+logger = logging.getLogger(__name__)
+
+
+class OmdbAPIError(Exception):
+    """Base error for OMDb responses that can't be used"""
+
+
+class IncompleteSearchError(OmdbAPIError):
+    """Some pages of search could not be fetched. Movies from fetched pages are available in `movies`"""
+
+    def __init__(self, failed_pages, movies):
+        self.failed_pages = failed_pages
+        self.movies = movies
+        super().__init__(f'Failed to fetch search pages: {", ".join(map(str, failed_pages))}')
+
+
+class OmdbUnavailableError(OmdbAPIError):
+    """Request wasn't sent, because OMDb failed recently or request rate limit is exceeded"""
 
 
 class Omdb_API:
     OMDB_URL = "http://www.omdbapi.com/?"
     OMDB_API_KEY = settings.OMDB_API_KEY
+    MAX_CONCURRENCY = settings.OMDB_MAX_CONCURRENCY
+    REQUEST_TIMEOUT = settings.OMDB_REQUEST_TIMEOUT
+    TRANSPORT = settings.OMDB_TRANSPORT
+    NOT_FOUND_ERROR = 'Movie not found!'
+    RATE_LIMIT = settings.OMDB_RATE_LIMIT
+    RATE_LIMIT_BURST = settings.OMDB_RATE_LIMIT_BURST
+    RATE_LIMIT_PROCESSES = settings.OMDB_RATE_LIMIT_PROCESSES
+    CIRCUIT_FAILURE_THRESHOLD = settings.OMDB_CIRCUIT_FAILURE_THRESHOLD
+    CIRCUIT_RECOVERY_TIMEOUT = settings.OMDB_CIRCUIT_RECOVERY_TIMEOUT
+    LOCAL_CATALOGUE = settings.OMDB_LOCAL_CATALOGUE
+
+    def __init__(self):
+        self.transport = get_transport(self.TRANSPORT)
+        self.rate_limiter = self.circuit_breaker = None
+        if self.RATE_LIMIT is not None:
+            self.rate_limiter = TokenBucket('omdb:rate', self.RATE_LIMIT / self.RATE_LIMIT_PROCESSES,
+                                            self.RATE_LIMIT_BURST / self.RATE_LIMIT_PROCESSES)
+        if self.CIRCUIT_FAILURE_THRESHOLD is not None:
+            self.circuit_breaker = CircuitBreaker('omdb:circuit', self.CIRCUIT_FAILURE_THRESHOLD,
+                                                  self.CIRCUIT_RECOVERY_TIMEOUT, settings.OMDB_THROTTLING_CACHE)
 
     def search_movies(self, title, genre=None):
         """
@@ -14,49 +65,268 @@ class Omdb_API:
         :param genre: The genre of movies that should be returned.
         :return: List of searched movies
         """
-        # TODO async page request
-        # TODO async genre filtering
-        movies = self._get_movies_list(title)
-        self._add_genre_data_to_movies(movies)
+        movies = self._search_catalogue(title)
+        if movies is None:
+            movies = self._get_movies_list(title)
+            self._add_genre_data_to_movies(movies)
         if genre:
             filtered_movies = self._filter_movies_by_genre(movies, genre)
             return filtered_movies
         else:
             return movies
 
+    def search_movies_page(self, title, offset, limit):
+        """
+        Return part of search results, only OMDb pages containing requested movies are fetched
+        and only requested movies are enriched with genre.
+        :param offset: Position of first returned movie.
+        :param limit: Maximum number of returned movies.
+        :return: Tuple of movies list and total number of search results
+        """
+        movies = self._search_catalogue(title)
+        if movies is not None:
+            return movies[offset:offset + limit], len(movies)
+        params = {'s': title, 'apikey': self.OMDB_API_KEY}
+        first_page = offset // 10 + 1
+        last_page = (offset + limit - 1) // 10 + 1
+
+        response = self._check_search_response(self._run_query({**params, 'page': first_page}))
+        total_results = int(response['totalResults'])
+        if not response['Search']:
+            # Requested movies are after the last one, take total from the first page
+            if first_page > 1:
+                total_results = int(self._check_search_response(self._run_query(params))['totalResults'])
+            return [], total_results
+
+        rest_page_numbers = range(first_page + 1, min(last_page, self._page_count(response)) + 1)
+        pages = self._run_concurrently(lambda page: self._get_search_page(params, page), rest_page_numbers)
+        movies = self._join_pages(response['Search'], rest_page_numbers, pages)
+        start = offset - (first_page - 1) * 10
+        movies = movies[start:start + limit]
+        self._add_genre_data_to_movies(movies)
+        return movies, total_results
+
+    def iter_movies(self, title):
+        """
+        Yield searched movies enriched with genre. Movies of every page are yielded as soon as
+        the page and details of its movies are fetched, next pages are fetched in the meantime.
+        """
+        movies = self._search_catalogue(title)
+        if movies is not None:
+            yield from movies
+            return
+        params = {'s': title, 'apikey': self.OMDB_API_KEY}
+        response = self._check_search_response(self._run_query(params))
+        rest_page_numbers = range(2, self._page_count(response) + 1)
+
+        with ThreadPoolExecutor(max_workers=self.MAX_CONCURRENCY) as executor:
+            futures = [executor.submit(copy_context().run, self._get_search_page, params, page)
+                       for page in rest_page_numbers]
+            try:
+                self._add_genre_data_to_movies(response['Search'])
+                yield from response['Search']
+                for future in futures:
+                    movies = future.result()
+                    self._add_genre_data_to_movies(movies)
+                    yield from movies
+            finally:
+                for future in futures:
+                    future.cancel()
+
+    def _search_catalogue(self, title):
+        """
+        Return movies of title enriched with genre found in local catalogue,
+        None when catalogue isn't used or it has no movies of title, then they are searched in OMDb.
+        """
+        if not self.LOCAL_CATALOGUE:
+            return None
+        with timing.phase('catalogue'):
+            movies = catalogue.search(title)
+        metrics.CATALOGUE_LOOKUPS.inc(result='hit' if movies else 'miss')
+        return movies or None
+
     def _get_movies_list(self, title):
         """Return movies list with short description"""
         params = {'s': title, 'apikey': self.OMDB_API_KEY}
-        movies = []
 
-        response = self._run_query(params)
-        movies.extend(response['Search'])
+        response = self._check_search_response(self._run_query(params))
         rest_page_numbers = range(2, self._page_count(response) + 1)
 
-        for page in rest_page_numbers:
-            params['page'] = page
-            movies.extend(self._run_query(params)['Search'])
+        pages = self._run_concurrently(lambda page: self._get_search_page(params, page), rest_page_numbers)
+        return self._join_pages(response['Search'], rest_page_numbers, pages)
+
+    def _get_search_page(self, params, page):
+        return self._check_search_response(self._run_query({**params, 'page': page}))['Search']
+
+    def _check_search_response(self, response):
+        """
+        Return search response, OMDb answer that no movie was found is returned as empty search.
+        Raise OmdbAPIError for other errors, e.g. too many results.
+        """
+        if response.get('Response') == 'False':
+            if response.get('Error') == self.NOT_FOUND_ERROR:
+                return {**response, 'Search': [], 'totalResults': '0'}
+            raise OmdbAPIError(response.get('Error'))
+        return response
+
+    def _join_pages(self, first_page, page_numbers, pages):
+        """Return movies from all pages, raise IncompleteSearchError when any page is an exception"""
+        movies = list(first_page)
+        failed_pages = []
+        for page, result in zip(page_numbers, pages):
+            if isinstance(result, Exception):
+                failed_pages.append(page)
+            else:
+                movies.extend(result)
+        if failed_pages:
+            raise IncompleteSearchError(failed_pages, movies)
         return movies
 
     def _get_movie_genre(self, imdb_id):
+        return self._get_movies_details([imdb_id])[imdb_id]['Genre'].split(', ')
+
+    def _get_movies_details(self, imdb_ids):
+        """
+        Return dict of OMDb movie data by imdbID. Details are read from MovieDetail store,
+        only missing or outdated ones are fetched from OMDb and saved in store.
+        """
+        details, missing_ids = self._get_stored_details(imdb_ids)
+        results = self._run_concurrently(self._fetch_movie_details, missing_ids)
+        fetched_details = self._check_fetched_details(missing_ids, results)
+        if fetched_details:
+            self._store_details(fetched_details)
+        details.update(fetched_details)
+        return details
+
+    def _store_details(self, details):
+        """Save fetched details in store, search doesn't fail when they can't be saved, e.g. database is locked"""
+        try:
+            MovieDetail.objects.store(details)
+        except DatabaseError:
+            logger.warning('Failed to store details of %d movies', len(details), exc_info=True)
+
+    def _get_stored_details(self, imdb_ids):
+        """Return dict of fresh stored movie data by imdbID and list of imdbIDs missing in store"""
+        imdb_ids = list(dict.fromkeys(imdb_ids))
+        details = {movie.imdb_id: movie.details for movie in MovieDetail.objects.fresh().filter(imdb_id__in=imdb_ids)}
+        return details, [imdb_id for imdb_id in imdb_ids if imdb_id not in details]
+
+    def _check_fetched_details(self, imdb_ids, results):
+        """Return dict of fetched movie data by imdbID, raise OmdbAPIError when any result is an exception"""
+        errors = [f'{imdb_id} ({result})'
+                  for imdb_id, result in zip(imdb_ids, results) if isinstance(result, Exception)]
+        if errors:
+            raise OmdbAPIError(f'Failed to fetch details of movies: {", ".join(errors)}')
+        return dict(zip(imdb_ids, results))
+
+    def _fetch_movie_details(self, imdb_id):
+        """Return movie data from OMDb"""
         params = {'i': imdb_id, 'apikey': self.OMDB_API_KEY}
-        movie_data = self._run_query(params)
-        return movie_data['Genre'].split(', ')
+        return self._check_movie_data(self._run_query(params))
+
+    def _check_movie_data(self, movie_data):
+        if movie_data.get('Response') == 'False':
+            raise OmdbAPIError(movie_data.get('Error'))
+        return movie_data
 
     def _add_genre_data_to_movies(self, movies):
+        details = self._get_movies_details([movie["imdbID"] for movie in movies])
+        self._set_genres(movies, details)
+
+    def _set_genres(self, movies, details):
         for movie in movies:
-            movie['Genre'] = self._get_movie_genre(movie["imdbID"])
+            movie['Genre'] = details[movie["imdbID"]]['Genre'].split(', ')
 
-    def _filter_movies_by_genre(self, movies, genre):
-        """Return videos that match genre"""
+    def _filter_movies_by_genre(self, movies, genre, genre_index=None):
+        """
+        Return videos that match genre.
+        :param genre_index: Optional dict of movie positions by genre, it avoids checking every movie.
+        """
+        if genre_index is not None:
+            return [movies[position] for position in genre_index.get(genre, [])]
         return list(filter(lambda movie: genre in movie['Genre'], movies))
 
+    def _run_concurrently(self, func, items):
+        """
+        Call func for every item using at most MAX_CONCURRENCY threads, they run in copy of caller's context.
+        :return: List of results in items order. Exception raised for an item is put in place of its result.
+        """
+        items = list(items)
+        if not items:
+            return []
+        with ThreadPoolExecutor(max_workers=max(1, min(self.MAX_CONCURRENCY, len(items)))) as executor:
+            futures = [executor.submit(copy_context().run, func, item) for item in items]
+        results = []
+        for future in futures:
+            try:
+                results.append(future.result())
+            except Exception as e:
+                results.append(e)
+        return results
+
     def _run_query(self, params):
         """Return response for requested parameters"""
+        query_type = self._query_type(params)
+        wait = self._check_request_allowed(query_type)
+        if wait:
+            with timing.phase('omdb-wait'):
+                time.sleep(wait)
         querystring = parse.urlencode(params)
         url = self.OMDB_URL + querystring
-        resp = request.urlopen(url)
-        return json.loads(resp.read())
+        start = time.perf_counter()
+        try:
+            with timing.phase(f'omdb-{query_type}'):
+                if self.transport is not None:
+                    response = json.loads(self.transport.get(url))
+                else:
+                    response = json.loads(request.urlopen(url, timeout=self.REQUEST_TIMEOUT).read())
+        except (OSError, ValueError):
+            self._count_query(query_type, start, None)
+            self._record_result(success=False)
+            raise
+        self._count_query(query_type, start, response)
+        self._record_result(success=True)
+        return response
+
+    def _query_type(self, params):
+        """Return type of OMDb query used in metrics and request timing"""
+        return 'search' if 's' in params else 'details'
+
+    def _count_query(self, query_type, start, response):
+        """Count OMDb query and its duration in metrics, response is None when request failed"""
+        if response is None:
+            outcome = 'error'
+        elif response.get('Response') == 'False':
+            outcome = 'not_found' if response.get('Error') == self.NOT_FOUND_ERROR else 'omdb_error'
+        else:
+            outcome = 'success'
+        metrics.OMDB_REQUESTS.inc(type=query_type, outcome=outcome)
+        metrics.OMDB_REQUEST_DURATION.observe(time.perf_counter() - start, type=query_type)
+
+    def _check_request_allowed(self, query_type):
+        """
+        Return number of seconds to wait before request can be sent. Raise OmdbUnavailableError when
+        circuit is open or request couldn't be sent within REQUEST_TIMEOUT because of rate limit.
+        """
+        if self.circuit_breaker is not None and self.circuit_breaker.is_open():
+            metrics.OMDB_REQUESTS.inc(type=query_type, outcome='rejected')
+            raise OmdbUnavailableError('OMDb failed recently, requests are not sent for a while')
+        if self.rate_limiter is None:
+            return 0
+        wait = self.rate_limiter.reserve(max_wait=self.REQUEST_TIMEOUT)
+        if wait is None:
+            metrics.OMDB_REQUESTS.inc(type=query_type, outcome='rejected')
+            raise OmdbUnavailableError('Too many requests to OMDb')
+        return wait
+
+    def _record_result(self, success):
+        """Count failed request in circuit breaker or close it after successful one"""
+        if self.circuit_breaker is None:
+            return
+        if success:
+            self.circuit_breaker.record_success()
+        else:
+            self.circuit_breaker.record_failure()
 
     def _page_count(self, response):
         """Return numbers of pages for requested search"""
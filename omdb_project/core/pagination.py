@@ -0,0 +1,21 @@
+from rest_framework.pagination import CursorPagination, PageNumberPagination
+
+
+class DefaultPagination(PageNumberPagination):
+    """Numbered pages, client can choose number of items per page"""
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+
+
+class ReviewCursorPagination(CursorPagination):
+    """Pages of reviews in order of creation, reading next page costs the same as reading the first one"""
+    ordering = 'id'
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+
+
+class MovieListCursorPagination(CursorPagination):
+    """Pages of movies from list of one user, ordered by unique index of user and movie_id"""
+    ordering = 'movie_id'
+    page_size_query_param = 'page_size'
+    max_page_size = 100
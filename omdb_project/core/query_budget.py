@@ -0,0 +1,34 @@
+"""
+Maximum numbers of database queries of API endpoints, they mustn't depend on number of returned rows.
+View declares them in `query_budgets` dict by action, views which aren't viewsets by lower case HTTP method.
+Budgets include query of token authentication, which is cached for following requests, and savepoints.
+MetricsMiddleware logs requests over budget as warnings when QUERY_BUDGET_WARNINGS setting is True,
+tests assert budgets by core.tests.query_budget.QueryBudgetMixin.
+"""
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+def resolve_view(request):
+    """Return view class (None for function views), view name and action of viewset or HTTP method"""
+    match = request.resolver_match
+    if match is None:
+        return None, 'unresolved', request.method.lower()
+    view_class = getattr(match.func, 'cls', None) or getattr(match.func, 'view_class', None)
+    actions = getattr(match.func, 'actions', None) or {}
+    return (view_class,
+            view_class.__name__ if view_class else match.view_name,
+            actions.get(request.method.lower(), request.method.lower()))
+
+
+def get_budget(view_class, action):
+    """Return maximum number of queries of view action or None when it has no budget"""
+    return getattr(view_class, 'query_budgets', {}).get(action)
+
+
+def warn_over_budget(request, view_class, view_name, action, query_count):
+    budget = get_budget(view_class, action)
+    if budget is not None and query_count > budget:
+        logger.warning('%s %s (%s.%s) ran %d database queries, its budget is %d',
+                       request.method, request.path, view_name, action, query_count, budget)
@@ -0,0 +1,160 @@
+"""
+Import of many reviews of one user from CSV or newline delimited JSON file, like ratings exported from IMDb.
+Rows are read, validated and saved in batches, every batch in its own transaction, so memory use doesn't depend
+on file size. Reviews of movies already reviewed by the user are updated.
+"""
+from collections import Counter
+import csv
+import itertools
+import json
+
+from django.core.exceptions import ValidationError
+from django.db import transaction
+from django.db.models import F
+
+from core.models import MovieRatingStats, Review
+
+BATCH_SIZE = 500
+FORMATS = ('csv', 'ndjson')
+# Only the first errors are kept in report
+MAX_REPORTED_ERRORS = 100
+# Names of columns read to review fields, IMDb export has columns 'Const' and 'Your Rating'
+COLUMNS = {
+    'movie_id': ('movie_id', 'imdbID', 'Const'),
+    'rating': ('rating', 'Your Rating'),
+    'review': ('review',),
+}
+
+
+class ImportReport:
+    """Numbers of read rows and created, updated, unchanged and invalid reviews"""
+
+    def __init__(self):
+        self.rows = 0
+        self.created = 0
+        self.updated = 0
+        self.unchanged = 0
+        self.invalid = 0
+        self.errors = []
+
+    def add_error(self, row, message):
+        self.invalid += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append({'row': row, 'error': message})
+
+    def as_dict(self):
+        return {
+            'rows': self.rows,
+            'created': self.created,
+            'updated': self.updated,
+            'unchanged': self.unchanged,
+            'invalid': self.invalid,
+            'errors': self.errors,
+        }
+
+    def __str__(self):
+        return (f'{self.rows} rows: {self.created} created, {self.updated} updated, '
+                f'{self.unchanged} unchanged, {self.invalid} invalid')
+
+
+def format_of(file_name):
+    """Return format of file by its extension, CSV is the default"""
+    return 'ndjson' if file_name.lower().endswith(('.ndjson', '.jsonl')) else 'csv'
+
+
+def read_rows(file, file_format):
+    """
+    Yield rows of text file. Row which isn't valid JSON is yielded as None, file which can't be read further
+    ends with ValidationError.
+    """
+    try:
+        if file_format == 'csv':
+            yield from csv.DictReader(file)
+            return
+        for line in file:
+            if line.strip():
+                try:
+                    yield json.loads(line)
+                except ValueError:
+                    yield None
+    except (csv.Error, UnicodeDecodeError) as e:
+        yield ValidationError(f'File can not be read: {e}')
+
+
+def clean_row(row):
+    """Return movie_id, rating and review of row, raise ValidationError when they aren't valid"""
+    if isinstance(row, ValidationError):
+        raise row
+    if not isinstance(row, dict):
+        raise ValidationError('Row is not an object')
+    values = []
+    for name, columns in COLUMNS.items():
+        field = Review._meta.get_field(name)
+        value = next((row[column] for column in columns if row.get(column) not in (None, '')), '')
+        try:
+            value = field.clean(value, None)
+            if field.max_length and len(str(value)) > field.max_length:
+                raise ValidationError(f'Ensure this value has at most {field.max_length} characters.')
+        except ValidationError as e:
+            raise ValidationError(f"{name}: {' '.join(e.messages)}")
+        values.append(value)
+    return values
+
+
+def import_batch(user, numbered_rows, report):
+    """Validate rows and save them in one transaction with rating stats"""
+    reviews = {}
+    for number, row in numbered_rows:
+        try:
+            movie_id, rating, text = clean_row(row)
+        except ValidationError as e:
+            report.add_error(number, ' '.join(e.messages))
+            continue
+        # Later row of the same movie wins
+        reviews[movie_id] = Review(user=user, movie_id=movie_id, rating=rating, review=text)
+    report.rows += len(numbered_rows)
+    if not reviews:
+        return
+
+    new_reviews = []
+    changed_reviews = []
+    rating_counts = Counter()
+    with transaction.atomic():
+        stored_reviews = Review.objects.filter(user=user, movie_id__in=reviews)
+        # Stored reviews are claimed by write before they are read, so transaction starts with write: SQLite waits
+        # for other writers instead of failing at once with "database is locked", other databases lock the rows
+        stored_reviews.update(rating=F('rating'))
+        existing = {review.movie_id: review for review in stored_reviews}
+        for movie_id, review in reviews.items():
+            stored = existing.get(movie_id)
+            if stored is None:
+                new_reviews.append(review)
+                rating_counts[movie_id, review.rating] += 1
+            elif (stored.rating, stored.review) != (review.rating, review.review):
+                rating_counts[movie_id, stored.rating] -= 1
+                rating_counts[movie_id, review.rating] += 1
+                stored.rating, stored.review = review.rating, review.review
+                changed_reviews.append(stored)
+        # Bulk queries don't send signals keeping rating stats, they are updated here
+        Review.objects.bulk_create(new_reviews)
+        Review.objects.bulk_update(changed_reviews, ['rating', 'review'])
+        MovieRatingStats.objects.add_ratings(rating_counts)
+    report.created += len(new_reviews)
+    report.updated += len(changed_reviews)
+    report.unchanged += len(reviews) - len(new_reviews) - len(changed_reviews)
+
+
+def import_reviews(user, file, file_format, batch_size=BATCH_SIZE, progress=None):
+    """
+    Save reviews of user read from text file and return ImportReport.
+    :param progress: Function called with report after every batch.
+    """
+    report = ImportReport()
+    rows = enumerate(read_rows(file, file_format), start=1)
+    while True:
+        batch = list(itertools.islice(rows, batch_size))
+        if not batch:
+            return report
+        import_batch(user, batch, report)
+        if progress:
+            progress(report)
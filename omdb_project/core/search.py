@@ -0,0 +1,324 @@
+"""
+Cached movie searches. Full search result is cached once per normalized title together with
+index of movie positions by genre, so requests for different genres are answered from the same entry.
+When result is missing only one caller searches OMDb, others wait for its result.
+Result older than SEARCH_FRESH_TIMEOUT is still returned, but it's searched again in background thread.
+Titles not found by OMDb and failed searches are cached for a short time, so they don't query OMDb on every request.
+"""
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from urllib import parse
+import asyncio
+import threading
+import time
+import uuid
+import weakref
+
+from asgiref.sync import sync_to_async
+from django.core.cache import cache
+from django.db import connections
+
+from core import metrics
+from core import suggest
+from core import timing
+from core.async_omdb import AsyncOmdb_API
+from core.omdb import Omdb_API, OmdbAPIError
+from core.search_result import SearchResult
+
+# Result is searched again in background after SEARCH_FRESH_TIMEOUT and removed after SEARCH_CACHE_TIMEOUT
+SEARCH_FRESH_TIMEOUT = 60 * 60
+SEARCH_CACHE_TIMEOUT = 24 * 60 * 60
+NOT_FOUND_CACHE_TIMEOUT = 10 * 60
+SEARCH_ERROR_CACHE_TIMEOUT = 30
+# Longest time one search may hold lock, after that waiting callers search by themselves
+SEARCH_LOCK_TIMEOUT = 60
+# How often callers waiting for search in other process check cache
+SEARCH_WAIT_INTERVAL = 0.1
+
+
+class SearchEntry:
+    """Cached search result or message of error raised by search"""
+
+    def __init__(self, result=None, error=None):
+        self.result = result
+        self.error = error
+        if error is not None:
+            self.timeout = self.fresh_timeout = SEARCH_ERROR_CACHE_TIMEOUT
+        elif not result:
+            self.timeout = self.fresh_timeout = NOT_FOUND_CACHE_TIMEOUT
+        else:
+            self.timeout, self.fresh_timeout = SEARCH_CACHE_TIMEOUT, SEARCH_FRESH_TIMEOUT
+        self.fresh_until = time.time() + self.fresh_timeout
+
+    def is_stale(self):
+        return time.time() > self.fresh_until
+
+    def get_result(self):
+        """Return search result, raise OmdbAPIError when search failed"""
+        if self.error is not None:
+            raise OmdbAPIError(self.error)
+        return self.result
+
+    def __reduce__(self):
+        return _restore_entry, (self.result, self.error, self.timeout, self.fresh_timeout, self.fresh_until)
+
+
+def _restore_entry(result, error, timeout, fresh_timeout, fresh_until):
+    """
+    Return unpickled SearchEntry. Its result is None when it was encoded in other format version,
+    then entry is restored as None, so it's treated as missing in cache.
+    """
+    if result is None and error is None:
+        return None
+    entry = SearchEntry.__new__(SearchEntry)
+    entry.result, entry.error = result, error
+    entry.timeout, entry.fresh_timeout, entry.fresh_until = timeout, fresh_timeout, fresh_until
+    return entry
+
+
+_refresh_executor = ThreadPoolExecutor(max_workers=4, thread_name_prefix='search-refresh')
+
+
+def normalize_title(title):
+    """Return title in form used as cache key, OMDb search ignores case and extra whitespaces"""
+    return ' '.join(title.lower().split())
+
+
+def search_cache_key(title):
+    # Quoted, because memcached doesn't allow whitespaces in keys
+    return f'search:{parse.quote(normalize_title(title))}'
+
+
+def search_movies(title, genre=None):
+    """
+    :param title: Movie title to search for.
+    :param genre: The genre of movies that should be returned.
+    :return: List of searched movies
+    """
+    return _filter_result(_get_result(title), genre)
+
+
+def search_movies_page(title, genre=None, offset=0, limit=10):
+    """
+    Return part of search results and total number of results. When full result isn't cached and genre
+    isn't requested only OMDb pages containing requested movies are fetched.
+    """
+    if not genre and cache.get(search_cache_key(title)) is None:
+        metrics.SEARCH_CACHE_LOOKUPS.inc(result='miss')
+        # Not found titles and errors are cached by full search only
+        return Omdb_API().search_movies_page(normalize_title(title), offset, limit)
+    result = _get_result(title)
+    if genre:
+        positions = result.genres.get(genre, [])
+        return [result[position] for position in positions[offset:offset + limit]], len(positions)
+    return result[offset:offset + limit], len(result)
+
+
+def iter_movies(title, genre=None):
+    """
+    Yield searched movies as they are fetched from OMDb. Cached result is used when it's available,
+    otherwise full result is cached after all movies are fetched.
+    """
+    key = search_cache_key(title)
+    entry = cache.get(key)
+    metrics.SEARCH_CACHE_LOOKUPS.inc(result='miss' if entry is None else 'hit')
+    if entry is not None:
+        if entry.is_stale():
+            _refresh_in_background(title)
+        yield from _filter_result(entry.get_result(), genre)
+        return
+
+    movies = []
+    for movie in Omdb_API().iter_movies(normalize_title(title)):
+        movies.append(movie)
+        if not genre or genre in movie['Genre']:
+            yield movie
+    entry = SearchEntry(SearchResult(movies))
+    cache.set(key, entry, entry.timeout)
+
+
+async def async_search_movies(title, genre=None):
+    """Coroutine version of search_movies, OMDb is queried by AsyncOmdb_API"""
+    api = AsyncOmdb_API()
+    entry = await async_single_flight(search_cache_key(title), partial(_async_search_all_genres, api, title),
+                                      timeout=_entry_timeout)
+    if entry.is_stale():
+        await sync_to_async(_refresh_in_background)(title)
+    return _filter_result(entry.get_result(), genre)
+
+
+def _get_result(title):
+    entry = single_flight(search_cache_key(title), partial(_search_all_genres, Omdb_API(), title),
+                          timeout=_entry_timeout)
+    if entry.is_stale():
+        _refresh_in_background(title)
+    return entry.get_result()
+
+
+def _entry_timeout(entry):
+    return entry.timeout
+
+
+def _refresh_in_background(title):
+    """Search stale title again in background thread, unless it's already searched by other thread or process"""
+    metrics.SEARCH_CACHE_LOOKUPS.inc(result='stale')
+    lock_key = f'refresh:{search_cache_key(title)}'
+    if cache.add(lock_key, True, SEARCH_LOCK_TIMEOUT):
+        _refresh_executor.submit(_refresh, title, lock_key)
+
+
+def _refresh(title, lock_key):
+    try:
+        entry = _search_all_genres(Omdb_API(), title)
+        if entry.error is None:
+            cache.set(search_cache_key(title), entry, entry.timeout)
+            cache.delete(lock_key)
+        else:
+            # Stale result is still returned, search is tried again after error timeout
+            cache.set(lock_key, True, SEARCH_ERROR_CACHE_TIMEOUT)
+    finally:
+        connections.close_all()
+
+
+def _filter_result(result, genre):
+    """Return movies of genre, only they are decoded when result was read from shared cache"""
+    with timing.phase('filter'):
+        if genre:
+            return [result[position] for position in result.genres.get(genre, [])]
+        return result.movies
+
+
+def _search_all_genres(api, title):
+    """Return SearchEntry of search result or error, errors of OMDb and connection to it are cached too"""
+    try:
+        movies = api.search_movies(normalize_title(title))
+    except (OmdbAPIError, OSError) as e:
+        return SearchEntry(error=str(e))
+    suggest.index.add(movies)
+    return SearchEntry(SearchResult(movies))
+
+
+async def _async_search_all_genres(api, title):
+    try:
+        movies = await api.search_movies(normalize_title(title))
+    except (OmdbAPIError, OSError) as e:
+        return SearchEntry(error=str(e))
+    # Words of titles are sorted and merged into index, which mustn't block event loop
+    await sync_to_async(suggest.index.add)(movies)
+    return SearchEntry(SearchResult(movies))
+
+
+class _Call:
+    """Computation of value for key run by one thread of this process"""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+_calls = {}
+_calls_lock = threading.Lock()
+
+
+def single_flight(key, func, timeout):
+    """
+    Return cached value of key. When it's missing value is computed by func and cached for timeout seconds,
+    timeout can be also function returning them for computed value.
+    Only one caller computes value at a time: threads of this process wait for the running call,
+    other processes wait for lock stored in cache to be released.
+    """
+    with _calls_lock:
+        call = _calls.get(key)
+        is_leader = call is None
+        if is_leader:
+            call = _calls[key] = _Call()
+
+    if not is_leader:
+        metrics.SEARCH_CACHE_LOOKUPS.inc(result='coalesced')
+        call.done.wait()
+        if call.error:
+            raise call.error
+        return call.result
+
+    try:
+        call.result = _get_or_compute(key, func, timeout)
+    except Exception as e:
+        call.error = e
+        raise
+    finally:
+        with _calls_lock:
+            del _calls[key]
+        call.done.set()
+    return call.result
+
+
+def _get_or_compute(key, func, timeout):
+    lock_key = f'lock:{key}'
+    token = uuid.uuid4().hex
+    deadline = time.monotonic() + SEARCH_LOCK_TIMEOUT
+    while True:
+        value = cache.get(key)
+        if value is not None:
+            metrics.SEARCH_CACHE_LOOKUPS.inc(result='hit')
+            return value
+        if cache.add(lock_key, token, SEARCH_LOCK_TIMEOUT) or time.monotonic() > deadline:
+            break
+        time.sleep(SEARCH_WAIT_INTERVAL)
+
+    try:
+        # Value could be cached by other process just before lock was acquired
+        value = cache.get(key)
+        metrics.SEARCH_CACHE_LOOKUPS.inc(result='miss' if value is None else 'hit')
+        if value is None:
+            value = func()
+            cache.set(key, value, timeout(value) if callable(timeout) else timeout)
+        return value
+    finally:
+        if cache.get(lock_key) == token:
+            cache.delete(lock_key)
+
+
+_async_calls = weakref.WeakKeyDictionary()
+
+
+async def async_single_flight(key, func, timeout):
+    """
+    Coroutine version of single_flight, func is coroutine function.
+    Callers running on the same event loop await one task computing value.
+    """
+    calls = _async_calls.setdefault(asyncio.get_running_loop(), {})
+    task = calls.get(key)
+    if task is not None:
+        metrics.SEARCH_CACHE_LOOKUPS.inc(result='coalesced')
+    else:
+        task = calls[key] = asyncio.ensure_future(_async_get_or_compute(key, func, timeout))
+        task.add_done_callback(lambda _: calls.pop(key, None))
+    # Cancelled caller must not cancel computation awaited by others
+    return await asyncio.shield(task)
+
+
+async def _async_get_or_compute(key, func, timeout):
+    lock_key = f'lock:{key}'
+    token = uuid.uuid4().hex
+    deadline = time.monotonic() + SEARCH_LOCK_TIMEOUT
+    while True:
+        value = await sync_to_async(cache.get)(key)
+        if value is not None:
+            metrics.SEARCH_CACHE_LOOKUPS.inc(result='hit')
+            return value
+        if await sync_to_async(cache.add)(lock_key, token, SEARCH_LOCK_TIMEOUT) or time.monotonic() > deadline:
+            break
+        await asyncio.sleep(SEARCH_WAIT_INTERVAL)
+
+    try:
+        # Value could be cached by other process just before lock was acquired
+        value = await sync_to_async(cache.get)(key)
+        metrics.SEARCH_CACHE_LOOKUPS.inc(result='miss' if value is None else 'hit')
+        if value is None:
+            value = await func()
+            await sync_to_async(cache.set)(key, value, timeout(value) if callable(timeout) else timeout)
+        return value
+    finally:
+        if await sync_to_async(cache.get)(lock_key) == token:
+            await sync_to_async(cache.delete)(lock_key)
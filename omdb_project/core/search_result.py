@@ -0,0 +1,99 @@
+"""
+Search result kept in cache. When it's pickled by cache backend it's stored in compact encoding:
+OMDb keys are written once for all movies and payload bigger than COMPRESS_THRESHOLD bytes is compressed.
+Decoded result builds movie dicts only when they are accessed, so filtering by genre or reading one page
+decodes only returned movies.
+"""
+import pickle
+import zlib
+
+# Increase when encoding changes, results encoded by other version are treated as missing in cache
+FORMAT_VERSION = 1
+COMPRESS_THRESHOLD = 1024
+_RAW = 0
+_ZLIB = 1
+
+
+def genre_index(movies):
+    """Return dict of movie positions by genre"""
+    index = {}
+    for position, movie in enumerate(movies):
+        for genre in movie['Genre']:
+            index.setdefault(genre, []).append(position)
+    return index
+
+
+class SearchResult:
+    """
+    Movies found for title with index of their positions by genre.
+    Supports len() and indexing by position or slice like list of movies.
+    """
+
+    def __init__(self, movies):
+        self._movies = list(movies)
+        self._keys = list(self._movies[0]) if self._movies else []
+        self._rows = None
+        self._all_decoded = True
+        self.genres = genre_index(self._movies)
+
+    @classmethod
+    def _from_rows(cls, keys, rows):
+        result = cls.__new__(cls)
+        result._movies = [None] * len(rows)
+        result._keys = keys
+        result._rows = rows
+        result._all_decoded = False
+        genre_column = keys.index('Genre') if 'Genre' in keys else None
+        result.genres = {}
+        for position, row in enumerate(rows):
+            genres = row[genre_column] if isinstance(row, list) else row['Genre']
+            for genre in genres:
+                result.genres.setdefault(genre, []).append(position)
+        return result
+
+    @property
+    def movies(self):
+        """List of all movies"""
+        if not self._all_decoded:
+            keys = self._keys
+            self._movies = [dict(zip(keys, row)) if movie is None and isinstance(row, list)
+                            else row if movie is None else movie
+                            for movie, row in zip(self._movies, self._rows)]
+            self._all_decoded = True
+        return self._movies
+
+    def __len__(self):
+        return len(self._movies)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[position] for position in range(*index.indices(len(self)))]
+        movie = self._movies[index]
+        if movie is None:
+            row = self._rows[index]
+            movie = self._movies[index] = dict(zip(self._keys, row)) if isinstance(row, list) else row
+        return movie
+
+    def __eq__(self, other):
+        return isinstance(other, SearchResult) and self.movies == other.movies
+
+    def __reduce__(self):
+        return decode, (self.encode(),)
+
+    def encode(self):
+        """Return result as bytes: format version, compression flag and pickled keys and rows of movies"""
+        # Movie with other keys than the first one is stored as dict
+        rows = [[movie[key] for key in self._keys] if list(movie) == self._keys else movie for movie in self.movies]
+        payload = pickle.dumps((self._keys, rows), pickle.HIGHEST_PROTOCOL)
+        if len(payload) > COMPRESS_THRESHOLD:
+            return bytes([FORMAT_VERSION, _ZLIB]) + zlib.compress(payload)
+        return bytes([FORMAT_VERSION, _RAW]) + payload
+
+
+def decode(data):
+    """Return SearchResult encoded by SearchResult.encode or None when it was encoded in other format version"""
+    if data[0] != FORMAT_VERSION:
+        return None
+    payload = zlib.decompress(data[2:]) if data[1] == _ZLIB else data[2:]
+    keys, rows = pickle.loads(payload)
+    return SearchResult._from_rows(keys, rows)
@@ -0,0 +1,252 @@
+"""
+Title suggestions answered from memory of each process, without requests to OMDb. Index has titles of searched
+movies and of movie details stored by all processes, which are read in background thread every
+SUGGEST_REFRESH_INTERVAL seconds, so requests don't wait for them. It keeps at most SUGGEST_MAX_TITLES titles,
+the least recently seen are removed. Titles are found by prefixes of their words, normalized like in local
+catalogue, so case and diacritics are ignored. Every process starts reading titles at its first request, not while
+application is loaded, because process forked after loading (like gunicorn --preload workers) doesn't run threads
+of its parent.
+"""
+from bisect import bisect_left, insort
+from collections import OrderedDict
+from itertools import chain, islice
+import heapq
+import json
+import logging
+import os
+import threading
+import time
+
+from django.conf import settings
+from django.core.signals import request_started
+from django.db import DatabaseError, connection
+
+from core.catalogue import title_words
+from core.models import MovieDetail
+
+logger = logging.getLogger(__name__)
+
+LIMIT = 10
+# Titles matching the query found first, which are then ranked, and words read at most to find them,
+# prefixes of very common words match too many of them
+MAX_CANDIDATES = 200
+MAX_SCANNED_WORDS = 1000
+# New words are kept in small sorted list, which is merged into sorted words when it has this many of them
+MAX_PENDING_WORDS = 10000
+# Greater than any character of words, words starting with a prefix are sorted before the prefix followed by it
+MAX_CHAR = chr(0x10ffff)
+
+
+class Title:
+    __slots__ = ('imdb_id', 'title', 'year', 'type', 'words', 'normalized', 'word_starts')
+
+    def __init__(self, movie):
+        self.imdb_id = movie['imdbID']
+        self.title = movie['Title']
+        self.year = movie.get('Year')
+        self.type = movie.get('Type')
+        self.words = title_words(self.title)
+        self.normalized = ' '.join(self.words)
+        # Word prefix is found by substring search of ' ' and the prefix
+        self.word_starts = ' ' + self.normalized
+
+    def as_suggestion(self):
+        return {'imdbID': self.imdb_id, 'Title': self.title, 'Year': self.year, 'Type': self.type}
+
+
+class TitleIndex:
+    """
+    Titles by imdbID in order of last addition and sorted lists of (word, imdbID) searched by word prefix: all words
+    and small list of pending words added since they were merged. Merged list is made without lock and swapped in,
+    searches read the old one in the meantime. Words of removed or changed titles are left in the list and skipped,
+    until they are the half of it.
+    """
+
+    def __init__(self, max_titles, refresh_interval, background=True):
+        """
+        :param background: Whether refresh due at search is run in other thread, otherwise search waits for it.
+        """
+        self.max_titles = max_titles
+        self.refresh_interval = refresh_interval
+        self.background = background
+        self._titles = OrderedDict()
+        self._words = []
+        self._pending_words = []
+        self._stale_words = 0
+        self._lock = threading.Lock()
+        self._merge_lock = threading.Lock()
+        self._refresh_lock = threading.Lock()
+        self._refreshed_at = None
+        self._stored_since = None
+
+    def add(self, movies):
+        """Add titles of OMDb movie data, titles already in index are moved to its end"""
+        new_words = []
+        with self._lock:
+            for movie in movies:
+                if not movie.get('imdbID') or not movie.get('Title'):
+                    continue
+                title = Title(movie)
+                stored = self._titles.pop(title.imdb_id, None)
+                if stored is None or stored.words != title.words:
+                    new_words.extend((word, title.imdb_id) for word in title.words)
+                    if stored is not None:
+                        self._stale_words += len(stored.words)
+                self._titles[title.imdb_id] = title
+            while len(self._titles) > self.max_titles:
+                imdb_id, title = self._titles.popitem(last=False)
+                self._stale_words += len(title.words)
+            if len(self._pending_words) + len(new_words) < MAX_PENDING_WORDS:
+                for word in new_words:
+                    insort(self._pending_words, word)
+                return
+        self._merge(new_words)
+
+    def search(self, query, limit=LIMIT):
+        """Return suggestions of titles having words starting with every word of query"""
+        words = title_words(query)
+        if not words:
+            return []
+        normalized_query = ' '.join(words)
+        found = {}
+        with self._lock:
+            word_lists = (self._words, self._pending_words)
+            # Only words having the prefix matched by the fewest words are read, other prefixes are checked in titles
+            ranges = {word: [(bisect_left(word_list, (word,)), bisect_left(word_list, (word + MAX_CHAR,)))
+                             for word_list in word_lists]
+                      for word in words}
+            key_word = min(words, key=lambda word: sum(end - start for start, end in ranges[word]))
+            other_prefixes = [' ' + word for word in words if word != key_word]
+            matching_words = chain.from_iterable(word_list[start:min(end, start + MAX_SCANNED_WORDS)]
+                                                 for word_list, (start, end) in zip(word_lists, ranges[key_word]))
+            titles_by_id = self._titles
+            for word, imdb_id in islice(matching_words, MAX_SCANNED_WORDS):
+                title = titles_by_id.get(imdb_id)
+                if title is None or imdb_id in found or word not in title.words:
+                    continue
+                for prefix in other_prefixes:
+                    if prefix not in title.word_starts:
+                        break
+                else:
+                    found[imdb_id] = title
+                    if len(found) >= MAX_CANDIDATES:
+                        break
+        # Titles starting with the query first, then the shortest ones
+        titles = sorted(found.values(), key=lambda title: (not title.normalized.startswith(normalized_query),
+                                                           len(title.normalized), title.normalized))
+        return [title.as_suggestion() for title in titles[:limit]]
+
+    def _merge(self, new_words):
+        """Merge pending and new words into new sorted list of words, lock is held only to read and swap lists"""
+        with self._merge_lock:
+            with self._lock:
+                words, pending_words, stale_words = self._words, list(self._pending_words), self._stale_words
+            titles = self._titles
+            if stale_words * 2 > len(words):
+                # Words of title removed and added again are there twice
+                words = dict.fromkeys((word, imdb_id) for word, imdb_id in words
+                                      if word in getattr(titles.get(imdb_id), 'words', ()))
+            else:
+                stale_words = 0
+            merged_words = list(heapq.merge(words, pending_words, sorted(new_words)))
+            with self._lock:
+                # Words added while the list was merged stay pending
+                merged_pending_words = set(pending_words)
+                self._pending_words = [word for word in self._pending_words if word not in merged_pending_words]
+                self._words = merged_words
+                self._stale_words -= stale_words
+
+    def refresh(self):
+        """
+        Add titles of movie details stored since the last refresh, the first refresh reads the newest ones.
+        Only one thread refreshes index, others use it as it is in the meantime.
+        """
+        if not self._refresh_lock.acquire(blocking=False):
+            return
+        try:
+            self._refresh()
+        finally:
+            self._refresh_lock.release()
+
+    def refresh_in_background(self):
+        """Start refresh in other thread and return it, None is returned when other thread refreshes index"""
+        if not self._refresh_lock.acquire(blocking=False):
+            return None
+        thread = threading.Thread(target=self._refresh_in_thread, name='suggest-refresh', daemon=True)
+        thread.start()
+        return thread
+
+    def _refresh_in_thread(self):
+        try:
+            self._refresh()
+        except DatabaseError:
+            # Refresh is tried again after refresh interval
+            self._refreshed_at = time.monotonic()
+            logger.warning('Failed to refresh title index', exc_info=True)
+        finally:
+            self._refresh_lock.release()
+            connection.close()
+
+    def _refresh(self):
+        details = MovieDetail.objects.order_by('-fetched_at').values_list('data', 'fetched_at')
+        if self._stored_since is not None:
+            # Details stored at the same time as the last read one may have been saved after the read
+            details = details.filter(fetched_at__gte=self._stored_since)
+        movies = []
+        stored_since = self._stored_since
+        for data, fetched_at in details[:self.max_titles].iterator():
+            if not movies:
+                stored_since = fetched_at
+            movie = json.loads(data)
+            movies.append({key: movie.get(key) for key in ('imdbID', 'Title', 'Year', 'Type')})
+        # The newest titles are removed last
+        self.add(reversed(movies))
+        self._stored_since = stored_since
+        self._refreshed_at = time.monotonic()
+
+    def refresh_if_due(self):
+        """Refresh index when it's due, in background index is searched as it is until refresh ends"""
+        if self._refreshed_at is None or time.monotonic() - self._refreshed_at >= self.refresh_interval:
+            if self.background:
+                self.refresh_in_background()
+            else:
+                self.refresh()
+
+    def reset_after_fork(self):
+        """Refresh index again in forked process, titles are kept"""
+        # Locks could be held by other threads of parent process while it was forked, refresh running there
+        # never ends in this process
+        self._lock = threading.Lock()
+        self._merge_lock = threading.Lock()
+        self._refresh_lock = threading.Lock()
+        self._refreshed_at = None
+
+    def clear(self):
+        with self._lock:
+            self._titles.clear()
+            self._words = []
+            self._pending_words = []
+            self._stale_words = 0
+            self._refreshed_at = self._stored_since = None
+
+    def __len__(self):
+        return len(self._titles)
+
+
+index = TitleIndex(settings.SUGGEST_MAX_TITLES, settings.SUGGEST_REFRESH_INTERVAL)
+os.register_at_fork(after_in_child=index.reset_after_fork)
+
+
+def refresh_at_first_request(**kwargs):
+    """
+    Receiver of request_started starting refresh of index at the first request of process, so titles are read
+    before the first suggestion request
+    """
+    request_started.disconnect(refresh_at_first_request)
+    index.refresh_if_due()
+
+
+def suggest(query, limit=LIMIT):
+    """Return suggestions of titles for query, index is refreshed from stored details when it's due"""
+    index.refresh_if_due()
+    return index.search(query, limit)
@@ -0,0 +1,80 @@
+"""
+Cold searches of different titles sent at once by many threads to the app using migrated SQLite database file
+and cache settings of the project. Tests run it in separate process, because their database is kept in memory,
+where concurrent writers don't lock each other like in database file. Status codes and errors of responses
+and number of movie details which couldn't be saved are printed as JSON.
+    python -m core.tests.concurrent_searches [--threads 16] [--results 10]
+"""
+import argparse
+import json
+import logging
+import os
+import tempfile
+import threading
+
+import django
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'omdb_project.settings')
+django.setup()
+
+from django.contrib.auth import get_user_model  # noqa: E402
+from django.db import connection  # noqa: E402
+from django.test import Client  # noqa: E402
+from django.test.utils import setup_test_environment  # noqa: E402
+from rest_framework.authtoken.models import Token  # noqa: E402
+
+from core.omdb import Omdb_API  # noqa: E402
+from core.tests.fake_omdb_server import FakeOmdbServer  # noqa: E402
+
+
+class CountingHandler(logging.Handler):
+    def __init__(self):
+        super().__init__()
+        self.count = 0
+
+    def emit(self, record):
+        self.count += 1
+
+
+def search_concurrently(threads, results):
+    """Return list of status code and error message (None for success) of every search"""
+    user = get_user_model().objects.create_user(username='concurrent', password='password')
+    token_key = Token.objects.create(user=user).key
+    catalogue = {f'Title {number}': results for number in range(threads)}
+    responses = []
+    barrier = threading.Barrier(threads)
+
+    def search(number):
+        client = Client(HTTP_AUTHORIZATION=f'Token {token_key}')
+        barrier.wait()
+        response = client.get('/api/movie/', {'title': f'Title {number}'})
+        responses.append([response.status_code, None if response.status_code == 200 else response.json()])
+
+    with FakeOmdbServer(latency=0.01, catalogue=catalogue) as server:
+        Omdb_API.OMDB_URL = server.url
+        search_threads = [threading.Thread(target=search, args=(number,)) for number in range(threads)]
+        for thread in search_threads:
+            thread.start()
+        for thread in search_threads:
+            thread.join()
+    return responses
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--threads', type=int, default=16)
+    parser.add_argument('--results', type=int, default=10, help='Number of movies found for every title')
+    args = parser.parse_args()
+
+    setup_test_environment()
+    with tempfile.TemporaryDirectory() as directory:
+        connection.settings_dict['TEST']['NAME'] = os.path.join(directory, 'concurrent_searches.sqlite3')
+        connection.creation.create_test_db(verbosity=0)
+        store_failures = CountingHandler()
+        logging.getLogger('core.omdb').addHandler(store_failures)
+        responses = search_concurrently(args.threads, args.results)
+        print(json.dumps({'responses': responses, 'store_failures': store_failures.count}))
+
+
+if __name__ == '__main__':
+    main()
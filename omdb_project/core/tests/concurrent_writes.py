@@ -0,0 +1,131 @@
+"""
+Requests writing the same rows sent at once by many threads to the app using migrated SQLite database file.
+Tests run it in separate process, because their database is kept in memory, where concurrent writers don't lock
+each other like in database file. Every user sends `--requests` requests of the scenario at once, status codes
+and errors of responses and whether rating stats match saved reviews are printed as JSON.
+    python -m core.tests.concurrent_writes review-update [--users 16] [--requests 5]
+"""
+import argparse
+import json
+import os
+import tempfile
+import threading
+
+import django
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'omdb_project.settings')
+django.setup()
+
+from django.contrib.auth import get_user_model  # noqa: E402
+from django.core.files.uploadedfile import SimpleUploadedFile  # noqa: E402
+from django.db import connection  # noqa: E402
+from django.db.models import Count, Sum  # noqa: E402
+from django.test import Client  # noqa: E402
+from django.test.utils import setup_test_environment  # noqa: E402
+from rest_framework.authtoken.models import Token  # noqa: E402
+
+from core.models import FavouriteMovie, MovieRatingStats, Review  # noqa: E402
+
+MOVIE_ID = 'tt0000001'
+BULK_MOVIE_IDS = [f'tt{number:07d}' for number in range(20)]
+
+
+def update_review(client, user, number):
+    review = Review.objects.get(user=user)
+    return client.put(f'/api/movie/review/{review.pk}/', {'movie_id': MOVIE_ID, 'rating': number % 10 + 1},
+                      content_type='application/json')
+
+
+def delete_review(client, user, number):
+    review = Review.objects.get(user=user)
+    return client.delete(f'/api/movie/review/{review.pk}/')
+
+
+def bulk_add_favourites(client, user, number):
+    return client.post('/api/movie/favourite/bulk-add/', {'movie_ids': BULK_MOVIE_IDS[number:]},
+                       content_type='application/json')
+
+
+def bulk_remove_favourites(client, user, number):
+    return client.post('/api/movie/favourite/bulk-remove/', {'movie_ids': BULK_MOVIE_IDS[number:]},
+                       content_type='application/json')
+
+
+def import_reviews(client, user, number):
+    rows = ''.join(f'{movie_id},{(number + index) % 10 + 1},\n' for index, movie_id in enumerate(BULK_MOVIE_IDS))
+    file = SimpleUploadedFile('reviews.csv', f'movie_id,rating,review\n{MOVIE_ID},{number + 1},\n{rows}'.encode())
+    return client.post('/api/movie/review/import/', {'file': file})
+
+
+# Request sent by every thread and statuses of its successful responses
+SCENARIOS = {
+    'review-update': (update_review, {200}),
+    'review-delete': (delete_review, {204, 404}),
+    'bulk-add': (bulk_add_favourites, {200}),
+    'bulk-remove': (bulk_remove_favourites, {200}),
+    'review-import': (import_reviews, {200}),
+}
+
+
+def create_users(count):
+    """Return users with tokens, every one with review of the same movie and half of bulk movies in favourites"""
+    users = []
+    for number in range(count):
+        user = get_user_model().objects.create_user(username=f'concurrent{number}', password='password')
+        Review.objects.create(user=user, movie_id=MOVIE_ID, rating=5)
+        FavouriteMovie.objects.bulk_create(FavouriteMovie(user=user, movie_id=movie_id)
+                                           for movie_id in BULK_MOVIE_IDS[::2])
+        users.append((user, Token.objects.create(user=user).key))
+    return users
+
+
+def send_concurrently(send, users, requests):
+    """Return list of status code and error message (None for success) of every request"""
+    responses = []
+    barrier = threading.Barrier(len(users) * requests)
+
+    def run(user, token_key, number):
+        client = Client(HTTP_AUTHORIZATION=f'Token {token_key}')
+        barrier.wait()
+        try:
+            response = send(client, user, number)
+        except Exception as e:
+            responses.append([500, f'{type(e).__name__}: {e}'])
+        else:
+            responses.append([response.status_code, None])
+
+    threads = [threading.Thread(target=run, args=(user, token_key, number))
+               for user, token_key in users for number in range(requests)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return responses
+
+
+def stats_match_reviews():
+    reviews = Review.objects.filter(movie_id=MOVIE_ID).aggregate(count=Count('id'), rating_sum=Sum('rating'))
+    stats = MovieRatingStats.objects.get(movie_id=MOVIE_ID)
+    return (stats.count, stats.rating_sum) == (reviews['count'], reviews['rating_sum'] or 0)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('scenario', choices=SCENARIOS)
+    parser.add_argument('--users', type=int, default=16)
+    parser.add_argument('--requests', type=int, default=5, help='Number of requests of every user sent at once')
+    args = parser.parse_args()
+
+    setup_test_environment()
+    with tempfile.TemporaryDirectory() as directory:
+        connection.settings_dict['TEST']['NAME'] = os.path.join(directory, 'concurrent_writes.sqlite3')
+        connection.creation.create_test_db(verbosity=0)
+        send, statuses = SCENARIOS[args.scenario]
+        responses = send_concurrently(send, create_users(args.users), args.requests)
+        print(json.dumps({'responses': responses, 'failed': [response for response in responses
+                                                             if response[0] not in statuses],
+                          'stats_match': stats_match_reviews()}))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,140 @@
+"""Local HTTP server answering like OMDb API. Used by benchmarks and tests which shouldn't use network."""
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib import parse
+import gzip
+import json
+import random
+import threading
+import time
+
+GENRES = ['Drama', 'Comedy', 'Horror', 'Short']
+
+
+class FakeOmdbHTTPServer(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 128
+
+    def process_request(self, request, client_address):
+        with self.lock:
+            self.connections += 1
+        super().process_request(request, client_address)
+
+
+class FakeOmdbHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    disable_nagle_algorithm = True
+
+    def do_GET(self):
+        server = self.server
+        time.sleep(server.latency)
+        url = parse.urlsplit(self.path)
+        if url.path != '/':
+            self.send_error(404)
+            return
+        params = dict(parse.parse_qsl(url.query))
+        with server.lock:
+            server.calls.append(params)
+            failed = server.random.random() < server.error_rate
+            if failed:
+                server.errors += 1
+        if failed:
+            self.send_error(503)
+            return
+
+        if 's' in params:
+            data = self._search(params)
+        elif 'i' in params:
+            data = self._movie(params['i'])
+        else:
+            data = {'Response': 'False', 'Error': 'Incorrect IMDb ID.'}
+        body = json.dumps(data).encode()
+
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json; charset=utf-8')
+        if 'gzip' in self.headers.get('Accept-Encoding', ''):
+            body = gzip.compress(body)
+            self.send_header('Content-Encoding', 'gzip')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _search(self, params):
+        catalogue = self.server.catalogue
+        if catalogue is None:
+            start, total = 0, self.server.results
+        else:
+            start, total = catalogue.get(' '.join(params['s'].lower().split()), (0, 0))
+        page = int(params.get('page', 1))
+        first = (page - 1) * 10
+        movies = [{'Title': f'{params["s"]} {number}', 'Year': '2000', 'imdbID': f'tt{start + number:07d}',
+                   'Type': 'movie', 'Poster': 'N/A'}
+                  for number in range(first, min(first + 10, total))]
+        if not movies:
+            return {'Response': 'False', 'Error': 'Movie not found!'}
+        return {'Search': movies, 'totalResults': str(total), 'Response': 'True'}
+
+    def _movie(self, imdb_id):
+        number = int(imdb_id[2:])
+        return {'Title': f'Movie {number}', 'Year': '2000', 'Genre': f'{GENRES[number % 4]}, {GENRES[number % 3]}',
+                'imdbID': imdb_id, 'Response': 'True'}
+
+    def log_message(self, format, *args):
+        pass
+
+
+class FakeOmdbServer:
+    """
+    Run fake OMDb API in background thread. Every search returns `results` movies.
+    :param latency: Seconds to wait before answering each request.
+    :param error_rate: Part of requests answered with 503 status, requests are chosen by random generator
+        initialized with `seed`, so the same sequence of requests gets the same errors.
+    :param catalogue: Optional dict of number of movies by title, other titles aren't found.
+        Every title has its own movies with different imdbID.
+    """
+
+    def __init__(self, results=100, latency=0.0, error_rate=0.0, catalogue=None, seed=0):
+        self.httpd = FakeOmdbHTTPServer(('127.0.0.1', 0), FakeOmdbHandler)
+        self.httpd.results = results
+        self.httpd.latency = latency
+        self.httpd.error_rate = error_rate
+        self.httpd.random = random.Random(seed)
+        self.httpd.catalogue = None
+        if catalogue is not None:
+            # Position of the first movie of title and number of its movies by normalized title
+            self.httpd.catalogue = {}
+            start = 0
+            for title, count in catalogue.items():
+                self.httpd.catalogue[' '.join(title.lower().split())] = (start, count)
+                start += count
+        self.httpd.calls = []
+        self.httpd.errors = 0
+        self.httpd.connections = 0
+        self.httpd.lock = threading.Lock()
+        self.thread = threading.Thread(target=self.httpd.serve_forever, kwargs={'poll_interval': 0.05}, daemon=True)
+
+    @property
+    def url(self):
+        host, port = self.httpd.server_address
+        return f'http://{host}:{port}/?'
+
+    @property
+    def calls(self):
+        return self.httpd.calls
+
+    @property
+    def errors(self):
+        """Number of requests answered with error status"""
+        return self.httpd.errors
+
+    @property
+    def connections(self):
+        """Number of accepted TCP connections"""
+        return self.httpd.connections
+
+    def __enter__(self):
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.httpd.shutdown()
+        self.httpd.server_close()
@@ -0,0 +1,30 @@
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+from core import query_budget
+
+
+class QueryBudgetMixin:
+    """Assertions of query budgets of views for API test cases"""
+
+    def request_within_budget(self, method, path, data=None, **extra):
+        """
+        Send request by test client and assert that its view action has query budget and it's not exceeded.
+        Return response and number of queries.
+        """
+        with CaptureQueriesContext(connection) as queries:
+            response = getattr(self.client, method)(path, data, **extra)
+        view_class, view_name, action = query_budget.resolve_view(response.wsgi_request)
+        budget = query_budget.get_budget(view_class, action)
+        self.assertIsNotNone(budget, f'{view_name}.{action} has no query budget')
+        self.assertLessEqual(len(queries), budget, f'{view_name}.{action} ran {len(queries)} queries:\n'
+                             + '\n'.join(query['sql'] for query in queries))
+        return response, len(queries)
+
+    def assertFixedQueryCount(self, method, path, data=None, add_rows=None, **extra):
+        """Assert that request is within budget and runs the same number of queries after add_rows is called"""
+        response, query_count = self.request_within_budget(method, path, data, **extra)
+        add_rows()
+        response, more_rows_query_count = self.request_within_budget(method, path, data, **extra)
+        self.assertEqual(query_count, more_rows_query_count)
+        return response
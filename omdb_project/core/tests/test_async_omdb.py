@@ -0,0 +1,93 @@
+from unittest.mock import patch
+import asyncio
+
+from django.test import TransactionTestCase
+
+from core import omdb
+from core.async_omdb import AsyncOmdb_API
+from core.models import MovieDetail
+from core.tests.fake_omdb_server import FakeOmdbServer
+
+
+class TestAsyncOmdbApi(TransactionTestCase):
+    def setUp(self):
+        self.server = FakeOmdbServer(results=25).__enter__()
+        self.addCleanup(self.server.__exit__)
+        self.api = AsyncOmdb_API()
+        self.api.OMDB_URL = self.server.url
+        self.api.OMDB_API_KEY = 'test_api_key'
+
+    def test_search_movies(self):
+        movies = asyncio.run(self.api.search_movies('bird'))
+
+        self.assertEqual([movie['imdbID'] for movie in movies], [f'tt{number:07d}' for number in range(25)])
+        self.assertEqual(movies[1]['Genre'], ['Comedy', 'Comedy'])
+        self.assertEqual(len(self.server.calls), 3 + 25)
+        self.assertEqual(MovieDetail.objects.count(), 25)
+
+    def test_search_movies_with_genre(self):
+        movies = asyncio.run(self.api.search_movies('bird', genre='Horror'))
+
+        self.assertEqual(len(movies), 12)
+        self.assertTrue(all('Horror' in movie['Genre'] for movie in movies))
+
+    def test_stored_details_are_not_fetched(self):
+        asyncio.run(self.api.search_movies('bird'))
+        calls_count = len(self.server.calls)
+
+        asyncio.run(self.api.search_movies('bird'))
+
+        self.assertEqual([call['s'] for call in self.server.calls[calls_count:]], ['bird'] * 3)
+
+    def test_search_movies_page(self):
+        movies, total = asyncio.run(self.api.search_movies_page('bird', 15, 10))
+
+        self.assertEqual([movie['imdbID'] for movie in movies], [f'tt{number:07d}' for number in range(15, 25)])
+        self.assertEqual(total, 25)
+        self.assertTrue(all('Genre' in movie for movie in movies))
+        self.assertEqual(sorted(call['page'] for call in self.server.calls if 's' in call), ['2', '3'])
+
+    def test_search_movies_page_after_last_movie(self):
+        self.assertEqual(asyncio.run(self.api.search_movies_page('bird', 30, 10)), ([], 25))
+
+    def test_iter_movies(self):
+        async def iter_movies():
+            return [movie async for movie in self.api.iter_movies('bird')]
+
+        movies = asyncio.run(iter_movies())
+
+        self.assertEqual([movie['imdbID'] for movie in movies], [f'tt{number:07d}' for number in range(25)])
+        self.assertTrue(all('Genre' in movie for movie in movies))
+
+    def test_failed_page(self):
+        original_run_query = self.api._run_query
+
+        async def run_query(params):
+            if params.get('page') == 3:
+                raise OSError('Connection refused')
+            return await original_run_query(params)
+
+        with patch.object(self.api, '_run_query', side_effect=run_query):
+            with self.assertRaises(omdb.IncompleteSearchError) as error:
+                asyncio.run(self.api._get_movies_list('bird'))
+
+        self.assertEqual(error.exception.failed_pages, [3])
+        self.assertEqual(len(error.exception.movies), 20)
+
+    def test_concurrency_is_bounded(self):
+        running = 0
+        max_running = 0
+
+        async def fetch(item):
+            nonlocal running, max_running
+            running += 1
+            max_running = max(max_running, running)
+            await asyncio.sleep(0.01)
+            running -= 1
+            return item
+
+        self.api.MAX_CONCURRENCY = 3
+        results = asyncio.run(self.api._run_concurrently(fetch, range(10)))
+
+        self.assertEqual(results, list(range(10)))
+        self.assertEqual(max_running, 3)
@@ -0,0 +1,70 @@
+from unittest.mock import patch
+
+from django.contrib.auth import get_user_model
+from django.shortcuts import reverse
+from rest_framework import status
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APITestCase
+
+from core.authentication import TokenUserCache, token_cache
+
+
+class TestTokenUserCache(APITestCase):
+    def test_least_recently_used_token_is_evicted(self):
+        cache = TokenUserCache(max_entries=2, timeout=60)
+        user = get_user_model()(pk=1)
+        cache.set('a', user, 'token a')
+        cache.set('b', user, 'token b')
+        cache.get('a')
+        cache.set('c', user, 'token c')
+
+        self.assertIsNone(cache.get('b'))
+        self.assertEqual(cache.get('a'), (user, 'token a'))
+        self.assertEqual(cache.get_stats(), {'hits': 2, 'misses': 1, 'evictions': 1, 'hit_rate': 2 / 3,
+                                             'entries': 2})
+
+    def test_entry_expires(self):
+        cache = TokenUserCache(max_entries=2, timeout=60)
+        with patch('time.monotonic', return_value=100):
+            cache.set('a', get_user_model()(pk=1), 'token a')
+        with patch('time.monotonic', return_value=161):
+            self.assertIsNone(cache.get('a'))
+
+
+class TestCachedTokenAuthentication(APITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = get_user_model().objects.create_user(username='user1', password='password_1')
+
+    def setUp(self):
+        token_cache.clear()
+        self.token = Token.objects.create(user=self.user)
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {self.token.key}')
+        self.url = reverse('movie:favouritemovie-list')
+
+    def test_authenticated_requests_dont_query_token(self):
+        self.client.get(self.url)
+
+        # Only the list of favourite movies is read
+        with self.assertNumQueries(1):
+            response = self.client.get(self.url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(token_cache.get_stats()['hits'], 1)
+
+    def test_deleted_token_is_rejected(self):
+        self.client.get(self.url)
+        self.token.delete()
+
+        response = self.client.get(self.url)
+
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_deactivated_user_is_rejected(self):
+        self.client.get(self.url)
+        user = get_user_model().objects.get(pk=self.user.pk)
+        user.is_active = False
+        user.save()
+
+        response = self.client.get(self.url)
+
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
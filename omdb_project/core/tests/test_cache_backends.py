@@ -0,0 +1,88 @@
+import time
+
+from django.core.cache import cache, caches
+from django.test import SimpleTestCase, override_settings
+
+
+def tiered_caches(**options):
+    """Return CACHES setting with tiered cache in front of local memory cache standing in for shared one"""
+    return {
+        'default': {
+            'BACKEND': 'core.cache_backends.TieredCache',
+            'LOCATION': 'test',
+            'OPTIONS': {'SHARED_CACHE': 'shared', **options},
+        },
+        'shared': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+            'LOCATION': 'test-shared',
+        },
+    }
+
+
+@override_settings(CACHES=tiered_caches(LOCAL_MAX_ENTRIES=2, LOCAL_TIMEOUT=60))
+class TestTieredCache(SimpleTestCase):
+    def setUp(self):
+        cache.clear()
+        self.stats = cache.get_stats()
+
+    def assertStats(self, **expected):
+        stats = cache.get_stats()
+        self.assertEqual({name: stats[name] - self.stats[name] for name in expected}, expected)
+
+    def test_set_value_is_read_from_memory(self):
+        cache.set('key', 'value')
+
+        self.assertEqual(cache.get('key'), 'value')
+        self.assertEqual(caches['shared'].get('key'), 'value')
+        self.assertStats(local_hits=1, local_misses=0, shared_hits=0)
+
+    def test_value_from_shared_cache_is_kept_in_memory(self):
+        caches['shared'].set('key', 'value')
+
+        self.assertEqual(cache.get('key'), 'value')
+        self.assertEqual(cache.get('key'), 'value')
+        self.assertStats(local_hits=1, local_misses=1, shared_hits=1, shared_misses=0)
+
+    def test_missing_value(self):
+        self.assertEqual(cache.get('key', 'default'), 'default')
+        self.assertStats(local_misses=1, shared_misses=1)
+
+    def test_least_recently_used_value_is_removed_from_memory(self):
+        cache.set('key_1', 1)
+        cache.set('key_2', 2)
+        cache.get('key_1')
+        cache.set('key_3', 3)
+
+        self.assertEqual(cache.get_stats()['local_entries'], 2)
+        self.assertEqual([cache.get('key_1'), cache.get('key_3'), cache.get('key_2')], [1, 3, 2])
+        self.assertStats(local_hits=3, shared_hits=1, local_evictions=2)
+
+    @override_settings(CACHES=tiered_caches(LOCAL_TIMEOUT=0.05))
+    def test_value_expires_in_memory_earlier(self):
+        cache.set('key', 'value')
+        time.sleep(0.06)
+
+        self.assertEqual(cache.get('key'), 'value')
+        self.assertStats(local_hits=0, shared_hits=1)
+
+    def test_delete_removes_value_from_both_tiers(self):
+        cache.set('key', 'value')
+
+        cache.delete('key')
+
+        self.assertIsNone(cache.get('key'))
+        self.assertIsNone(caches['shared'].get('key'))
+
+    def test_add_checks_shared_cache(self):
+        caches['shared'].set('key', 'other process')
+
+        self.assertFalse(cache.add('key', 'value'))
+        self.assertTrue(cache.add('other_key', 'value'))
+        self.assertEqual(cache.get('key'), 'other process')
+
+    def test_incr_uses_shared_cache(self):
+        cache.set('counter', 1)
+        caches['shared'].incr('counter')
+
+        self.assertEqual(cache.incr('counter'), 3)
+        self.assertEqual(cache.get('counter'), 3)
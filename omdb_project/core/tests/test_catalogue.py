@@ -0,0 +1,175 @@
+from io import StringIO
+import gzip
+import os
+import tempfile
+
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+
+from core import catalogue
+from core import omdb
+from core.models import CatalogueTitle, CatalogueWord
+from core.tests.fake_omdb_server import FakeOmdbServer
+
+HEADER = ['tconst', 'titleType', 'primaryTitle', 'originalTitle', 'isAdult', 'startYear', 'endYear',
+          'runtimeMinutes', 'genres']
+ROWS = [
+    ['tt0000001', 'movie', 'The Birdcage', 'The Birdcage', '0', '1996', '\\N', '117', 'Comedy'],
+    ['tt0000002', 'movie', 'The Birds', 'The Birds', '0', '1963', '\\N', '119', 'Drama,Horror,Mystery'],
+    ['tt0000003', 'tvSeries', 'Birds of "Paradise"', 'Birds of "Paradise"', '0', '2008', '\\N', '\\N', '\\N'],
+    ['tt0000004', 'tvEpisode', 'The Birds', 'The Birds', '0', '2010', '\\N', '30', 'Comedy'],
+    ['tt0000005', 'short', 'Amélie and the Birds', 'Amélie and the Birds', '0', '\\N', '\\N', '5', 'Short'],
+]
+
+
+def dump(rows):
+    return '\n'.join('\t'.join(row) for row in [HEADER, *rows]) + '\n'
+
+
+def generated_rows(count):
+    """Rows of movies named 'Movie <number>' with genre cycling through Comedy, Drama and Horror"""
+    genres = ['Comedy', 'Drama', 'Horror']
+    return [[f'tt1{number:06d}', 'movie', f'Movie {number}', f'Movie {number}', '0', str(1900 + number % 100),
+             '\\N', '90', genres[number % 3]] for number in range(count)]
+
+
+class TestCatalogueImport(TestCase):
+    def import_catalogue(self, text, batch_size=2, **kwargs):
+        progress = []
+        report = catalogue.import_catalogue(StringIO(text), batch_size=batch_size,
+                                            progress=lambda report: progress.append(report.rows), **kwargs)
+        return report, progress
+
+    def test_import_dump(self):
+        report, progress = self.import_catalogue(dump(ROWS))
+
+        self.assertEqual((report.rows, report.created, report.updated, report.skipped), (5, 4, 0, 1))
+        self.assertEqual(progress, [2, 4, 5])
+        titles = CatalogueTitle.objects.order_by('imdb_id').values_list('imdb_id', 'type', 'year', 'genre')
+        self.assertEqual(list(titles),
+                         [('tt0000001', 'movie', '1996', 'Comedy'),
+                          ('tt0000002', 'movie', '1963', 'Drama, Horror, Mystery'),
+                          ('tt0000003', 'series', '2008–', 'N/A'),
+                          ('tt0000005', 'movie', 'N/A', 'Short')])
+        self.assertEqual(CatalogueTitle.objects.get(imdb_id='tt0000003').title, 'Birds of "Paradise"')
+        self.assertEqual(set(CatalogueWord.objects.filter(title='tt0000005').values_list('word', flat=True)),
+                         {'amelie', 'and', 'the', 'birds'})
+
+    def test_import_selected_types(self):
+        report, progress = self.import_catalogue(dump(ROWS), types=['tvSeries', 'tvEpisode'])
+
+        self.assertEqual((report.created, report.skipped), (2, 3))
+        self.assertEqual(CatalogueTitle.objects.get(imdb_id='tt0000004').type, 'episode')
+
+    def test_import_updates_titles(self):
+        self.import_catalogue(dump(ROWS))
+        rows = [['tt0000002', 'movie', 'The Birds II', 'The Birds II', '0', '1994', '\\N', '90', 'Horror'],
+                ['tt0000006', 'movie', 'Birdy', 'Birdy', '0', '1984', '\\N', '120', 'Drama']]
+
+        report, progress = self.import_catalogue(dump(rows))
+
+        self.assertEqual((report.created, report.updated), (1, 1))
+        self.assertEqual(CatalogueTitle.objects.get(imdb_id='tt0000002').genre, 'Horror')
+        self.assertEqual(set(CatalogueWord.objects.filter(title='tt0000002').values_list('word', flat=True)),
+                         {'the', 'birds', 'ii'})
+
+    def test_import_skips_malformed_rows(self):
+        report, progress = self.import_catalogue(dump([['tt0000001', 'movie', 'Short row'], ROWS[0]]))
+
+        self.assertEqual((report.created, report.skipped), (1, 1))
+
+    def test_import_saves_batches_in_constant_number_of_queries(self):
+        # Savepoint, select of existing titles, two inserts of titles and of words and release of every batch
+        with self.assertNumQueries(7 * 4):
+            report, progress = self.import_catalogue(dump(generated_rows(1000)), batch_size=250)
+
+        self.assertEqual(report.created, 1000)
+        self.assertEqual(CatalogueWord.objects.count(), 2000)
+
+    def test_command(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'title.basics.tsv.gz')
+            with gzip.open(path, 'wt', encoding='utf-8') as file:
+                file.write(dump(ROWS))
+            stdout = StringIO()
+            call_command('import_catalogue', path, '--batch-size', '10', stdout=stdout)
+
+        self.assertEqual(CatalogueTitle.objects.count(), 4)
+        self.assertIn('Imported 5 rows: 4 created, 0 updated, 1 skipped', stdout.getvalue())
+
+
+class TestCatalogueSearch(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        catalogue.import_catalogue(StringIO(dump(ROWS + generated_rows(50))))
+
+    def search(self, title):
+        return [movie['imdbID'] for movie in catalogue.search(title)]
+
+    def test_search_by_words(self):
+        self.assertEqual(self.search('birds'), ['tt0000002', 'tt0000003', 'tt0000005'])
+        self.assertEqual(self.search('The  BIRDS'), ['tt0000002', 'tt0000005'])
+        self.assertEqual(self.search('birds the'), ['tt0000002', 'tt0000005'])
+        self.assertEqual(self.search('bird'), [])
+        self.assertEqual(self.search('...'), [])
+
+    def test_search_ignores_diacritics(self):
+        self.assertEqual(self.search('amelie'), ['tt0000005'])
+        self.assertEqual(self.search('AMÉLIE'), ['tt0000005'])
+
+    def test_search_result_has_omdb_form(self):
+        self.assertEqual(catalogue.search('birdcage'), [
+            {'Title': 'The Birdcage', 'Year': '1996', 'imdbID': 'tt0000001', 'Type': 'movie', 'Poster': 'N/A',
+             'Genre': ['Comedy']},
+        ])
+
+    def test_search_results_are_limited(self):
+        self.assertEqual(len(catalogue.search('movie')), 50)
+        self.assertEqual(len(catalogue.search('movie', max_results=20)), 20)
+
+    def test_search_runs_one_query(self):
+        with self.assertNumQueries(1):
+            catalogue.search('the birds of paradise')
+
+
+# Requests are sent by many threads, they can't use database cache in test transaction
+@override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}},
+                   OMDB_THROTTLING_CACHE='default')
+class TestOmdbApiCatalogue(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        catalogue.import_catalogue(StringIO(dump(generated_rows(30))))
+
+    def setUp(self):
+        cache.clear()
+        self.server = FakeOmdbServer(catalogue={'Bird': 3}).__enter__()
+        self.addCleanup(self.server.__exit__)
+        self.api = omdb.Omdb_API()
+        self.api.OMDB_URL = self.server.url
+        self.api.LOCAL_CATALOGUE = True
+
+    def test_search_movies_from_catalogue(self):
+        movies = self.api.search_movies('movie', 'Horror')
+
+        self.assertEqual([movie['imdbID'] for movie in movies], [f'tt1{number:06d}' for number in range(2, 30, 3)])
+        self.assertEqual(self.server.calls, [])
+
+    def test_search_movies_page_from_catalogue(self):
+        movies, total = self.api.search_movies_page('movie', 20, 15)
+
+        self.assertEqual([movie['imdbID'] for movie in movies], [f'tt1{number:06d}' for number in range(20, 30)])
+        self.assertEqual(total, 30)
+        self.assertEqual([movie['Title'] for movie in self.api.iter_movies('movie')][:2], ['Movie 0', 'Movie 1'])
+        self.assertEqual(self.server.calls, [])
+
+    def test_missing_titles_are_searched_in_omdb(self):
+        movies = self.api.search_movies('bird')
+
+        self.assertEqual(len(movies), 3)
+        self.assertTrue(self.server.calls)
+
+    def test_catalogue_is_not_used_by_default(self):
+        self.api.LOCAL_CATALOGUE = False
+
+        self.assertEqual(self.api.search_movies('movie'), [])
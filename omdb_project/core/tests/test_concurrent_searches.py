@@ -0,0 +1,19 @@
+import json
+import subprocess
+import sys
+
+from django.conf import settings
+from django.test import SimpleTestCase
+
+
+class TestConcurrentSearches(SimpleTestCase):
+    def test_cold_searches_with_database_file(self):
+        """Searches saving movie details at the same time don't fail on locked SQLite database file"""
+        process = subprocess.run([sys.executable, '-m', 'core.tests.concurrent_searches', '--threads', '24'],
+                                 cwd=settings.BASE_DIR, capture_output=True, text=True, timeout=120)
+
+        self.assertEqual(process.returncode, 0, process.stderr)
+        output = json.loads(process.stdout)
+        self.assertEqual(len(output['responses']), 24)
+        self.assertEqual([response for response in output['responses'] if response[0] != 200], [])
+        self.assertEqual(output['store_failures'], 0)
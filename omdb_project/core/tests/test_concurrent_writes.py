@@ -0,0 +1,42 @@
+import json
+import subprocess
+import sys
+
+from django.conf import settings
+from django.test import SimpleTestCase
+
+
+class TestConcurrentWrites(SimpleTestCase):
+    def run_scenario(self, scenario, *args):
+        """Return output of concurrent_writes script run with SQLite database file"""
+        process = subprocess.run([sys.executable, '-m', 'core.tests.concurrent_writes', scenario, *args],
+                                 cwd=settings.BASE_DIR, capture_output=True, text=True, timeout=120)
+        self.assertEqual(process.returncode, 0, process.stderr)
+        return json.loads(process.stdout)
+
+    def test_review_updates(self):
+        """Updates of the same reviews at once don't fail on locked database and move every rating once"""
+        output = self.run_scenario('review-update')
+
+        self.assertEqual(output['failed'], [])
+        self.assertTrue(output['stats_match'])
+
+    def test_review_deletes(self):
+        output = self.run_scenario('review-delete')
+
+        self.assertEqual(output['failed'], [])
+        self.assertTrue(output['stats_match'])
+
+    def test_bulk_add_and_remove(self):
+        """Bulk changes of the same lists at once don't fail on locked database"""
+        for scenario in ('bulk-add', 'bulk-remove'):
+            with self.subTest(scenario=scenario):
+                self.assertEqual(self.run_scenario(scenario)['failed'], [])
+
+    def test_review_imports(self):
+        """Imports updating the same reviews at once don't fail on locked database"""
+        # Less imports are sent, every one holds write lock longer and waiting for all would exceed busy timeout
+        output = self.run_scenario('review-import', '--requests', '2')
+
+        self.assertEqual(output['failed'], [])
+        self.assertTrue(output['stats_match'])
@@ -0,0 +1,153 @@
+from unittest.mock import patch
+import json
+import os
+import tempfile
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.shortcuts import reverse
+from django.test import override_settings
+from rest_framework.test import APITestCase
+
+from core import metrics
+from core import search
+from core.authentication import TokenUserCache
+from core.omdb import Omdb_API
+from core.tests.fake_omdb_server import FakeOmdbServer
+from core.tests.test_cache_backends import tiered_caches
+
+
+class TestRegistry(APITestCase):
+    def setUp(self):
+        self.registry = metrics.Registry()
+        self.requests = self.registry.counter('requests_total', 'Requests', ['path'])
+        self.duration = self.registry.histogram('duration_seconds', 'Duration', buckets=(0.1, 1, metrics.math.inf))
+
+    def test_exposition(self):
+        self.requests.inc(path='/a')
+        self.requests.inc(2, path='/"b"')
+        self.duration.observe(0.5)
+        self.duration.observe(2)
+
+        self.assertEqual(self.registry.exposition(), '\n'.join([
+            '# HELP requests_total Requests',
+            '# TYPE requests_total counter',
+            'requests_total{path="/\\"b\\""} 2.0',
+            'requests_total{path="/a"} 1.0',
+            '# HELP duration_seconds Duration',
+            '# TYPE duration_seconds histogram',
+            'duration_seconds_bucket{le="0.1"} 0.0',
+            'duration_seconds_bucket{le="1.0"} 1.0',
+            'duration_seconds_bucket{le="+Inf"} 2.0',
+            'duration_seconds_sum 2.5',
+            'duration_seconds_count 2.0',
+        ]) + '\n')
+
+    def test_labels_are_checked(self):
+        with self.assertRaises(ValueError):
+            self.requests.inc(method='GET')
+
+    def test_values_of_processes_are_summed(self):
+        with tempfile.TemporaryDirectory() as directory, override_settings(METRICS_DIR=directory):
+            with open(os.path.join(directory, 'metrics_1.json'), 'w') as file:
+                json.dump([['requests_total', [['path', '/a']], 5]], file)
+            self.requests.inc(path='/a')
+
+            self.assertEqual(self.registry.collect(), {('requests_total', (('path', '/a'),)): 6})
+            self.assertTrue(os.path.exists(os.path.join(directory, f'metrics_{os.getpid()}.json')))
+
+    def test_forked_process_starts_from_zero(self):
+        self.requests.inc(path='/a')
+
+        self.registry.reset()
+
+        self.assertEqual(self.registry.collect(), {})
+
+
+def sample_value(name, **labels):
+    return metrics.registry.collect().get((name, tuple(labels.items())), 0)
+
+
+# OMDb requests are sent by many threads, they can't use database cache in test transaction
+@override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}},
+                   OMDB_THROTTLING_CACHE='default')
+class TestAppMetrics(APITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = get_user_model().objects.create(username='user1', password='password_1')
+
+    def setUp(self):
+        cache.clear()
+
+    def test_requests_are_counted_by_view_and_action(self):
+        self.client.force_authenticate(self.user)
+        count = sample_value('http_request_duration_seconds_count', view='FavouriteMovieViewSet', action='list',
+                             status='200')
+        one_query_count = sample_value('http_request_db_queries_bucket', view='FavouriteMovieViewSet',
+                                       action='list', le='1.0')
+
+        self.client.get(reverse('movie:favouritemovie-list'))
+        response = self.client.get(reverse('metrics'))
+
+        self.assertEqual(response['Content-Type'], metrics.CONTENT_TYPE)
+        self.assertIn('http_request_duration_seconds_count{view="FavouriteMovieViewSet",action="list",status="200"} '
+                      f'{count + 1:.1f}', response.content.decode())
+        self.assertEqual(sample_value('http_request_db_queries_bucket', view='FavouriteMovieViewSet',
+                                      action='list', le='1.0'), one_query_count + 1)
+
+    def test_omdb_requests_and_search_cache_lookups_are_counted(self):
+        before = metrics.registry.collect()
+        with FakeOmdbServer(catalogue={'bird': 15}) as server, patch.object(Omdb_API, 'OMDB_URL', server.url):
+            search.search_movies('bird')
+            search.search_movies('bird', 'Drama')
+            search.search_movies('missing title')
+
+        def added(name, **labels):
+            key = (name, tuple(labels.items()))
+            return metrics.registry.collect().get(key, 0) - before.get(key, 0)
+
+        self.assertEqual(added('omdb_requests_total', type='search', outcome='success'), 2)
+        self.assertEqual(added('omdb_requests_total', type='search', outcome='not_found'), 1)
+        self.assertEqual(added('omdb_requests_total', type='details', outcome='success'), 15)
+        self.assertEqual(added('omdb_request_duration_seconds_count', type='details'), 15)
+        self.assertEqual(added('search_cache_lookups_total', result='miss'), 2)
+        self.assertEqual(added('search_cache_lookups_total', result='hit'), 1)
+
+    def test_token_cache_lookups_and_evictions_are_counted(self):
+        before = metrics.registry.collect()
+        token_cache = TokenUserCache(max_entries=1, timeout=60)
+        user = get_user_model()(pk=1)
+        token_cache.set('a', user, 'token a')
+        token_cache.set('b', user, 'token b')
+        token_cache.get('b')
+        token_cache.get('a')
+
+        def added(name, **labels):
+            key = (name, tuple(labels.items()))
+            return metrics.registry.collect().get(key, 0) - before.get(key, 0)
+
+        self.assertEqual(added('token_cache_lookups_total', result='hit'), 1)
+        self.assertEqual(added('token_cache_lookups_total', result='miss'), 1)
+        self.assertEqual(added('token_cache_evictions_total'), 1)
+
+    @override_settings(CACHES=tiered_caches(LOCAL_MAX_ENTRIES=1))
+    def test_tiered_cache_lookups_and_evictions_are_counted(self):
+        cache.clear()
+        before = metrics.registry.collect()
+        cache.set('a', 1)
+        cache.set('b', 2)
+        cache.get('b')
+        # Read from shared cache and kept in memory instead of 'b'
+        cache.get('a')
+        cache.get('c')
+
+        def added(name, **labels):
+            key = (name, tuple(labels.items()))
+            return metrics.registry.collect().get(key, 0) - before.get(key, 0)
+
+        self.assertEqual(added('tiered_cache_lookups_total', cache='test', tier='local', result='hit'), 1)
+        self.assertEqual(added('tiered_cache_lookups_total', cache='test', tier='local', result='miss'), 2)
+        self.assertEqual(added('tiered_cache_lookups_total', cache='test', tier='shared', result='hit'), 1)
+        self.assertEqual(added('tiered_cache_lookups_total', cache='test', tier='shared', result='miss'), 1)
+        self.assertEqual(added('tiered_cache_evictions_total', cache='test'), 2)
+        self.assertIn('tiered_cache_evictions_total{cache="test"}', metrics.registry.exposition())
@@ -74,3 +74,65 @@ class TestModels(TestCase):
             review = models.Review(user=self.user_1, movie_id='Id_Movie',
                                    rating=rating, review="This is nice movie!!!")
             review.full_clean()
+
+
+class TestMovieRatingStats(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user_1 = get_user_model().objects.create(username='Zenek', password='martyniuk')
+        cls.user_2 = get_user_model().objects.create(username='Krzysztof', password='krawczyk')
+
+    def get_stats(self, movie_id='Id_Movie'):
+        return models.MovieRatingStats.objects.get(movie_id=movie_id)
+
+    def test_created_reviews_are_counted(self):
+        models.Review.objects.create(user=self.user_1, movie_id='Id_Movie', rating=4)
+        models.Review.objects.create(user=self.user_2, movie_id='Id_Movie', rating=9)
+
+        stats = self.get_stats()
+        self.assertEqual(stats.count, 2)
+        self.assertEqual(stats.rating_sum, 13)
+        self.assertEqual(stats.average, 6.5)
+        self.assertEqual(stats.histogram, {**dict.fromkeys(models.RATINGS, 0), 4: 1, 9: 1})
+
+    def test_changed_rating_is_moved(self):
+        review = models.Review.objects.create(user=self.user_1, movie_id='Id_Movie', rating=4)
+        review = models.Review.objects.get(pk=review.pk)
+        review.rating = 7
+        review.save()
+        review.review = 'Better than I thought'
+        review.save()
+
+        stats = self.get_stats()
+        self.assertEqual((stats.count, stats.rating_sum, stats.rating_4, stats.rating_7), (1, 7, 0, 1))
+
+    def test_rating_changed_by_concurrent_updates_is_moved_once(self):
+        review = models.Review.objects.create(user=self.user_1, movie_id='Id_Movie', rating=4)
+        # Both requests read review before any of them saved it
+        first, second = models.Review.objects.get(pk=review.pk), models.Review.objects.get(pk=review.pk)
+        first.rating = 7
+        first.save()
+        second.rating = 9
+        second.save()
+
+        stats = self.get_stats()
+        self.assertEqual((stats.count, stats.rating_sum, stats.rating_4, stats.rating_7, stats.rating_9),
+                         (1, 9, 0, 0, 1))
+
+    def test_changed_movie_is_moved(self):
+        review = models.Review.objects.create(user=self.user_1, movie_id='Id_Movie', rating=4)
+        models.Review(pk=review.pk, user=self.user_1, movie_id='Id_Other', rating=4).save()
+
+        self.assertEqual(self.get_stats().count, 0)
+        self.assertEqual(self.get_stats('Id_Other').count, 1)
+
+    def test_deleted_reviews_are_removed(self):
+        models.Review.objects.create(user=self.user_1, movie_id='Id_Movie', rating=4)
+        models.Review.objects.create(user=self.user_2, movie_id='Id_Movie', rating=9)
+
+        models.Review.objects.get(user=self.user_1).delete()
+        self.user_2.delete()
+
+        stats = self.get_stats()
+        self.assertEqual((stats.count, stats.rating_sum, stats.rating_4, stats.rating_9), (0, 0, 0, 0))
+        self.assertIsNone(stats.average)
@@ -1,14 +1,31 @@
+import time
+from datetime import timedelta
 from unittest.mock import Mock, patch
 
-from django.test import SimpleTestCase
+from django.conf import settings
+from django.core.cache import cache
+from django.db import OperationalError
+
+from django.test import TestCase, override_settings
+from django.utils import timezone
 
 from core import omdb
+from core import throttling
+from core.models import MovieDetail
+from core.tests.fake_omdb_server import FakeOmdbServer
 
 
-class TestOmdbApi(SimpleTestCase):
+# Requests are sent by many threads, they can't use database cache in test transaction
+@override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}},
+                   OMDB_THROTTLING_CACHE='default')
+class TestOmdbApi(TestCase):
     def setUp(self):
+        cache.clear()
+        throttling.clear()
         self.api = omdb.Omdb_API()
         self.api.OMDB_API_KEY = 'test_api_key'
+        # Send requests by urllib, which is mocked in tests
+        self.api.transport = None
 
     def test_page_number(self):
         """Test that _page_count return proper number of pages of query"""
@@ -33,7 +50,49 @@ class TestOmdbApi(SimpleTestCase):
         response = self.api._run_query(params)
 
         self.assertEqual(response, json.loads(body))
-        request_mock.urlopen.assert_called_once_with(url)
+        request_mock.urlopen.assert_called_once_with(url, timeout=self.api.REQUEST_TIMEOUT)
+
+    @patch('core.omdb.request')
+    def test_run_query_by_transport(self, request_mock):
+        """Test that _run_query sends request by transport when it's set"""
+        self.api.transport = Mock(**{'get.return_value': b'{"Response":"True"}'})
+
+        response = self.api._run_query({'apikey': 'test_api_key', 'i': 'tt1'})
+
+        self.assertEqual(response, {'Response': 'True'})
+        self.api.transport.get.assert_called_once_with("http://www.omdbapi.com/?apikey=test_api_key&i=tt1")
+        request_mock.urlopen.assert_not_called()
+
+    def test_failed_requests_open_circuit(self):
+        self.api.transport = Mock(**{'get.side_effect': OSError('Connection refused')})
+
+        for _ in range(self.api.CIRCUIT_FAILURE_THRESHOLD):
+            with self.assertRaises(OSError):
+                self.api._run_query({'i': 'tt1'})
+        with self.assertRaises(omdb.OmdbUnavailableError):
+            self.api._run_query({'i': 'tt1'})
+
+        self.assertEqual(self.api.transport.get.call_count, self.api.CIRCUIT_FAILURE_THRESHOLD)
+
+    def test_rate_limit_exceeded(self):
+        self.api.transport = Mock(**{'get.return_value': b'{"Response":"True"}'})
+        self.api.rate_limiter.rate = 1
+        self.api.rate_limiter.capacity = 2
+        self.api.REQUEST_TIMEOUT = 0.5
+
+        for _ in range(2):
+            self.api._run_query({'i': 'tt1'})
+        with self.assertRaisesMessage(omdb.OmdbUnavailableError, 'Too many requests to OMDb'):
+            self.api._run_query({'i': 'tt1'})
+
+        self.assertEqual(self.api.transport.get.call_count, 2)
+
+    @patch.object(omdb.Omdb_API, 'RATE_LIMIT_PROCESSES', 4)
+    def test_rate_limit_is_shared_by_processes(self):
+        api = omdb.Omdb_API()
+
+        self.assertEqual(api.rate_limiter.rate, api.RATE_LIMIT / 4)
+        self.assertEqual(api.rate_limiter.capacity, api.RATE_LIMIT_BURST / 4)
 
     @patch('core.omdb.request')
     def test_get_movies_list_one_page(self, request_mock):
@@ -59,6 +118,45 @@ class TestOmdbApi(SimpleTestCase):
 
         self.assertEqual(movies_list, first_page + second_page)
 
+    def test_get_movies_list_keeps_pages_order(self):
+        """Check that pages fetched concurrently are returned in order of page numbers"""
+        def query(params):
+            page = params.get('page', 1)
+            time.sleep(0.01 * (5 - page))
+            return {'Search': [page] * 10, 'totalResults': '45'}
+
+        with patch.object(self.api, '_run_query', side_effect=query):
+            movies_list = self.api._get_movies_list('test_title')
+
+        self.assertEqual(movies_list, [1] * 10 + [2] * 10 + [3] * 10 + [4] * 10 + [5] * 10)
+
+    def test_get_movies_list_not_found(self):
+        with patch.object(self.api, '_run_query') as mock_query:
+            mock_query.return_value = {'Response': 'False', 'Error': 'Movie not found!'}
+            movies = self.api._get_movies_list('brid')
+
+        self.assertEqual(movies, [])
+
+    def test_get_movies_list_error(self):
+        with patch.object(self.api, '_run_query') as mock_query:
+            mock_query.return_value = {'Response': 'False', 'Error': 'Too many results.'}
+            with self.assertRaisesMessage(omdb.OmdbAPIError, 'Too many results.'):
+                self.api._get_movies_list('a')
+
+    def test_get_movies_list_failed_page(self):
+        """Check that failed page raise error with movies from pages fetched successfully"""
+        def query(params):
+            if params.get('page') == 2:
+                raise OSError('Connection refused')
+            return {'Search': ['a'] * 10, 'totalResults': '30'}
+
+        with patch.object(self.api, '_run_query', side_effect=query):
+            with self.assertRaises(omdb.IncompleteSearchError) as error:
+                self.api._get_movies_list('test_title')
+
+        self.assertEqual(error.exception.failed_pages, [2])
+        self.assertEqual(error.exception.movies, ['a'] * 20)
+
     def test_filter_movies_by_genre(self):
         movies_list = [{'Genre': ['Comedy', 'Horror'], "Title": "Bird"},
                        {'Genre': ['Thriller'], "Title": "Snake"},
@@ -73,19 +171,91 @@ class TestOmdbApi(SimpleTestCase):
         self.assertEqual(filtered_list_1, expected_filtered_list_1)
         self.assertEqual(filtered_list_2, expected_filtered_list_2)
 
+    def test_filter_movies_by_genre_with_index(self):
+        movies_list = [{'Genre': ['Comedy', 'Horror'], "Title": "Bird"},
+                       {'Genre': ['Thriller'], "Title": "Snake"},
+                       {'Genre': ['Comedy'], "Title": "Cat"}]
+        genre_index = {'Comedy': [0, 2], 'Horror': [0], 'Thriller': [1]}
+
+        filtered_list_1 = self.api._filter_movies_by_genre(movies_list, 'Comedy', genre_index)
+        filtered_list_2 = self.api._filter_movies_by_genre(movies_list, 'Biography', genre_index)
+
+        self.assertEqual(filtered_list_1, [movies_list[0], movies_list[2]])
+        self.assertEqual(filtered_list_2, [])
+
     def test_add_genre_to_movies(self):
         movies = [{'Title': 'Title1', 'imdbID': 'Id1'},
                   {'Title': 'Title2', 'imdbID': 'Id2'}]
-        genres_for_movies = {'Id1': ['Comedy', 'Musical'],
-                             'Id2': ['Horror']}
-        with patch.object(self.api, '_get_movie_genre') as mock_get:
-            mock_get.side_effect = lambda movie_id: genres_for_movies[movie_id]
+        details_for_movies = {'Id1': {'Genre': 'Comedy, Musical'},
+                              'Id2': {'Genre': 'Horror'}}
+        with patch.object(self.api, '_fetch_movie_details') as mock_fetch:
+            mock_fetch.side_effect = lambda movie_id: details_for_movies[movie_id]
 
             self.api._add_genre_data_to_movies(movies)
 
         self.assertEqual(movies[0]['Genre'], ['Comedy', 'Musical'])
         self.assertEqual(movies[1]['Genre'], ['Horror'])
 
+    def test_add_genre_to_movies_failed_movie(self):
+        """Check that error is raised when details of any movie can't be fetched"""
+        movies = [{'Title': 'Title1', 'imdbID': 'Id1'},
+                  {'Title': 'Title2', 'imdbID': 'Id2'}]
+
+        def fetch_details(movie_id):
+            if movie_id == 'Id2':
+                raise OSError('timed out')
+            return {'Genre': 'Comedy'}
+
+        with patch.object(self.api, '_fetch_movie_details', side_effect=fetch_details):
+            with self.assertRaisesMessage(omdb.OmdbAPIError, 'Id2'):
+                self.api._add_genre_data_to_movies(movies)
+
+    def test_movie_details_are_stored(self):
+        """Check that fetched details are saved and not requested again"""
+        with patch.object(self.api, '_run_query') as mock_query:
+            mock_query.return_value = {'Genre': 'Comedy, Horror', 'Year': '2001'}
+            self.api._get_movies_details(['Id1', 'Id2'])
+            mock_query.reset_mock()
+
+            details = self.api._get_movies_details(['Id1', 'Id2'])
+
+        mock_query.assert_not_called()
+        self.assertEqual(details['Id1'], {'Genre': 'Comedy, Horror', 'Year': '2001'})
+        self.assertEqual(MovieDetail.objects.count(), 2)
+
+    def test_outdated_movie_details_are_fetched_again(self):
+        """Check that only missing and outdated details are fetched and then updated in store"""
+        MovieDetail.objects.create(imdb_id='Id1', data='{"Genre": "Drama"}', fetched_at=timezone.now())
+        MovieDetail.objects.create(imdb_id='Id2', data='{"Genre": "Drama"}', fetched_at=timezone.now() - timedelta(
+            seconds=settings.OMDB_DETAILS_TTL + 1))
+        with patch.object(self.api, '_run_query') as mock_query:
+            mock_query.return_value = {'Genre': 'Horror'}
+
+            details = self.api._get_movies_details(['Id1', 'Id2', 'Id3'])
+
+        self.assertEqual(sorted(call[0][0]['i'] for call in mock_query.call_args_list), ['Id2', 'Id3'])
+        self.assertEqual(details, {'Id1': {'Genre': 'Drama'}, 'Id2': {'Genre': 'Horror'}, 'Id3': {'Genre': 'Horror'}})
+        self.assertEqual(MovieDetail.objects.get(imdb_id='Id2').details, {'Genre': 'Horror'})
+        self.assertEqual(MovieDetail.objects.fresh().count(), 3)
+
+    def test_details_are_returned_when_they_can_not_be_stored(self):
+        with patch.object(self.api, '_run_query', return_value={'Genre': 'Horror'}), \
+                patch.object(MovieDetail.objects, 'store', side_effect=OperationalError('database is locked')), \
+                self.assertLogs('core.omdb', 'WARNING') as logs:
+            details = self.api._get_movies_details(['Id1'])
+
+        self.assertEqual(details, {'Id1': {'Genre': 'Horror'}})
+        self.assertIn('Failed to store details of 1 movies', logs.output[0])
+
+    def test_movie_not_found_details_are_not_stored(self):
+        with patch.object(self.api, '_run_query') as mock_query:
+            mock_query.return_value = {'Response': 'False', 'Error': 'Incorrect IMDb ID.'}
+
+            with self.assertRaisesMessage(omdb.OmdbAPIError, 'Incorrect IMDb ID.'):
+                self.api._get_movies_details(['Id1'])
+
+        self.assertFalse(MovieDetail.objects.exists())
+
     def test_get_movie_genre(self):
         with patch.object(self.api, '_run_query') as mock_query:
             mock_query.return_value = {'Genre': 'Comedy, Horror'}
@@ -102,10 +272,70 @@ class TestOmdbApi(SimpleTestCase):
     def test_search_movies_without_genre(self, mock_urlopen):
         from .example_response_body import query_response_pairs, search_without_genre, search_with_genre_drama
         # Set what read() should return, it depend on url value passed to urlopen method
-        mock_urlopen.side_effect = lambda url: Mock(**{'read.return_value': query_response_pairs[url]})
+        mock_urlopen.side_effect = lambda url, timeout: Mock(**{'read.return_value': query_response_pairs[url]})
 
         movies_1 = self.api.search_movies('test_title')
         self.assertEqual(movies_1, search_without_genre)
 
         movies_2 = self.api.search_movies('test_title', genre='Drama')
         self.assertEqual(movies_2, search_with_genre_drama)
+
+
+@override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}},
+                   OMDB_THROTTLING_CACHE='default')
+class TestOmdbApiPartialSearch(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.server = FakeOmdbServer(results=25).__enter__()
+        self.addCleanup(self.server.__exit__)
+        self.api = omdb.Omdb_API()
+        self.api.OMDB_URL = self.server.url
+
+    def test_search_movies_page_fetches_only_requested_movies(self):
+        movies, total = self.api.search_movies_page('bird', 0, 10)
+
+        self.assertEqual([movie['imdbID'] for movie in movies], [f'tt{number:07d}' for number in range(10)])
+        self.assertEqual(total, 25)
+        self.assertEqual(movies[0]['Genre'], ['Drama', 'Drama'])
+        self.assertEqual(len([call for call in self.server.calls if 's' in call]), 1)
+        self.assertEqual(len([call for call in self.server.calls if 'i' in call]), 10)
+
+    def test_search_movies_page_across_omdb_pages(self):
+        movies, total = self.api.search_movies_page('bird', 15, 10)
+
+        self.assertEqual([movie['imdbID'] for movie in movies], [f'tt{number:07d}' for number in range(15, 25)])
+        self.assertEqual(sorted(call['page'] for call in self.server.calls if 's' in call), ['2', '3'])
+
+    def test_search_movies_page_after_last_movie(self):
+        movies, total = self.api.search_movies_page('bird', 30, 10)
+
+        self.assertEqual(movies, [])
+        self.assertEqual(total, 25)
+
+    def test_iter_movies(self):
+        movies = list(self.api.iter_movies('bird'))
+
+        self.assertEqual([movie['imdbID'] for movie in movies], [f'tt{number:07d}' for number in range(25)])
+        self.assertTrue(all('Genre' in movie for movie in movies))
+
+    def test_search_title_from_catalogue(self):
+        with FakeOmdbServer(catalogue={'Bird': 3, 'Cat': 12}) as server:
+            self.api.OMDB_URL = server.url
+            birds = self.api._get_movies_list('bird')
+            cats = self.api._get_movies_list('cat')
+            dogs = self.api._get_movies_list('dog')
+
+        self.assertEqual([movie['imdbID'] for movie in birds], ['tt0000000', 'tt0000001', 'tt0000002'])
+        self.assertEqual(len(cats), 12)
+        self.assertEqual(cats[0]['imdbID'], 'tt0000003')
+        self.assertEqual(dogs, [])
+
+    def test_server_errors(self):
+        self.api.circuit_breaker = None
+        with FakeOmdbServer(error_rate=0.5) as server:
+            self.api.OMDB_URL = server.url
+            results = self.api._run_concurrently(lambda number: self.api._run_query({'i': f'tt{number}'}), range(100))
+
+        errors = [result for result in results if isinstance(result, Exception)]
+        self.assertEqual(len(errors), server.errors)
+        self.assertTrue(20 < len(errors) < 80)
@@ -0,0 +1,101 @@
+from io import StringIO
+import os
+import tempfile
+
+from django.contrib.auth import get_user_model
+from django.core.management import CommandError, call_command
+from django.test import TestCase
+
+from core import models
+from core import review_import
+
+
+class TestReviewImport(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = get_user_model().objects.create(username='Zenek', password='martyniuk')
+        cls.other_user = get_user_model().objects.create(username='Krzysztof', password='krawczyk')
+
+    def import_reviews(self, text, file_format='csv', batch_size=2):
+        progress = []
+        report = review_import.import_reviews(self.user, StringIO(text), file_format, batch_size,
+                                              progress=lambda report: progress.append(report.rows))
+        return report, progress
+
+    def test_import_csv(self):
+        report, progress = self.import_reviews('movie_id,rating,review\n'
+                                               'tt001,7,Good\n'
+                                               'tt002,10,\n'
+                                               'tt003,9,Great\n')
+
+        self.assertEqual((report.rows, report.created, report.invalid), (3, 3, 0))
+        self.assertEqual(progress, [2, 3])
+        self.assertEqual(list(models.Review.objects.filter(user=self.user).order_by('movie_id')
+                              .values_list('movie_id', 'rating', 'review')),
+                         [('tt001', 7, 'Good'), ('tt002', 10, ''), ('tt003', 9, 'Great')])
+
+    def test_import_imdb_export(self):
+        report, progress = self.import_reviews('Const,Your Rating,Date Rated,Title\n'
+                                               'tt001,7,2020-01-01,First\n')
+
+        self.assertEqual(report.created, 1)
+        self.assertEqual(models.Review.objects.get(user=self.user).rating, 7)
+
+    def test_import_ndjson(self):
+        report, progress = self.import_reviews('{"movie_id": "tt001", "rating": 7}\n'
+                                               '\n'
+                                               'not json\n'
+                                               '{"imdbID": "tt002", "rating": 3, "review": "Bad"}\n', 'ndjson')
+
+        self.assertEqual((report.rows, report.created, report.invalid), (3, 2, 1))
+        self.assertEqual(report.errors, [{'row': 2, 'error': 'Row is not an object'}])
+
+    def test_invalid_rows_are_reported(self):
+        report, progress = self.import_reviews('movie_id,rating\n'
+                                               'tt001,11\n'
+                                               ',5\n'
+                                               'tt002,x\n'
+                                               f"{'t' * 30},5\n"
+                                               'tt003,1\n')
+
+        self.assertEqual((report.rows, report.created, report.invalid), (5, 1, 4))
+        self.assertEqual([error['row'] for error in report.errors], [1, 2, 3, 4])
+        self.assertTrue(report.errors[0]['error'].startswith('rating: '))
+        self.assertTrue(report.errors[1]['error'].startswith('movie_id: '))
+
+    def test_existing_reviews_are_updated_with_stats(self):
+        models.Review.objects.create(user=self.user, movie_id='tt001', rating=4)
+        models.Review.objects.create(user=self.user, movie_id='tt002', rating=5, review='Fine')
+        models.Review.objects.create(user=self.other_user, movie_id='tt001', rating=8)
+
+        with self.assertNumQueries(11):
+            report, progress = self.import_reviews('movie_id,rating,review\n'
+                                                   'tt001,6,\n'
+                                                   'tt002,5,Fine\n'
+                                                   'tt003,2,\n'
+                                                   'tt003,3,Changed my mind\n', batch_size=10)
+
+        self.assertEqual((report.created, report.updated, report.unchanged), (1, 1, 1))
+        self.assertEqual(models.Review.objects.get(user=self.user, movie_id='tt003').review, 'Changed my mind')
+        stats = models.MovieRatingStats.objects.in_bulk()
+        self.assertEqual((stats['tt001'].count, stats['tt001'].rating_sum, stats['tt001'].rating_4), (2, 14, 0))
+        self.assertEqual((stats['tt002'].count, stats['tt002'].rating_sum), (1, 5))
+        self.assertEqual((stats['tt003'].count, stats['tt003'].rating_3), (1, 1))
+
+    def test_command(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'ratings.ndjson')
+            with open(path, 'w') as file:
+                file.write('{"movie_id": "tt001", "rating": 7}\n{"movie_id": "tt002", "rating": 0}\n')
+            stdout = StringIO()
+            stderr = StringIO()
+
+            call_command('import_reviews', 'Zenek', path, stdout=stdout, stderr=stderr)
+
+        self.assertEqual(models.Review.objects.get(user=self.user).movie_id, 'tt001')
+        self.assertIn('Imported 2 rows: 1 created', stdout.getvalue())
+        self.assertIn('Row 2: rating: ', stderr.getvalue())
+
+    def test_command_with_missing_file(self):
+        with self.assertRaisesMessage(CommandError, 'File can not be read'):
+            call_command('import_reviews', 'Zenek', 'missing.csv')
@@ -0,0 +1,251 @@
+from concurrent.futures import ThreadPoolExecutor
+import asyncio
+import pickle
+import threading
+import time
+from unittest.mock import Mock, patch
+
+from django.core.cache import cache
+from django.test import SimpleTestCase, TestCase, override_settings
+
+from core import search
+from core import search_result
+from core.omdb import OmdbAPIError
+from core.search_result import SearchResult
+
+
+class TestSearch(TestCase):
+    movies = [{'Title': 'Bird', 'Genre': ['Comedy', 'Horror']},
+              {'Title': 'Snake', 'Genre': ['Thriller']},
+              {'Title': 'Cat', 'Genre': ['Comedy']}]
+
+    def setUp(self):
+        # Values kept in process memory aren't removed by rolling back test transaction
+        cache.clear()
+
+    def test_normalize_title(self):
+        self.assertEqual(search.normalize_title(' The  Bird '), 'the bird')
+        self.assertEqual(search.search_cache_key('The Bird'), search.search_cache_key('the  bird'))
+
+    @patch('core.search.Omdb_API.search_movies')
+    def test_search_movies_caches_all_genres(self, mock_search_movies):
+        """Full search is done once for title and then filtered by genre"""
+        mock_search_movies.return_value = self.movies
+
+        comedies = search.search_movies('Bird', 'Comedy')
+        thrillers = search.search_movies('bird', 'Thriller')
+        documentaries = search.search_movies('bird', 'Documentary')
+        all_movies = search.search_movies('BIRD')
+
+        mock_search_movies.assert_called_once_with('bird')
+        self.assertEqual(comedies, [self.movies[0], self.movies[2]])
+        self.assertEqual(thrillers, [self.movies[1]])
+        self.assertEqual(documentaries, [])
+        self.assertEqual(all_movies, self.movies)
+
+
+@override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}})
+class TestSearchEntries(SimpleTestCase):
+    movies = [{'Title': 'Bird', 'Genre': ['Comedy']}]
+    new_movies = [{'Title': 'Bird 2', 'Genre': ['Comedy']}]
+
+    def setUp(self):
+        cache.clear()
+        # Background refresh is finished before assertions by shutting executor down
+        self.executor = ThreadPoolExecutor(max_workers=1)
+        patcher = patch('core.search._refresh_executor', self.executor)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def set_stale_entry(self):
+        entry = search.SearchEntry(SearchResult(self.movies))
+        entry.fresh_until = time.time() - 1
+        cache.set(search.search_cache_key('bird'), entry, entry.timeout)
+
+    def test_entry_is_pickled(self):
+        entry = search.SearchEntry(SearchResult(self.movies))
+        error_entry = search.SearchEntry(error='Too many results.')
+
+        restored, restored_error = pickle.loads(pickle.dumps([entry, error_entry]))
+
+        self.assertEqual(restored.result, entry.result)
+        self.assertEqual((restored.timeout, restored.fresh_until), (entry.timeout, entry.fresh_until))
+        with self.assertRaisesMessage(OmdbAPIError, 'Too many results.'):
+            restored_error.get_result()
+
+    def test_entry_of_other_format_version_is_missing(self):
+        data = pickle.dumps(search.SearchEntry(SearchResult(self.movies)))
+
+        with patch('core.search_result.FORMAT_VERSION', search_result.FORMAT_VERSION + 1):
+            self.assertIsNone(pickle.loads(data))
+
+    @patch('core.search.Omdb_API.search_movies')
+    def test_cached_result_of_other_format_version_is_searched_again(self, mock_search_movies):
+        mock_search_movies.return_value = self.new_movies
+        entry = search.SearchEntry(SearchResult(self.movies))
+        cache.set(search.search_cache_key('bird'), entry, entry.timeout)
+
+        with patch('core.search_result.FORMAT_VERSION', search_result.FORMAT_VERSION + 1):
+            movies = search.search_movies('bird', 'Comedy')
+            page, count = search.search_movies_page('bird', 'Comedy')
+            streamed = list(search.iter_movies('bird'))
+
+        mock_search_movies.assert_called_once_with('bird')
+        self.assertEqual(movies, self.new_movies)
+        self.assertEqual((page, count), (self.new_movies, 1))
+        self.assertEqual(streamed, self.new_movies)
+
+    @patch('core.omdb.Omdb_API._run_query')
+    def test_not_found_title_is_cached(self, mock_run_query):
+        mock_run_query.return_value = {'Response': 'False', 'Error': 'Movie not found!'}
+
+        movies_1 = search.search_movies('Brid')
+        movies_2 = search.search_movies('brid', 'Comedy')
+
+        mock_run_query.assert_called_once()
+        self.assertEqual(movies_1, [])
+        self.assertEqual(movies_2, [])
+        self.assertEqual(cache.get(search.search_cache_key('brid')).timeout, search.NOT_FOUND_CACHE_TIMEOUT)
+
+    @patch('core.omdb.Omdb_API._run_query')
+    def test_search_error_is_cached(self, mock_run_query):
+        mock_run_query.return_value = {'Response': 'False', 'Error': 'Too many results.'}
+
+        for _ in range(2):
+            with self.assertRaisesMessage(OmdbAPIError, 'Too many results.'):
+                search.search_movies('a')
+
+        mock_run_query.assert_called_once()
+        self.assertEqual(cache.get(search.search_cache_key('a')).timeout, search.SEARCH_ERROR_CACHE_TIMEOUT)
+
+    @patch('core.omdb.Omdb_API._run_query')
+    def test_connection_error_is_cached(self, mock_run_query):
+        mock_run_query.side_effect = OSError('timed out')
+
+        for _ in range(2):
+            with self.assertRaisesMessage(OmdbAPIError, 'timed out'):
+                search.search_movies('bird')
+
+        mock_run_query.assert_called_once()
+
+    @patch('core.search.Omdb_API.search_movies')
+    def test_stale_result_is_returned_and_refreshed_in_background(self, mock_search_movies):
+        mock_search_movies.return_value = self.new_movies
+        self.set_stale_entry()
+
+        movies = search.search_movies('bird')
+        search.search_movies('bird')
+        self.executor.shutdown()
+
+        self.assertEqual(movies, self.movies)
+        mock_search_movies.assert_called_once_with('bird')
+        entry = cache.get(search.search_cache_key('bird'))
+        self.assertEqual(entry.result.movies, self.new_movies)
+        self.assertFalse(entry.is_stale())
+
+    @patch('core.search.Omdb_API.search_movies')
+    def test_stale_result_is_kept_when_refresh_fails(self, mock_search_movies):
+        mock_search_movies.side_effect = OmdbAPIError('Request limit reached!')
+        self.set_stale_entry()
+
+        search.search_movies('bird')
+        self.executor.shutdown()
+        movies = search.search_movies('bird')
+
+        mock_search_movies.assert_called_once_with('bird')
+        self.assertEqual(movies, self.movies)
+
+    @patch('core.search.Omdb_API.search_movies')
+    def test_async_search_refreshes_stale_result(self, mock_search_movies):
+        mock_search_movies.return_value = self.new_movies
+        self.set_stale_entry()
+
+        movies = asyncio.run(search.async_search_movies('bird'))
+        self.executor.shutdown()
+
+        self.assertEqual(movies, self.movies)
+        self.assertEqual(cache.get(search.search_cache_key('bird')).result.movies, self.new_movies)
+
+
+@override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}})
+class TestSingleFlight(SimpleTestCase):
+    def setUp(self):
+        cache.clear()
+
+    def run_in_threads(self, target, count):
+        threads = [threading.Thread(target=target) for _ in range(count)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+    def test_concurrent_callers_compute_value_once(self):
+        compute = Mock(side_effect=lambda: time.sleep(0.1) or 'value')
+        results = []
+
+        self.run_in_threads(lambda: results.append(search.single_flight('key', compute, 60)), 8)
+
+        compute.assert_called_once_with()
+        self.assertEqual(results, ['value'] * 8)
+        self.assertEqual(cache.get('key'), 'value')
+
+    def test_error_is_raised_in_every_waiting_caller(self):
+        compute = Mock(side_effect=lambda: time.sleep(0.1) or 1 / 0)
+        errors = []
+
+        def call():
+            try:
+                search.single_flight('key', compute, 60)
+            except ZeroDivisionError as e:
+                errors.append(e)
+
+        self.run_in_threads(call, 4)
+
+        compute.assert_called_once_with()
+        self.assertEqual(len(errors), 4)
+        self.assertIsNone(cache.get('key'))
+        self.assertIsNone(cache.get('lock:key'))
+
+    def test_caller_waits_for_lock_held_by_other_process(self):
+        """Value computed by lock holder is returned instead of computing it again"""
+        compute = Mock(return_value='own value')
+        cache.add('lock:key', 'other process', 60)
+        results = []
+        thread = threading.Thread(target=lambda: results.append(search.single_flight('key', compute, 60)))
+
+        with patch('core.search.SEARCH_WAIT_INTERVAL', 0.01):
+            thread.start()
+            time.sleep(0.05)
+            cache.set('key', 'other process value')
+            cache.delete('lock:key')
+            thread.join()
+
+        compute.assert_not_called()
+        self.assertEqual(results, ['other process value'])
+
+    def test_caller_computes_value_when_lock_expires(self):
+        compute = Mock(return_value='own value')
+        cache.add('lock:key', 'other process', 60)
+
+        with patch('core.search.SEARCH_WAIT_INTERVAL', 0.01), patch('core.search.SEARCH_LOCK_TIMEOUT', 0.05):
+            result = search.single_flight('key', compute, 60)
+
+        compute.assert_called_once_with()
+        self.assertEqual(result, 'own value')
+
+    def test_async_concurrent_callers_compute_value_once(self):
+        calls = []
+
+        async def compute():
+            calls.append(1)
+            await asyncio.sleep(0.05)
+            return 'value'
+
+        async def call_many():
+            return await asyncio.gather(*(search.async_single_flight('key', compute, 60) for _ in range(8)))
+
+        results = asyncio.run(call_many())
+
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(results, ['value'] * 8)
+        self.assertEqual(cache.get('key'), 'value')
@@ -0,0 +1,53 @@
+import pickle
+
+from django.test import SimpleTestCase
+
+from core import search_result
+from core.search_result import SearchResult
+
+
+class TestSearchResult(SimpleTestCase):
+    movies = [{'Title': 'Bird', 'Year': '2001', 'imdbID': 'tt1', 'Genre': ['Comedy', 'Horror']},
+              {'Title': 'Snake', 'Year': '2002', 'imdbID': 'tt2', 'Genre': ['Thriller']},
+              {'Title': 'Cat', 'Year': '2003', 'imdbID': 'tt3', 'Genre': ['Comedy']}]
+
+    def test_genre_index(self):
+        index = search_result.genre_index(self.movies)
+
+        self.assertEqual(index, {'Comedy': [0, 2], 'Horror': [0], 'Thriller': [1]})
+
+    def test_pickle_round_trip(self):
+        result = pickle.loads(pickle.dumps(SearchResult(self.movies)))
+
+        self.assertEqual(result.movies, self.movies)
+        self.assertEqual(result.genres, {'Comedy': [0, 2], 'Horror': [0], 'Thriller': [1]})
+
+    def test_keys_are_stored_once(self):
+        data = SearchResult(self.movies).encode()
+
+        self.assertEqual(data[:2], bytes([search_result.FORMAT_VERSION, 0]))
+        self.assertEqual(data.count(b'imdbID'), 1)
+
+    def test_movies_with_other_keys(self):
+        movies = self.movies + [{'Title': 'Dog', 'imdbID': 'tt4', 'Genre': ['Drama'], 'Extra': None}]
+
+        result = search_result.decode(SearchResult(movies).encode())
+
+        self.assertEqual(result.movies, movies)
+
+    def test_big_result_is_compressed(self):
+        movies = [{**self.movies[0], 'imdbID': f'tt{number}'} for number in range(100)]
+
+        data = SearchResult(movies).encode()
+
+        self.assertEqual(data[1], 1)
+        self.assertLess(len(data), len(pickle.dumps(movies)) / 5)
+        self.assertEqual(search_result.decode(data).movies, movies)
+
+    def test_other_format_version_is_missing_result(self):
+        data = bytes([search_result.FORMAT_VERSION + 1]) + SearchResult(self.movies).encode()[1:]
+
+        self.assertIsNone(search_result.decode(data))
+
+    def test_empty_result(self):
+        self.assertEqual(search_result.decode(SearchResult([]).encode()).movies, [])
@@ -0,0 +1,170 @@
+from datetime import timedelta
+from unittest.mock import patch
+import threading
+import time
+
+from django.core.signals import request_started
+from django.test import TestCase, TransactionTestCase
+from django.utils import timezone
+
+from core import suggest
+from core.models import MovieDetail
+
+
+def movie(number, title, year='2000', movie_type='movie'):
+    return {'imdbID': f'tt{number:07d}', 'Title': title, 'Year': year, 'Type': movie_type}
+
+
+class TestTitleIndex(TestCase):
+    def setUp(self):
+        self.index = suggest.TitleIndex(max_titles=100, refresh_interval=60)
+        self.index.add([movie(1, 'The Birdcage'), movie(2, 'The Birds'), movie(3, 'Birdman', '2014'),
+                        movie(4, 'Amélie'), movie(5, 'Birds of Prey', '2020'), movie(6, 'Bird Box'),
+                        movie(7, 'Paradise Birds', '2010', 'series')])
+
+    def search(self, query, **kwargs):
+        return [suggestion['Title'] for suggestion in self.index.search(query, **kwargs)]
+
+    def test_search_by_prefix(self):
+        # Titles starting with the query are the first
+        self.assertEqual(self.search('bird'), ['Birdman', 'Bird Box', 'Birds of Prey', 'The Birds', 'The Birdcage',
+                                               'Paradise Birds'])
+        self.assertEqual(self.search('birds'), ['Birds of Prey', 'The Birds', 'Paradise Birds'])
+        self.assertEqual(self.search('cat'), [])
+        self.assertEqual(self.search(' - '), [])
+
+    def test_search_by_prefixes_of_many_words(self):
+        self.assertEqual(self.search('birds o'), ['Birds of Prey'])
+        self.assertEqual(self.search('par bir'), ['Paradise Birds'])
+        self.assertEqual(self.search('the bird'), ['The Birds', 'The Birdcage'])
+
+    def test_search_ignores_case_and_diacritics(self):
+        self.assertEqual(self.search('AME'), ['Amélie'])
+        self.assertEqual(self.search('amél'), ['Amélie'])
+
+    def test_suggestion(self):
+        self.assertEqual(self.index.search('paradise'), [
+            {'imdbID': 'tt0000007', 'Title': 'Paradise Birds', 'Year': '2010', 'Type': 'series'},
+        ])
+
+    def test_search_limit(self):
+        self.assertEqual(len(self.index.search('bird', limit=2)), 2)
+
+    def test_index_keeps_the_most_recent_titles(self):
+        index = suggest.TitleIndex(max_titles=3, refresh_interval=60)
+        index.add([movie(number, f'Movie {number}') for number in range(5)])
+        index.add([movie(2, 'Movie 2')])
+        index.add([movie(5, 'Movie 5')])
+
+        self.assertEqual(len(index), 3)
+        self.assertEqual([suggestion['imdbID'] for suggestion in index.search('movie')],
+                         ['tt0000002', 'tt0000004', 'tt0000005'])
+
+    @patch.object(suggest, 'MAX_PENDING_WORDS', 20)
+    def test_removed_words_are_compacted(self):
+        index = suggest.TitleIndex(max_titles=10, refresh_interval=60)
+        for number in range(100):
+            index.add([movie(number, f'Movie {number}')])
+
+        self.assertLessEqual(len(index._words), 2 * 2 * 10 + 20)
+        self.assertEqual(len(index.search('movie')), 10)
+
+    @patch.object(suggest, 'MAX_PENDING_WORDS', 5)
+    def test_pending_words_are_merged(self):
+        index = suggest.TitleIndex(max_titles=100, refresh_interval=60)
+        index.add([movie(1, 'Bird Box')])
+        self.assertEqual((index._words, len(index._pending_words)), ([], 2))
+        self.assertEqual(index.search('bird')[0]['Title'], 'Bird Box')
+
+        index.add([movie(2, 'The Birds'), movie(3, 'Birdman')])
+
+        self.assertEqual((len(index._words), index._pending_words), (5, []))
+        self.assertEqual(index._words, sorted(index._words))
+        self.assertEqual([suggestion['Title'] for suggestion in index.search('bird')],
+                         ['Birdman', 'Bird Box', 'The Birds'])
+
+    def test_changed_title(self):
+        self.index.add([movie(6, 'Bird Cage')])
+
+        self.assertEqual(self.search('box'), [])
+        self.assertEqual(self.search('cage'), ['Bird Cage'])
+
+    def test_refresh_reads_details_stored_since_last_refresh(self):
+        now = timezone.now()
+        MovieDetail.objects.store({'tt0000010': movie(10, 'Cat People')})
+        index = suggest.TitleIndex(max_titles=100, refresh_interval=60)
+
+        index.refresh()
+        MovieDetail.objects.create(imdb_id='tt0000011', data='{"imdbID": "tt0000011", "Title": "Cats"}',
+                                   fetched_at=now + timedelta(seconds=1))
+        index.refresh()
+
+        self.assertEqual([suggestion['imdbID'] for suggestion in index.search('cat')], ['tt0000011', 'tt0000010'])
+        with self.assertNumQueries(0):
+            index.refresh_if_due()
+            index.search('cat')
+
+    def test_suggest_refreshes_index_when_it_is_due(self):
+        MovieDetail.objects.store({'tt0000010': movie(10, 'Cat People')})
+
+        with patch.object(suggest, 'index', suggest.TitleIndex(max_titles=100, refresh_interval=0, background=False)):
+            self.assertEqual(suggest.suggest('cat')[0]['Title'], 'Cat People')
+            MovieDetail.objects.store({'tt0000011': movie(11, 'Cats')})
+            self.assertEqual(len(suggest.suggest('cat')), 2)
+
+    def test_forked_process_refreshes_index(self):
+        index = suggest.TitleIndex(max_titles=100, refresh_interval=60, background=False)
+        # Refresh of parent process was running while it was forked
+        index._refresh_lock.acquire()
+        index._refreshed_at = time.monotonic()
+
+        index.reset_after_fork()
+        with patch.object(index, '_refresh') as refresh:
+            index.refresh_if_due()
+
+        refresh.assert_called_once_with()
+
+    def test_refresh_starts_at_first_request(self):
+        request_started.connect(suggest.refresh_at_first_request)
+        self.addCleanup(request_started.disconnect, suggest.refresh_at_first_request)
+
+        with patch.object(suggest.index, 'refresh_if_due') as refresh_if_due:
+            request_started.send(sender=None)
+            request_started.send(sender=None)
+
+        refresh_if_due.assert_called_once_with()
+
+
+# Index is refreshed by other thread, which doesn't see data of test transaction
+class TestTitleIndexBackgroundRefresh(TransactionTestCase):
+    def test_search_does_not_wait_for_refresh(self):
+        MovieDetail.objects.store({'tt0000010': movie(10, 'Cat People')})
+        index = suggest.TitleIndex(max_titles=100, refresh_interval=60)
+        refresh = index._refresh
+        can_refresh, refreshed = threading.Event(), threading.Event()
+
+        def slow_refresh():
+            can_refresh.wait(5)
+            refresh()
+            refreshed.set()
+
+        with patch.object(index, '_refresh', slow_refresh):
+            index.refresh_if_due()
+            self.assertEqual(index.search('cat'), [])
+            self.assertIsNone(index.refresh_in_background())
+            can_refresh.set()
+            self.assertTrue(refreshed.wait(5))
+
+        self.assertEqual(index.search('cat')[0]['Title'], 'Cat People')
+
+    def test_failed_refresh_is_logged(self):
+        index = suggest.TitleIndex(max_titles=100, refresh_interval=60)
+
+        with patch.object(suggest.MovieDetail.objects, 'order_by', side_effect=suggest.DatabaseError('locked')), \
+                self.assertLogs('core.suggest', 'WARNING') as logs:
+            index.refresh_in_background().join(5)
+
+        self.assertIn('Failed to refresh title index', logs.output[0])
+        with patch.object(index, 'refresh_in_background') as refresh_in_background:
+            index.refresh_if_due()
+        refresh_in_background.assert_not_called()
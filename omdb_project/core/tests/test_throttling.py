@@ -0,0 +1,98 @@
+from unittest.mock import patch
+
+from django.core.cache import cache
+from django.test import SimpleTestCase, override_settings
+
+from core import throttling
+from core.throttling import CircuitBreaker, TokenBucket
+
+
+class TestTokenBucket(SimpleTestCase):
+    def setUp(self):
+        throttling.clear()
+        self.bucket = TokenBucket('bucket', rate=10, capacity=2)
+
+    @patch('core.throttling.time.time')
+    def test_reserve(self, mock_time):
+        mock_time.return_value = 1000.0
+
+        waits = [self.bucket.reserve(max_wait=1) for _ in range(4)]
+
+        self.assertEqual(waits[:2], [0, 0])
+        self.assertAlmostEqual(waits[2], 0.1)
+        self.assertAlmostEqual(waits[3], 0.2)
+
+    @patch('core.throttling.time.time')
+    def test_too_long_wait_does_not_take_token(self, mock_time):
+        mock_time.return_value = 1000.0
+        self.bucket.reserve(max_wait=1)
+        self.bucket.reserve(max_wait=1)
+
+        self.assertIsNone(self.bucket.reserve(max_wait=0.05))
+        self.assertAlmostEqual(self.bucket.reserve(max_wait=1), 0.1)
+
+    @patch('core.throttling.time.time')
+    def test_tokens_are_added_over_time(self, mock_time):
+        mock_time.return_value = 1000.0
+        for _ in range(3):
+            self.bucket.reserve(max_wait=1)
+
+        mock_time.return_value = 1001.0
+
+        self.assertEqual([self.bucket.reserve(max_wait=0) for _ in range(2)], [0, 0])
+        self.assertIsNone(self.bucket.reserve(max_wait=0))
+
+    def test_bucket_is_shared_by_instances_with_the_same_key(self):
+        TokenBucket('bucket', rate=10, capacity=1).reserve(max_wait=1)
+
+        self.assertGreater(TokenBucket('bucket', rate=10, capacity=1).reserve(max_wait=1), 0)
+
+
+@override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}})
+class TestCircuitBreaker(SimpleTestCase):
+    def setUp(self):
+        cache.clear()
+        throttling.clear()
+        self.circuit = CircuitBreaker('circuit', failure_threshold=3, recovery_timeout=60)
+
+    def test_circuit_opens_after_failures_in_row(self):
+        for _ in range(2):
+            self.circuit.record_failure()
+        self.assertFalse(self.circuit.is_open())
+
+        self.circuit.record_failure()
+
+        self.assertTrue(self.circuit.is_open())
+
+    def test_success_resets_failures(self):
+        for _ in range(2):
+            self.circuit.record_failure()
+        self.circuit.record_success()
+        self.circuit.record_failure()
+
+        self.assertFalse(self.circuit.is_open())
+
+    def test_one_failure_opens_circuit_again_after_recovery_timeout(self):
+        for _ in range(3):
+            self.circuit.record_failure()
+        cache.delete(self.circuit.open_key)
+
+        self.assertFalse(self.circuit.is_open())
+        self.circuit.record_failure()
+        self.assertTrue(self.circuit.is_open())
+
+    @patch('core.throttling.time.monotonic')
+    def test_closed_circuit_is_read_once_per_check_interval(self, mock_monotonic):
+        mock_monotonic.return_value = 1000.0
+        with patch.object(cache, 'get_many', wraps=cache.get_many) as get_many:
+            for _ in range(10):
+                self.assertFalse(self.circuit.is_open())
+                self.circuit.record_success()
+            # Circuit opened by other process
+            cache.set(self.circuit.open_key, True)
+            self.assertFalse(self.circuit.is_open())
+
+            mock_monotonic.return_value += throttling.CIRCUIT_CHECK_INTERVAL
+
+            self.assertTrue(self.circuit.is_open())
+            self.assertEqual(get_many.call_count, 2)
@@ -0,0 +1,77 @@
+from unittest.mock import patch
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.shortcuts import reverse
+from django.test import override_settings
+from rest_framework.test import APITestCase
+
+from core import timing
+from core.omdb import Omdb_API
+from core.tests.fake_omdb_server import FakeOmdbServer
+
+
+class TestRequestTiming(APITestCase):
+    def test_phase_outside_of_request_is_not_recorded(self):
+        with timing.phase('cache'):
+            pass
+
+        self.assertIsNone(timing.current())
+
+    def test_phases_are_summed(self):
+        with timing.record() as request_timing:
+            for name in ('cache', 'cache', 'db'):
+                with timing.phase(name):
+                    pass
+
+        self.assertEqual({name: count for name, (seconds, count) in request_timing.phases.items()},
+                         {'cache': 2, 'db': 1})
+        self.assertIsNotNone(request_timing.total)
+        self.assertRegex(request_timing.server_timing(),
+                         r'^cache;dur=\d+\.\d;desc="2", db;dur=\d+\.\d;desc="1", total;dur=\d+\.\d$')
+
+    def test_phases_of_omdb_threads_are_recorded(self):
+        api = Omdb_API()
+        with timing.record() as request_timing:
+            api._run_concurrently(lambda item: timing.current().add('omdb-details', 0.1), range(3))
+
+        self.assertEqual(request_timing.phases['omdb-details'][1], 3)
+
+
+# Tiered cache is used, so its reads are recorded, OMDb requests are sent by many threads
+@override_settings(REQUEST_TIMING=True,
+                   CACHES={'default': {'BACKEND': 'core.cache_backends.TieredCache', 'LOCATION': 'timing',
+                                       'OPTIONS': {'SHARED_CACHE': 'shared'}},
+                           'shared': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}},
+                   OMDB_THROTTLING_CACHE='shared')
+class TestRequestTimingMiddleware(APITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = get_user_model().objects.create(username='user1', password='password_1')
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_authenticate(self.user)
+        server = FakeOmdbServer(results=15).__enter__()
+        self.addCleanup(server.__exit__)
+        url_patcher = patch.object(Omdb_API, 'OMDB_URL', server.url)
+        url_patcher.start()
+        self.addCleanup(url_patcher.stop)
+
+    def test_search_phases_are_sent_and_logged(self):
+        with self.assertLogs('core.timing', 'INFO') as logs:
+            response = self.client.get(reverse('movie:movie-list'), {'title': 'bird', 'genre': 'Drama'})
+
+        phases = {metric.split(';')[0]: metric for metric in response['Server-Timing'].split(', ')}
+        self.assertTrue(phases['omdb-search'].endswith('desc="2"'))
+        self.assertTrue(phases['omdb-details'].endswith('desc="15"'))
+        for name in ('cache', 'db', 'filter', 'render', 'total'):
+            self.assertIn(name, phases)
+        self.assertIn('"path": "/api/movie/", "status": 200', logs.output[0])
+
+    @override_settings(REQUEST_TIMING=False)
+    def test_disabled(self):
+        response = self.client.get(reverse('movie:movie-list'), {'title': 'bird'})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn('Server-Timing', response)
@@ -0,0 +1,71 @@
+import json
+import socket
+import threading
+from urllib import parse
+
+from django.test import SimpleTestCase
+
+from core import transport
+from core.tests.fake_omdb_server import FakeOmdbServer
+
+
+class TestPooledTransport(SimpleTestCase):
+    def setUp(self):
+        self.server = FakeOmdbServer(results=20).__enter__()
+        self.addCleanup(self.server.__exit__)
+        self.transport = transport.PooledTransport(pool_size=2, timeout=5)
+        self.addCleanup(self.transport.close)
+
+    def test_connection_is_reused(self):
+        """Many requests sent one by one use one keep-alive connection"""
+        for page in (1, 2, 1):
+            body = self.transport.get(self.server.url + f's=bird&page={page}')
+
+        self.assertEqual(json.loads(body)['totalResults'], '20')
+        self.assertEqual(len(self.server.calls), 3)
+        self.assertEqual(self.server.connections, 1)
+
+    def test_gzip_response_is_decompressed(self):
+        body = self.transport.get(self.server.url + 'i=tt0000001')
+
+        self.assertEqual(json.loads(body)['imdbID'], 'tt0000001')
+
+    def test_connections_count_is_bounded(self):
+        def send_requests():
+            for _ in range(5):
+                self.transport.get(self.server.url + 'i=tt0000001')
+
+        threads = [threading.Thread(target=send_requests) for _ in range(6)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(len(self.server.calls), 30)
+        self.assertLessEqual(self.server.connections, 2)
+
+    def test_closed_connection_is_opened_again(self):
+        self.transport.get(self.server.url + 'i=tt0000001')
+        # Connection closed by server
+        for connection in self.transport._get_pool('http', parse.urlsplit(self.server.url).netloc).queue:
+            if connection.sock:
+                connection.sock.shutdown(socket.SHUT_RDWR)
+
+        body = self.transport.get(self.server.url + 'i=tt0000002')
+
+        self.assertEqual(json.loads(body)['imdbID'], 'tt0000002')
+        self.assertEqual(self.server.connections, 2)
+
+    def test_timed_out_request_is_not_sent_again(self):
+        self.transport.timeout = 0.2
+        self.transport.get(self.server.url + 'i=tt0000001')
+        self.server.httpd.latency = 1
+
+        with self.assertRaises(TimeoutError):
+            self.transport.get(self.server.url + 'i=tt0000002')
+
+        self.assertEqual(self.server.connections, 1)
+
+    def test_error_status(self):
+        with self.assertRaisesMessage(transport.TransportError, 'HTTP Error 404'):
+            self.transport.get(self.server.url.replace('/?', '/missing?') + 'i=tt0000001')
@@ -0,0 +1,110 @@
+"""
+Limits of requests sent to OMDb. Rate limit is kept in memory of each process, so it costs no cache requests,
+every process gets its share of the limit. Circuit state is kept in Django cache, so it's shared by all worker
+processes using the same cache. Cache keeping values in process memory (like TieredCache) must not be used.
+"""
+import threading
+import time
+
+from django.core.cache import caches
+
+# Closed circuit read from cache is used by process for this number of seconds, so circuit opened by other
+# process stops requests of this one after this time at most
+CIRCUIT_CHECK_INTERVAL = 1
+
+# Tokens and update time of buckets and closed circuits read from cache with read time, by their keys
+_buckets = {}
+_buckets_lock = threading.Lock()
+_closed_circuits = {}
+
+
+def clear():
+    """Forget state of rate limits and circuits kept in process memory"""
+    with _buckets_lock:
+        _buckets.clear()
+    _closed_circuits.clear()
+
+
+class TokenBucket:
+    """
+    Token bucket rate limiter. Bucket holds at most `capacity` tokens and gets `rate` new tokens per second,
+    every request takes one token. Requests above the limit reserve tokens in advance and wait for them,
+    so waiting requests are sent in order. Instances with the same key in one process share the bucket.
+    """
+
+    def __init__(self, key, rate, capacity):
+        self.key = key
+        self.rate = rate
+        self.capacity = capacity
+
+    def reserve(self, max_wait):
+        """
+        Take one token and return number of seconds to wait before it can be used.
+        Return None without taking the token when it would be available after more than max_wait seconds.
+        """
+        with _buckets_lock:
+            now = time.time()
+            tokens, updated_at = _buckets.get(self.key, (self.capacity, now))
+            tokens = min(self.capacity, tokens + (now - updated_at) * self.rate) - 1
+            wait = max(0, -tokens / self.rate)
+            if wait > max_wait:
+                return None
+            _buckets[self.key] = (tokens, now)
+            return wait
+
+
+class CircuitBreaker:
+    """
+    Circuit is opened after `failure_threshold` failures in a row and stays open for `recovery_timeout` seconds,
+    requests shouldn't be sent while it's open. After that one failure opens it again, one success closes it.
+    Closed circuit is read from cache at most every CIRCUIT_CHECK_INTERVAL seconds, cache is written only
+    after failures.
+    """
+
+    def __init__(self, key, failure_threshold, recovery_timeout, cache_alias='default'):
+        self.key = key
+        self.failure_threshold = failure_threshold
+        self.recovery_timeout = recovery_timeout
+        self.cache_alias = cache_alias
+
+    @property
+    def open_key(self):
+        return f'{self.key}:open'
+
+    @property
+    def failures_key(self):
+        return f'{self.key}:failures'
+
+    def is_open(self):
+        return self._state()[0]
+
+    def record_success(self):
+        is_open, failures = self._state()
+        if failures:
+            caches[self.cache_alias].delete(self.failures_key)
+            _closed_circuits.pop(self.key, None)
+
+    def record_failure(self):
+        cache = caches[self.cache_alias]
+        _closed_circuits.pop(self.key, None)
+        cache.add(self.failures_key, 0, None)
+        try:
+            failures = cache.incr(self.failures_key)
+        except ValueError:
+            # Counter was deleted by success recorded in the meantime
+            return
+        if failures >= self.failure_threshold:
+            cache.set(self.open_key, True, self.recovery_timeout)
+            cache.set(self.failures_key, self.failure_threshold - 1, None)
+
+    def _state(self):
+        """Return whether circuit is open and number of failures, closed circuit read recently isn't read again"""
+        now = time.monotonic()
+        closed = _closed_circuits.get(self.key)
+        if closed is not None and now - closed[1] < CIRCUIT_CHECK_INTERVAL:
+            return False, closed[0]
+        values = caches[self.cache_alias].get_many([self.open_key, self.failures_key])
+        is_open, failures = self.open_key in values, values.get(self.failures_key, 0)
+        if not is_open:
+            _closed_circuits[self.key] = (failures, now)
+        return is_open, failures
@@ -0,0 +1,95 @@
+"""
+Durations and counts of request phases, like cache lookups, OMDb requests and database queries.
+Code measures its phase by `with timing.phase(name)`, it's recorded in timing of the current request started
+by `record`. Outside of recorded request `phase` returns shared no-op context manager, so instrumented code
+has almost no overhead when timing is disabled. Timing is kept in context variable, threads running
+parts of request get it when they are started with copy of request context.
+"""
+from contextlib import contextmanager, nullcontext
+from contextvars import ContextVar
+import json
+import logging
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+_current = ContextVar('request_timing', default=None)
+_NO_PHASE = nullcontext()
+
+
+class RequestTiming:
+    """Total seconds and number of calls of every phase of request"""
+
+    def __init__(self):
+        self.phases = {}
+        self.total = None
+        self._lock = threading.Lock()
+
+    def add(self, name, seconds):
+        with self._lock:
+            phase = self.phases.setdefault(name, [0.0, 0])
+            phase[0] += seconds
+            phase[1] += 1
+
+    def server_timing(self):
+        """Return value of Server-Timing header, description of phase is number of its calls"""
+        metrics = [f'{name};dur={seconds * 1000:.1f};desc="{count}"' for name, (seconds, count) in self.phases.items()]
+        if self.total is not None:
+            metrics.append(f'total;dur={self.total * 1000:.1f}')
+        return ', '.join(metrics)
+
+    def as_dict(self):
+        return {
+            'total_ms': None if self.total is None else round(self.total * 1000, 1),
+            'phases': {name: {'ms': round(seconds * 1000, 1), 'count': count}
+                       for name, (seconds, count) in self.phases.items()},
+        }
+
+
+class _Phase:
+    __slots__ = ('timing', 'name', 'start')
+
+    def __init__(self, timing, name):
+        self.timing = timing
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+
+    def __exit__(self, *exc_info):
+        self.timing.add(self.name, time.perf_counter() - self.start)
+
+
+def current():
+    """Return RequestTiming of current request or None"""
+    return _current.get()
+
+
+def phase(name):
+    """Return context manager adding its duration to phase of current request"""
+    timing = _current.get()
+    return _NO_PHASE if timing is None else _Phase(timing, name)
+
+
+def time_query(execute, sql, params, many, context):
+    """Database execute wrapper recording queries as 'db' phase"""
+    with phase('db'):
+        return execute(sql, params, many, context)
+
+
+@contextmanager
+def record():
+    """Record phases of code run in this context as RequestTiming, its total is set at the end"""
+    timing = RequestTiming()
+    token = _current.set(timing)
+    start = time.perf_counter()
+    try:
+        yield timing
+    finally:
+        timing.total = time.perf_counter() - start
+        _current.reset(token)
+
+
+def log(request_timing, method, path, status):
+    """Log timing of request as JSON line"""
+    logger.info(json.dumps({'method': method, 'path': path, 'status': status, **request_timing.as_dict()}))
@@ -0,0 +1,210 @@
+"""HTTP transports used by Omdb_API to send requests"""
+from functools import lru_cache
+from http import client
+from urllib import parse
+import asyncio
+import gzip
+import queue
+import ssl
+import threading
+import weakref
+
+from django.conf import settings
+from django.utils.module_loading import import_string
+
+
+class TransportError(OSError):
+    """Request could not be sent or response status is not successful"""
+
+
+class PooledTransport:
+    """
+    Sends GET requests over persistent keep-alive connections. At most `pool_size` connections are opened
+    to each host, requests above that limit wait up to `timeout` seconds for a free connection.
+    Responses compressed with gzip are decompressed.
+    """
+
+    def __init__(self, pool_size=10, timeout=10):
+        self.pool_size = pool_size
+        self.timeout = timeout
+        self._pools = {}
+        self._pools_lock = threading.Lock()
+
+    def get(self, url):
+        """Return body of response for url"""
+        parts = parse.urlsplit(url)
+        path = parts.path or '/'
+        if parts.query:
+            path += '?' + parts.query
+        pool = self._get_pool(parts.scheme, parts.netloc)
+
+        try:
+            connection = pool.get(timeout=self.timeout)
+        except queue.Empty:
+            raise TransportError(f'No free connection to {parts.netloc} within {self.timeout} seconds')
+        try:
+            return self._request(connection, path)
+        finally:
+            pool.put(connection)
+
+    def close(self):
+        """Close all open connections"""
+        with self._pools_lock:
+            for pool in self._pools.values():
+                for connection in list(pool.queue):
+                    connection.close()
+
+    def _get_pool(self, scheme, netloc):
+        with self._pools_lock:
+            pool = self._pools.get((scheme, netloc))
+            if pool is None:
+                connection_class = client.HTTPSConnection if scheme == 'https' else client.HTTPConnection
+                pool = queue.LifoQueue()
+                # Connections are opened lazily, on first request sent by them
+                for _ in range(self.pool_size):
+                    pool.put(connection_class(netloc, timeout=self.timeout))
+                self._pools[(scheme, netloc)] = pool
+            return pool
+
+    def _request(self, connection, path):
+        reused = connection.sock is not None
+        try:
+            connection.request('GET', path, headers={'Accept-Encoding': 'gzip'})
+            response = connection.getresponse()
+            body = response.read()
+        except (client.RemoteDisconnected, ConnectionResetError, BrokenPipeError):
+            connection.close()
+            if not reused:
+                raise
+            # Server could close idle keep-alive connection, send request again through new one
+            return self._request(connection, path)
+        except (client.HTTPException, OSError):
+            # Request isn't sent again after timeout or other error, it would wait and use quota twice
+            connection.close()
+            raise
+
+        if response.will_close:
+            connection.close()
+        if response.status >= 400:
+            raise TransportError(f'HTTP Error {response.status}: {response.reason}')
+        if response.getheader('Content-Encoding') == 'gzip':
+            body = gzip.decompress(body)
+        return body
+
+
+class AsyncPooledTransport:
+    """
+    Asyncio version of PooledTransport. Connections can be used only by event loop which opened them,
+    so every running loop has its own pools.
+    """
+
+    def __init__(self, pool_size=10, timeout=10):
+        self.pool_size = pool_size
+        self.timeout = timeout
+        self._pools = weakref.WeakKeyDictionary()
+
+    async def get(self, url):
+        """Return body of response for url"""
+        parts = parse.urlsplit(url)
+        path = parts.path or '/'
+        if parts.query:
+            path += '?' + parts.query
+        semaphore, idle_connections = self._get_pool(parts.netloc)
+
+        try:
+            await asyncio.wait_for(semaphore.acquire(), self.timeout)
+        except asyncio.TimeoutError:
+            raise TransportError(f'No free connection to {parts.netloc} within {self.timeout} seconds')
+        try:
+            connection = idle_connections.pop() if idle_connections else None
+            body, connection = await asyncio.wait_for(self._request(connection, parts, path), self.timeout)
+            if connection is not None:
+                idle_connections.append(connection)
+            return body
+        except asyncio.TimeoutError:
+            raise TransportError(f'No response from {parts.netloc} within {self.timeout} seconds')
+        finally:
+            semaphore.release()
+
+    def _get_pool(self, netloc):
+        pools = self._pools.setdefault(asyncio.get_running_loop(), {})
+        if netloc not in pools:
+            pools[netloc] = (asyncio.Semaphore(self.pool_size), [])
+        return pools[netloc]
+
+    async def _request(self, connection, parts, path):
+        reused = connection is not None
+        if connection is None:
+            if parts.scheme == 'https':
+                port, ssl_context = parts.port or 443, ssl.create_default_context()
+            else:
+                port, ssl_context = parts.port or 80, None
+            connection = await asyncio.open_connection(parts.hostname, port, ssl=ssl_context)
+        reader, writer = connection
+        try:
+            writer.write(f'GET {path} HTTP/1.1\r\nHost: {parts.netloc}\r\nAccept-Encoding: gzip\r\n\r\n'.encode())
+            await writer.drain()
+            status, reason, headers = await self._read_head(reader)
+            body = await self._read_body(reader, headers)
+        except (OSError, EOFError, ValueError):
+            writer.close()
+            if not reused:
+                raise
+            # Server could close idle keep-alive connection, send request again through new one
+            return await self._request(None, parts, path)
+        except BaseException:
+            writer.close()
+            raise
+
+        if headers.get('connection', '').lower() == 'close':
+            writer.close()
+            connection = None
+        if status >= 400:
+            raise TransportError(f'HTTP Error {status}: {reason}')
+        if headers.get('content-encoding') == 'gzip':
+            body = gzip.decompress(body)
+        return body, connection
+
+    async def _read_head(self, reader):
+        head = await reader.readuntil(b'\r\n\r\n')
+        status_line, *header_lines = head.decode('latin-1').rstrip('\r\n').split('\r\n')
+        _, status, reason = (status_line.split(' ', 2) + [''])[:3]
+        headers = {}
+        for line in header_lines:
+            name, _, value = line.partition(':')
+            headers[name.strip().lower()] = value.strip()
+        return int(status), reason, headers
+
+    async def _read_body(self, reader, headers):
+        if headers.get('transfer-encoding', '').lower() == 'chunked':
+            chunks = []
+            while True:
+                size = int((await reader.readuntil(b'\r\n')).split(b';')[0], 16)
+                if size == 0:
+                    # Skip trailer headers
+                    while await reader.readuntil(b'\r\n') != b'\r\n':
+                        pass
+                    return b''.join(chunks)
+                chunks.append(await reader.readexactly(size))
+                await reader.readexactly(2)
+        if 'content-length' in headers:
+            return await reader.readexactly(int(headers['content-length']))
+        headers['connection'] = 'close'
+        return await reader.read()
+
+
+@lru_cache(maxsize=None)
+def get_transport(path):
+    """
+    Return transport shared by all Omdb_API instances, so connections are reused between requests.
+    :param path: Dotted path to transport class or None when every request should open new connection.
+    """
+    if path is None:
+        return None
+    return import_string(path)(pool_size=settings.OMDB_POOL_SIZE, timeout=settings.OMDB_REQUEST_TIMEOUT)
+
+
+@lru_cache(maxsize=None)
+def get_async_transport():
+    """Return asyncio transport shared by all AsyncOmdb_API instances"""
+    return AsyncPooledTransport(pool_size=settings.OMDB_POOL_SIZE, timeout=settings.OMDB_REQUEST_TIMEOUT)
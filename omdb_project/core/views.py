@@ -0,0 +1,8 @@
+from django.http import HttpResponse
+
+from core import metrics
+
+
+def metrics_view(request):
+    """Metrics of all processes in Prometheus text format"""
+    return HttpResponse(metrics.registry.exposition(), content_type=metrics.CONTENT_TYPE)
@@ -0,0 +1,107 @@
+"""
+ASGI middleware serving movie search without blocking worker thread. While search waits for OMDb
+the event loop handles other requests, so one ASGI worker can serve many slow searches at once.
+Requests other than GET of full movie list (paginated, streamed and with user data lists included)
+are passed to Django, WSGI deployments use MovieViewSet.list.
+"""
+from urllib import parse
+import json
+import time
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core import signals
+from django.urls import reverse
+from rest_framework import exceptions, status
+
+from core import metrics
+from core import search
+from core import timing
+from core.authentication import CachedTokenAuthentication
+
+
+class AsyncMovieSearchMiddleware:
+    authentication_class = CachedTokenAuthentication
+    # Parameters of lists served by MovieViewSet
+    django_params = {'page', 'page_size', 'stream', 'with_user_data'}
+
+    def __init__(self, app):
+        self.app = app
+        self.path = reverse('movie:movie-list')
+
+    async def __call__(self, scope, receive, send):
+        if not self.is_full_search(scope):
+            return await self.app(scope, receive, send)
+
+        start = time.perf_counter()
+        await sync_to_async(signals.request_started.send)(sender=self.__class__, scope=scope)
+        try:
+            if settings.REQUEST_TIMING:
+                status_code, data, headers = await self.timed_list(scope)
+            else:
+                status_code, data, headers = await self.list(scope)
+        finally:
+            await sync_to_async(signals.request_finished.send)(sender=self.__class__)
+
+        body = json.dumps(data).encode()
+        await send({
+            'type': 'http.response.start',
+            'status': status_code,
+            'headers': [(b'content-type', b'application/json'), (b'content-length', str(len(body)).encode()),
+                        *headers],
+        })
+        await send({'type': 'http.response.body', 'body': body})
+        # Counted like the same search handled by Django
+        metrics.REQUEST_DURATION.observe(time.perf_counter() - start, view='MovieViewSet', action='list',
+                                         status=status_code)
+
+    def is_full_search(self, scope):
+        if scope['type'] != 'http' or scope['method'] != 'GET' or scope['path'] != self.path:
+            return False
+        return not self.django_params & self.query_params(scope).keys()
+
+    def query_params(self, scope):
+        """Return the last value of every parameter like QueryDict.get, blank ones are kept like in QueryDict"""
+        return dict(parse.parse_qsl(scope['query_string'].decode(), keep_blank_values=True))
+
+    async def timed_list(self, scope):
+        """Return result of list with Server-Timing header, the same as RequestTimingMiddleware does"""
+        with timing.record() as request_timing:
+            status_code, data, headers = await self.list(scope)
+        timing.log(request_timing, scope['method'], scope['path'], status_code)
+        return status_code, data, [*headers, (b'server-timing', request_timing.server_timing().encode())]
+
+    async def list(self, scope):
+        """Return status, data and extra headers of response, the same as MovieViewSet.list"""
+        try:
+            await self.authenticate(scope)
+        except exceptions.APIException as e:
+            return status.HTTP_401_UNAUTHORIZED, {'detail': e.detail}, [(b'www-authenticate', b'Token')]
+
+        query_params = self.query_params(scope)
+        title = query_params.get('title')
+        genre = query_params.get('genre')
+        if not title:
+            return status.HTTP_400_BAD_REQUEST, "'title' parameter is required", []
+        try:
+            movie_list = await search.async_search_movies(title, genre)
+        except Exception as e:
+            return (status.HTTP_503_SERVICE_UNAVAILABLE,
+                    f'OMDB API does not work correctly. Original message: {e}', [])
+        return status.HTTP_200_OK, movie_list, []
+
+    async def authenticate(self, scope):
+        """Return user for token from Authorization header, raise the same exceptions as DRF does"""
+        headers = dict(scope['headers'])
+        auth = headers.get(b'authorization', b'').split()
+        if not auth or auth[0].lower() != b'token':
+            raise exceptions.NotAuthenticated()
+        if len(auth) != 2:
+            raise exceptions.AuthenticationFailed('Invalid token header.')
+        try:
+            key = auth[1].decode()
+        except UnicodeError:
+            raise exceptions.AuthenticationFailed(
+                'Invalid token header. Token string should not contain invalid characters.')
+        user, token = await sync_to_async(self.authentication_class().authenticate_credentials)(key)
+        return user
@@ -7,6 +7,7 @@ class IsUserOrReadOnly(permissions.BasePermission):
 
     def has_object_permission(self, request, view, obj):
         if request.method in ('DELETE', 'PUT', 'PATCH'):
-            return obj.user == request.user
+            # Compared by id, so user of record isn't loaded
+            return obj.user_id == request.user.pk
         else:
             return True
@@ -1,46 +1,69 @@
+from django.db import IntegrityError, transaction
 from rest_framework import serializers
+from rest_framework.settings import api_settings
 from rest_framework.validators import UniqueTogetherValidator
 
 from core import models
 
 
-class FavouriteMovieSerializer(serializers.ModelSerializer):
+class UniqueUserMovieMixin:
+    """
+    Saves row without UniqueTogetherValidator query, when user already has row of the movie unique constraint
+    of database fails and the same validation error is raised.
+    """
+    unique_error = UniqueTogetherValidator.message.format(field_names='user, movie_id')
+
+    def create(self, validated_data):
+        return self._save_unique(super().create, validated_data)
+
+    def update(self, instance, validated_data):
+        return self._save_unique(super().update, instance, validated_data)
+
+    def _save_unique(self, save, *args):
+        try:
+            with transaction.atomic():
+                return save(*args)
+        except IntegrityError:
+            raise serializers.ValidationError({api_settings.NON_FIELD_ERRORS_KEY: [self.unique_error]},
+                                              code='unique')
+
+
+class FavouriteMovieSerializer(UniqueUserMovieMixin, serializers.ModelSerializer):
     user = serializers.HiddenField(default=serializers.CurrentUserDefault())
 
     class Meta:
         model = models.FavouriteMovie
         fields = ['id', 'user', 'movie_id']
-        validators = [
-            UniqueTogetherValidator(
-                queryset=models.FavouriteMovie.objects.all(),
-                fields=['user', 'movie_id']
-            )
-        ]
+        # Checked by unique constraint of database in UniqueUserMovieMixin
+        validators = []
 
 
-class MovieToWatchSerializer(serializers.ModelSerializer):
+class MovieToWatchSerializer(UniqueUserMovieMixin, serializers.ModelSerializer):
     user = serializers.HiddenField(default=serializers.CurrentUserDefault())
 
     class Meta:
         model = models.MovieToWatch
         fields = ['id', 'user', 'movie_id']
-        validators = [
-            UniqueTogetherValidator(
-                queryset=models.MovieToWatch.objects.all(),
-                fields=['user', 'movie_id']
-            )
-        ]
+        # Checked by unique constraint of database in UniqueUserMovieMixin
+        validators = []
 
 
-class ReviewSerializer(serializers.ModelSerializer):
+class BulkMovieIdsSerializer(serializers.Serializer):
+    movie_ids = serializers.ListField(child=serializers.CharField(max_length=models.IMDB_ID_MAX_LENGTH),
+                                      allow_empty=False, max_length=1000)
+
+
+class ReviewSerializer(UniqueUserMovieMixin, serializers.ModelSerializer):
     user = serializers.PrimaryKeyRelatedField(read_only=True, default=serializers.CurrentUserDefault())
 
     class Meta:
         model = models.Review
         fields = ['id', 'user', 'movie_id', 'rating', 'review']
-        validators = [
-            UniqueTogetherValidator(
-                queryset=models.Review.objects.all(),
-                fields=['user', 'movie_id']
-            )
-        ]
+        # Checked by unique constraint of database in UniqueUserMovieMixin
+        validators = []
+
+
+class MovieRatingStatsSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = models.MovieRatingStats
+        fields = ['movie_id', 'count', 'average', 'histogram']
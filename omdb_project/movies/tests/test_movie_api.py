@@ -1,12 +1,18 @@
 from unittest.mock import patch
+import json
 
 from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
 from django.shortcuts import reverse
 
 from rest_framework.test import APITestCase
 from rest_framework import status
 
-from core.models import FavouriteMovie, MovieToWatch, Review
+from core import search
+from core import suggest
+from core.models import FavouriteMovie, MovieRatingStats, MovieToWatch, Review
+from movies.views import ReviewViewSet
 
 
 class TestFavouriteMovieViewSetAPI(APITestCase):
@@ -72,11 +78,70 @@ class TestFavouriteMovieViewSetAPI(APITestCase):
         response = self.client.get(url)
 
         self.assertEqual(response.status_code, status.HTTP_200_OK)
-        favourite_movie_ids_in_response = [elem['id'] for elem in response.data]
+        favourite_movie_ids_in_response = [elem['id'] for elem in response.data['results']]
         self.assertIn(fav_movie_2.id, favourite_movie_ids_in_response)
         self.assertIn(fav_movie_3.id, favourite_movie_ids_in_response)
         self.assertNotIn(fav_movie_1.id, favourite_movie_ids_in_response)
 
+    def test_list_pages_are_ordered_by_movie_id(self):
+        for movie_id in ('Id_3', 'Id_1', 'Id_2'):
+            FavouriteMovie.objects.create(user=self.user_1, movie_id=movie_id)
+        self.client.force_authenticate(self.user_1)
+
+        response_1 = self.client.get(reverse('movie:favouritemovie-list') + '?page_size=2')
+        response_2 = self.client.get(response_1.data['next'])
+
+        self.assertEqual([movie['movie_id'] for movie in response_1.data['results']], ['Id_1', 'Id_2'])
+        self.assertEqual([movie['movie_id'] for movie in response_2.data['results']], ['Id_3'])
+        self.assertIsNone(response_2.data['next'])
+
+    def test_bulk_add(self):
+        FavouriteMovie.objects.create(user=self.user_1, movie_id='Id_1')
+        FavouriteMovie.objects.create(user=self.user_2, movie_id='Id_2')
+        self.client.force_authenticate(self.user_1)
+
+        # Read of movies in the list and one INSERT
+        with self.assertNumQueries(2):
+            response = self.client.post(reverse('movie:favouritemovie-bulk-add'),
+                                        {'movie_ids': ['Id_1', 'Id_2', 'Id_3', 'Id_2']}, format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data, [
+            {'movie_id': 'Id_1', 'status': 'exists'},
+            {'movie_id': 'Id_2', 'status': 'added'},
+            {'movie_id': 'Id_3', 'status': 'added'},
+        ])
+        self.assertEqual(set(FavouriteMovie.objects.filter(user=self.user_1).values_list('movie_id', flat=True)),
+                         {'Id_1', 'Id_2', 'Id_3'})
+
+    def test_bulk_remove(self):
+        FavouriteMovie.objects.create(user=self.user_1, movie_id='Id_1')
+        FavouriteMovie.objects.create(user=self.user_1, movie_id='Id_2')
+        FavouriteMovie.objects.create(user=self.user_2, movie_id='Id_3')
+        self.client.force_authenticate(self.user_1)
+
+        # Read of movies in the list and one DELETE
+        with self.assertNumQueries(2):
+            response = self.client.post(reverse('movie:favouritemovie-bulk-remove'),
+                                        {'movie_ids': ['Id_1', 'Id_3']}, format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data, [
+            {'movie_id': 'Id_1', 'status': 'removed'},
+            {'movie_id': 'Id_3', 'status': 'missing'},
+        ])
+        self.assertEqual(list(FavouriteMovie.objects.values_list('movie_id', flat=True).order_by('movie_id')),
+                         ['Id_2', 'Id_3'])
+
+    def test_bulk_add_invalid_ids(self):
+        self.client.force_authenticate(self.user_1)
+        url = reverse('movie:favouritemovie-bulk-add')
+
+        for payload in ({}, {'movie_ids': []}, {'movie_ids': ['Id_1', 'x' * 100]}):
+            response = self.client.post(url, payload, format='json')
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertFalse(FavouriteMovie.objects.exists())
+
 
 class TestMovieToWatchViewSetAPI(APITestCase):
     @classmethod
@@ -141,11 +206,24 @@ class TestMovieToWatchViewSetAPI(APITestCase):
         response = self.client.get(url)
 
         self.assertEqual(response.status_code, status.HTTP_200_OK)
-        movie_to_watch_ids_in_response = [elem['id'] for elem in response.data]
+        movie_to_watch_ids_in_response = [elem['id'] for elem in response.data['results']]
         self.assertIn(movie_2.id, movie_to_watch_ids_in_response)
         self.assertIn(movie_3.id, movie_to_watch_ids_in_response)
         self.assertNotIn(movie_1.id, movie_to_watch_ids_in_response)
 
+    def test_bulk_add_and_remove(self):
+        MovieToWatch.objects.create(user=self.user_1, movie_id='Id_1')
+        self.client.force_authenticate(self.user_1)
+
+        add_response = self.client.post(reverse('movie:movietowatch-bulk-add'),
+                                        {'movie_ids': ['Id_1', 'Id_2']}, format='json')
+        remove_response = self.client.post(reverse('movie:movietowatch-bulk-remove'),
+                                           {'movie_ids': ['Id_1']}, format='json')
+
+        self.assertEqual([item['status'] for item in add_response.data], ['exists', 'added'])
+        self.assertEqual([item['status'] for item in remove_response.data], ['removed'])
+        self.assertEqual(list(MovieToWatch.objects.values_list('movie_id', flat=True)), ['Id_2'])
+
 
 class TestReviewViewSetAPI(APITestCase):
     @classmethod
@@ -221,6 +299,21 @@ class TestReviewViewSetAPI(APITestCase):
         self.assertEqual(Review.objects.get(id=response.data['id']).user, self.user_1)
         self.assertEqual(response.status_code, status.HTTP_201_CREATED)
 
+    def test_review_deleted_by_other_request_is_removed_from_stats_once(self):
+        review_1 = Review.objects.create(user=self.user_1, movie_id='Id_1', rating=3)
+        Review.objects.create(user=self.user_2, movie_id='Id_1', rating=5)
+        # Review was read by request and deleted by other one before it's deleted by this one
+        review = Review.objects.get(pk=review_1.pk)
+        Review.objects.get(pk=review_1.pk).delete()
+
+        self.client.force_authenticate(self.user_1)
+        with patch.object(ReviewViewSet, 'get_object', return_value=review):
+            response = self.client.delete(reverse('movie:review-detail', kwargs={'pk': review_1.pk}))
+
+        self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
+        stats = MovieRatingStats.objects.get(movie_id='Id_1')
+        self.assertEqual((stats.count, stats.rating_sum), (1, 5))
+
     def test_list_return_all_users_reviews(self):
         Review.objects.create(user=self.user_1, movie_id='Id_1', rating=3)
         Review.objects.create(user=self.user_1, movie_id='Id_2', rating=4)
@@ -232,7 +325,7 @@ class TestReviewViewSetAPI(APITestCase):
         response = self.client.get(url)
 
         self.assertEqual(response.status_code, status.HTTP_200_OK)
-        self.assertEqual(len(response.data), 3)
+        self.assertEqual(len(response.data['results']), 3)
 
     def test_filter_by_user(self):
         review_1 = Review.objects.create(user=self.user_1, movie_id='Id_1', rating=3)
@@ -244,12 +337,26 @@ class TestReviewViewSetAPI(APITestCase):
         response = self.client.get(url)
 
         self.assertEqual(response.status_code, status.HTTP_200_OK)
-        self.assertEqual(len(response.data), 1)
-        review_ids_in_response = [elem['id'] for elem in response.data]
+        self.assertEqual(len(response.data['results']), 1)
+        review_ids_in_response = [elem['id'] for elem in response.data['results']]
         self.assertIn(review_3.id, review_ids_in_response)
         self.assertNotIn(review_1.id, review_ids_in_response)
         self.assertNotIn(review_2.id, review_ids_in_response)
 
+    def test_list_pages(self):
+        reviews = [Review.objects.create(user=self.user_1, movie_id=f'Id_{number}', rating=3) for number in range(5)]
+        self.client.force_authenticate(self.user_1)
+
+        response_1 = self.client.get(reverse('movie:review-list') + '?page_size=3')
+        # Review created after first page was read doesn't move reviews between pages
+        Review.objects.create(user=self.user_2, movie_id='Id_0', rating=3)
+        response_2 = self.client.get(response_1.data['next'])
+
+        review_ids = [review.id for review in reviews]
+        self.assertEqual([review['id'] for review in response_1.data['results']], review_ids[:3])
+        self.assertEqual([review['id'] for review in response_2.data['results']][:2], review_ids[3:])
+        self.assertIsNotNone(response_2.data['previous'])
+
     def test_filter_by_movie_id(self):
         review_1 = Review.objects.create(user=self.user_1, movie_id='Id_1', rating=3)
         review_2 = Review.objects.create(user=self.user_2, movie_id='Id_1', rating=4)
@@ -260,18 +367,91 @@ class TestReviewViewSetAPI(APITestCase):
         response = self.client.get(url)
 
         self.assertEqual(response.status_code, status.HTTP_200_OK)
-        self.assertEqual(len(response.data), 2)
-        review_ids_in_response = [elem['id'] for elem in response.data]
+        self.assertEqual(len(response.data['results']), 2)
+        review_ids_in_response = [elem['id'] for elem in response.data['results']]
         self.assertIn(review_1.id, review_ids_in_response)
         self.assertIn(review_2.id, review_ids_in_response)
         self.assertNotIn(review_3.id, review_ids_in_response)
 
+    def test_import(self):
+        Review.objects.create(user=self.user_1, movie_id='Id_1', rating=2)
+        upload = SimpleUploadedFile('ratings.csv', b'\xef\xbb\xbfmovie_id,rating\nId_1,8\nId_2,11\nId_3,5\n')
+        self.client.force_authenticate(self.user_1)
+
+        response = self.client.post(reverse('movie:review-import-reviews'), {'file': upload})
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual((response.data['created'], response.data['updated'], response.data['invalid']), (1, 1, 1))
+        self.assertEqual(response.data['errors'][0]['row'], 2)
+        self.assertEqual(dict(Review.objects.filter(user=self.user_1).values_list('movie_id', 'rating')),
+                         {'Id_1': 8, 'Id_3': 5})
+
+    def test_import_requires_file_and_format(self):
+        self.client.force_authenticate(self.user_1)
+        url = reverse('movie:review-import-reviews')
+
+        response_1 = self.client.post(url, {})
+        response_2 = self.client.post(url, {'file': SimpleUploadedFile('ratings.txt', b''), 'format': 'xml'})
+
+        self.assertEqual(response_1.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(response_2.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class TestMovieRatingStatsViewSet(APITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user_1 = get_user_model().objects.create(username='user1', password='password_1')
+        cls.user_2 = get_user_model().objects.create(username='user2', password='password_2')
+
+    def test_stats_of_many_movies(self):
+        Review.objects.create(user=self.user_1, movie_id='Id_1', rating=3)
+        Review.objects.create(user=self.user_2, movie_id='Id_1', rating=8)
+        Review.objects.create(user=self.user_1, movie_id='Id_2', rating=10)
+        self.client.force_authenticate(self.user_1)
+
+        with self.assertNumQueries(1):
+            response = self.client.get(reverse('movie:rating-list') + '?movie_id=Id_1,Id_2,Id_3')
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual([(stats['movie_id'], stats['count'], stats['average']) for stats in response.data],
+                         [('Id_1', 2, 5.5), ('Id_2', 1, 10.0), ('Id_3', 0, None)])
+        self.assertEqual(response.data[0]['histogram'][8], 1)
+
+    def test_movie_id_required(self):
+        self.client.force_authenticate(self.user_1)
+
+        for query in ('', '?movie_id=', '?movie_id=' + ','.join(f'Id_{number}' for number in range(101))):
+            response = self.client.get(reverse('movie:rating-list') + query)
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
 
 class TestMovieViewSet(APITestCase):
     @classmethod
     def setUpTestData(cls):
         cls.user = get_user_model().objects.create(username='user1', password='password_1')
 
+    def setUp(self):
+        # Values kept in process memory aren't removed by rolling back test transaction
+        cache.clear()
+
+    @patch('core.search.Omdb_API.search_movies')
+    def test_suggest_titles_of_searched_movies(self, mock_search_movies):
+        mock_search_movies.return_value = [{'Title': 'Birdman', 'Year': '2014', 'imdbID': 'Id_1', 'Type': 'movie',
+                                            'Genre': ['Comedy']}]
+        index_patcher = patch.object(suggest, 'index', suggest.TitleIndex(100, 60, background=False))
+        index_patcher.start()
+        self.addCleanup(index_patcher.stop)
+        self.client.force_authenticate(self.user)
+
+        self.client.get(reverse('movie:movie-list') + '?title=bird')
+        response = self.client.get(reverse('movie:movie-suggest') + '?q=BIRDM')
+        mock_search_movies.assert_called_once_with('bird')
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data, [{'imdbID': 'Id_1', 'Title': 'Birdman', 'Year': '2014', 'Type': 'movie'}])
+        self.assertEqual(self.client.get(reverse('movie:movie-suggest') + '?q=cat').data, [])
+        self.assertEqual(self.client.get(reverse('movie:movie-suggest')).status_code, status.HTTP_400_BAD_REQUEST)
+
     def test_title_required(self):
         url = reverse('movie:movie-list')
         self.client.force_authenticate(self.user)
@@ -280,9 +460,10 @@ class TestMovieViewSet(APITestCase):
 
         self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
 
-    @patch('movies.views.Omdb_API.search_movies')
+    @patch('core.search.Omdb_API.search_movies')
     def test_search(self, mock_search_movies):
-        mock_search_movies.return_value = 'My value'
+        mock_search_movies.return_value = [{'Title': 'My value', 'Genre': ['Horror']},
+                                           {'Title': 'Other value', 'Genre': ['Drama']}]
 
         url = reverse('movie:movie-list') + '?title=bird&genre=Horror'
         self.client.force_authenticate(self.user)
@@ -290,5 +471,101 @@ class TestMovieViewSet(APITestCase):
         response = self.client.get(url)
 
         self.assertEqual(response.status_code, status.HTTP_200_OK)
-        mock_search_movies.assert_called_once_with(genre='Horror', title='bird')
-        self.assertIn('My value', response.data)
+        mock_search_movies.assert_called_once_with('bird')
+        self.assertEqual([{'Title': 'My value', 'Genre': ['Horror']}], response.data)
+
+    @patch('core.search.Omdb_API.search_movies')
+    def test_search_other_genre_uses_cached_result(self, mock_search_movies):
+        mock_search_movies.return_value = [{'Title': 'My value', 'Genre': ['Horror']},
+                                           {'Title': 'Other value', 'Genre': ['Drama']}]
+        self.client.force_authenticate(self.user)
+
+        self.client.get(reverse('movie:movie-list') + '?title=bird&genre=Horror')
+        response_1 = self.client.get(reverse('movie:movie-list') + '?title=Bird&genre=Drama')
+        response_2 = self.client.get(reverse('movie:movie-list') + '?title=bird')
+
+        mock_search_movies.assert_called_once_with('bird')
+        self.assertEqual([{'Title': 'Other value', 'Genre': ['Drama']}], response_1.data)
+        self.assertEqual(len(response_2.data), 2)
+
+    @patch('core.omdb.Omdb_API._run_query')
+    def test_search_not_found_title(self, mock_run_query):
+        mock_run_query.return_value = {'Response': 'False', 'Error': 'Movie not found!'}
+        self.client.force_authenticate(self.user)
+
+        response = self.client.get(reverse('movie:movie-list') + '?title=brid')
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data, [])
+
+    @patch('core.search.Omdb_API.search_movies')
+    def test_search_with_user_data(self, mock_search_movies):
+        mock_search_movies.return_value = [{'Title': f'Movie {number}', 'imdbID': f'Id_{number}', 'Genre': ['Drama']}
+                                           for number in range(20)]
+        other_user = get_user_model().objects.create(username='user2', password='password_2')
+        FavouriteMovie.objects.create(user=self.user, movie_id='Id_1')
+        FavouriteMovie.objects.create(user=other_user, movie_id='Id_2')
+        MovieToWatch.objects.create(user=self.user, movie_id='Id_2')
+        Review.objects.create(user=self.user, movie_id='Id_3', rating=6)
+        Review.objects.create(user=other_user, movie_id='Id_3', rating=9)
+        self.client.force_authenticate(self.user)
+        search.search_movies('bird')
+
+        with self.assertNumQueries(4):
+            response = self.client.get(reverse('movie:movie-list') + '?title=bird&with_user_data=1')
+
+        movies = {movie['imdbID']: movie for movie in response.data}
+        self.assertEqual(len(movies), 20)
+        self.assertEqual([movie_id for movie_id, movie in movies.items() if movie['is_favourite']], ['Id_1'])
+        self.assertEqual([movie_id for movie_id, movie in movies.items() if movie['in_to_watch']], ['Id_2'])
+        self.assertEqual((movies['Id_3']['user_rating'], movies['Id_3']['average_rating']), (6, 7.5))
+        self.assertEqual(movies['Id_3']['rating_count'], 2)
+        self.assertEqual((movies['Id_4']['user_rating'], movies['Id_4']['average_rating']), (None, None))
+        self.assertNotIn('is_favourite', search.search_movies('bird')[1])
+
+    @patch('core.search.Omdb_API.search_movies_page')
+    def test_search_page(self, mock_search_movies_page):
+        mock_search_movies_page.return_value = ([{'Title': 'My value', 'Genre': ['Horror']}], 21)
+        url = reverse('movie:movie-list') + '?title=bird&page=2&page_size=10'
+        self.client.force_authenticate(self.user)
+
+        response = self.client.get(url)
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        mock_search_movies_page.assert_called_once_with('bird', 10, 10)
+        self.assertEqual(response.data['count'], 21)
+        self.assertEqual(response.data['results'], [{'Title': 'My value', 'Genre': ['Horror']}])
+        self.assertIn('page=3', response.data['next'])
+        self.assertIn('page=1', response.data['previous'])
+
+    @patch('core.search.Omdb_API.search_movies')
+    def test_search_page_with_genre_uses_full_search(self, mock_search_movies):
+        mock_search_movies.return_value = [{'Title': f'Movie {number}', 'Genre': ['Horror']} for number in range(12)]
+        url = reverse('movie:movie-list') + '?title=bird&genre=Horror&page=2'
+        self.client.force_authenticate(self.user)
+
+        response = self.client.get(url)
+
+        self.assertEqual(response.data['count'], 12)
+        self.assertEqual([movie['Title'] for movie in response.data['results']], ['Movie 10', 'Movie 11'])
+        self.assertIsNone(response.data['next'])
+
+    def test_search_invalid_page(self):
+        self.client.force_authenticate(self.user)
+
+        for query in ('page=0', 'page=a', 'page_size=1000'):
+            response = self.client.get(reverse('movie:movie-list') + '?title=bird&' + query)
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    @patch('core.search.Omdb_API.iter_movies')
+    def test_search_stream(self, mock_iter_movies):
+        mock_iter_movies.return_value = iter([{'Title': 'My value', 'Genre': ['Horror']},
+                                              {'Title': 'Other value', 'Genre': ['Drama']}])
+        url = reverse('movie:movie-list') + '?title=bird&genre=Drama&stream=1'
+        self.client.force_authenticate(self.user)
+
+        response = self.client.get(url)
+
+        self.assertEqual(response['Content-Type'], 'application/x-ndjson')
+        lines = b''.join(response.streaming_content).decode().splitlines()
+        self.assertEqual([json.loads(line) for line in lines], [{'Title': 'Other value', 'Genre': ['Drama']}])
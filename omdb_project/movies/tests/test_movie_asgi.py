@@ -0,0 +1,113 @@
+from unittest.mock import patch
+import asyncio
+import json
+
+from asgiref.testing import ApplicationCommunicator
+from django.contrib.auth import get_user_model
+from django.core.asgi import get_asgi_application
+from django.core.cache import cache
+from django.test import Client, TransactionTestCase, override_settings
+from rest_framework.authtoken.models import Token
+
+from movies.asgi import AsyncMovieSearchMiddleware
+
+
+async def django_app(scope, receive, send):
+    await send({'type': 'http.response.start', 'status': 200, 'headers': []})
+    await send({'type': 'http.response.body', 'body': b'django'})
+
+
+@override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}})
+class TestAsyncMovieSearch(TransactionTestCase):
+    def setUp(self):
+        cache.clear()
+        user = get_user_model().objects.create(username='user1', password='password_1')
+        self.token = Token.objects.create(user=user)
+        self.application = AsyncMovieSearchMiddleware(django_app)
+
+    def get(self, path, query_string=b'', token=None):
+        headers = [(b'host', b'testserver'), (b'authorization', f'Token {token or self.token.key}'.encode())]
+        scope = {'type': 'http', 'method': 'GET', 'path': path, 'query_string': query_string, 'headers': headers}
+
+        async def communicate():
+            communicator = ApplicationCommunicator(self.application, scope)
+            await communicator.send_input({'type': 'http.request'})
+            start = await communicator.receive_output(5)
+            body = await communicator.receive_output(5)
+            self.headers = dict(start['headers'])
+            return start['status'], body['body']
+
+        return asyncio.run(communicate())
+
+    @patch('core.search.AsyncOmdb_API.search_movies')
+    def test_search(self, mock_search_movies):
+        async def search_movies(title):
+            return [{'Title': 'My value', 'Genre': ['Horror']}, {'Title': 'Other value', 'Genre': ['Drama']}]
+        mock_search_movies.side_effect = search_movies
+
+        status, body = self.get('/api/movie/', b'title=bird&genre=Horror')
+
+        self.assertEqual(status, 200)
+        self.assertEqual(json.loads(body), [{'Title': 'My value', 'Genre': ['Horror']}])
+        mock_search_movies.assert_called_once_with('bird')
+
+    @override_settings(REQUEST_TIMING=True)
+    @patch('core.search.AsyncOmdb_API.search_movies')
+    def test_search_timing(self, mock_search_movies):
+        async def search_movies(title):
+            return [{'Title': 'My value', 'Genre': ['Horror']}]
+        mock_search_movies.side_effect = search_movies
+
+        with self.assertLogs('core.timing', 'INFO'):
+            status, body = self.get('/api/movie/', b'title=bird&genre=Horror')
+
+        self.assertEqual(status, 200)
+        self.assertIn(b'filter;dur=', self.headers[b'server-timing'])
+        self.assertIn(b'total;dur=', self.headers[b'server-timing'])
+
+    def test_title_required(self):
+        status, body = self.get('/api/movie/')
+
+        self.assertEqual(status, 400)
+
+    def test_invalid_token(self):
+        status, body = self.get('/api/movie/', b'title=bird', token='wrong')
+
+        self.assertEqual(status, 401)
+        self.assertEqual(json.loads(body), {'detail': 'Invalid token.'})
+
+    @patch('core.search.AsyncOmdb_API.search_movies', side_effect=OSError('Connection refused'))
+    def test_omdb_error(self, mock_search_movies):
+        status, body = self.get('/api/movie/', b'title=bird')
+
+        self.assertEqual(status, 503)
+        self.assertIn('Connection refused', json.loads(body))
+
+    def test_other_requests_are_passed_to_django(self):
+        status, body = self.get('/api/movie/review/')
+
+        self.assertEqual(body, b'django')
+
+    @patch('core.search.Omdb_API.search_movies')
+    @patch('core.search.AsyncOmdb_API.search_movies')
+    def test_responses_are_the_same_as_responses_of_django(self, mock_async_search_movies, mock_search_movies):
+        async def search_movies(title):
+            return [{'Title': 'My value', 'Genre': ['Horror']}]
+        mock_async_search_movies.side_effect = search_movies
+        mock_search_movies.return_value = [{'Title': 'My value', 'Genre': ['Horror']}]
+        self.application = AsyncMovieSearchMiddleware(get_asgi_application())
+        client = Client(HTTP_AUTHORIZATION=f'Token {self.token.key}')
+
+        for query_string in ['title=bird', 'title=bird&page=', 'title=bird&page_size=', 'title=&genre=Horror',
+                             'genre=Horror', 'title=bird&genre=', 'title=&title=bird', 'title=bird&stream=']:
+            with self.subTest(query_string=query_string):
+                status, body = self.get('/api/movie/', query_string.encode())
+                response = client.get(f'/api/movie/?{query_string}')
+
+                self.assertEqual(status, response.status_code)
+                self.assertEqual(json.loads(body), response.json())
+
+    def test_paginated_search_is_passed_to_django(self):
+        status, body = self.get('/api/movie/', b'title=bird&page=2')
+
+        self.assertEqual(body, b'django')
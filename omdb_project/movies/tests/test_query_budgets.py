@@ -0,0 +1,89 @@
+from unittest.mock import patch
+
+from django.contrib.auth import get_user_model
+from django.shortcuts import reverse
+from rest_framework import status
+from rest_framework.test import APITestCase
+
+from core import suggest
+from core.models import FavouriteMovie, MovieDetail, MovieToWatch, Review
+from core.tests.query_budget import QueryBudgetMixin
+from movies import views
+
+
+class TestQueryBudgets(QueryBudgetMixin, APITestCase):
+    """Endpoints run the same number of queries for any number of rows, not more than their budget"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = get_user_model().objects.create(username='user1', password='password_1')
+        cls.other_user = get_user_model().objects.create(username='user2', password='password_2')
+
+    def setUp(self):
+        self.client.force_authenticate(self.user)
+
+    def add_rows(self, model, count, **fields):
+        def add():
+            model.objects.bulk_create(model(movie_id=f'tt{model.objects.count() + number}', **fields)
+                                      for number in range(count))
+        return add
+
+    def test_movie_lists(self):
+        for model, name in ((FavouriteMovie, 'favouritemovie'), (MovieToWatch, 'movietowatch')):
+            model.objects.create(user=self.user, movie_id='Id_1')
+
+            self.assertFixedQueryCount('get', reverse(f'movie:{name}-list'),
+                                       add_rows=self.add_rows(model, 20, user=self.user))
+            response, query_count = self.request_within_budget('post', reverse(f'movie:{name}-list'),
+                                                               {'movie_id': 'Id_2'})
+            self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+            response, query_count = self.request_within_budget('post', reverse(f'movie:{name}-list'),
+                                                               {'movie_id': 'Id_2'})
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+            self.request_within_budget('post', reverse(f'movie:{name}-bulk-add'),
+                                       {'movie_ids': [f'Id_{number}' for number in range(50)]}, format='json')
+            self.request_within_budget('post', reverse(f'movie:{name}-bulk-remove'),
+                                       {'movie_ids': [f'Id_{number}' for number in range(50)]}, format='json')
+            movie = model.objects.filter(user=self.user).first()
+            response, query_count = self.request_within_budget('delete',
+                                                               reverse(f'movie:{name}-detail', args=[movie.pk]))
+            self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
+
+    def test_reviews(self):
+        review = Review.objects.create(user=self.user, movie_id='Id_1', rating=5)
+        url = reverse('movie:review-detail', args=[review.pk])
+
+        self.assertFixedQueryCount('get', reverse('movie:review-list'),
+                                   add_rows=self.add_rows(Review, 20, user=self.other_user, rating=3))
+        self.assertFixedQueryCount('get', reverse('movie:review-list'), {'movie_id': 'Id_1'},
+                                   add_rows=self.add_rows(Review, 20, user=self.other_user, rating=3))
+        self.request_within_budget('get', url)
+        response, query_count = self.request_within_budget('post', reverse('movie:review-list'),
+                                                           {'movie_id': 'Id_2', 'rating': 3})
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.request_within_budget('put', url, {'movie_id': 'Id_3', 'rating': 7})
+        self.request_within_budget('patch', url, {'rating': 8})
+        response, query_count = self.request_within_budget('delete', url)
+        self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
+
+    def test_rating_stats(self):
+        self.assertFixedQueryCount('get', reverse('movie:rating-list'), {'movie_id': 'tt0,tt1,tt2'},
+                                   add_rows=self.add_rows(Review, 20, user=self.other_user, rating=3))
+
+    def test_suggest(self):
+        def add_details():
+            MovieDetail.objects.store({f'tt{number}': {'imdbID': f'tt{number}', 'Title': f'Movie {number}'}
+                                       for number in range(MovieDetail.objects.count(), 20)})
+
+        add_details()
+        index = suggest.TitleIndex(max_titles=100, refresh_interval=0, background=False)
+        with patch.object(suggest, 'index', index):
+            self.assertFixedQueryCount('get', reverse('movie:movie-suggest'), {'q': 'movie'}, add_rows=add_details)
+
+    def test_over_budget_request_is_logged(self):
+        with patch.dict(views.BaseListMovieViewSet.query_budgets, {'list': 0}), \
+                self.assertLogs('core.query_budget', 'WARNING') as logs:
+            self.client.get(reverse('movie:favouritemovie-list'))
+
+        self.assertIn('GET /api/movie/favourite/ (FavouriteMovieViewSet.list) ran 1 database queries, its budget is 0',
+                      logs.output[0])
@@ -10,6 +10,7 @@ router = DefaultRouter()
 router.register('to-watch', views.MovieToWatchViewSet)
 router.register('favourite', views.FavouriteMovieViewSet)
 router.register('review', views.ReviewViewSet)
+router.register('rating', views.MovieRatingStatsViewSet, basename='rating')
 router.register('', views.MovieViewSet, basename='movie')
 
 urlpatterns = [
@@ -1,33 +1,81 @@
-from functools import partial
+import io
+import json
 
-from django.core.cache import cache
+from django.db import transaction
+from django.http import StreamingHttpResponse
 
 from django_filters.rest_framework import DjangoFilterBackend
 from rest_framework import status
 from rest_framework import viewsets
 from rest_framework import mixins
+from rest_framework.decorators import action
 from rest_framework.permissions import IsAuthenticated
-from rest_framework.authentication import TokenAuthentication
+from rest_framework.parsers import MultiPartParser
 from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
 
 from core import models
+from core.authentication import CachedTokenAuthentication
+from core import pagination
 from movies import serializers
 from movies import permissions
 
-from core.omdb import Omdb_API
+from core import review_import
+from core import search
+from core import suggest
 
 
 class BaseListMovieViewSet(mixins.ListModelMixin,
                            mixins.CreateModelMixin,
                            mixins.DestroyModelMixin,
                            viewsets.GenericViewSet):
-    """The view with predefined features for movies list endpoints"""
-    authentication_classes = (TokenAuthentication,)
+    """
+    The view with predefined features for movies list endpoints.
+    'bulk-add' and 'bulk-remove' actions take list of 'movie_ids' and return status of every movie.
+    """
+    authentication_classes = (CachedTokenAuthentication,)
     permission_classes = (IsAuthenticated, permissions.IsUserOrReadOnly)
+    pagination_class = pagination.MovieListCursorPagination
+    # Maximum numbers of database queries, see core.query_budget
+    query_budgets = {'list': 2, 'create': 5, 'destroy': 3, 'bulk_add': 5, 'bulk_remove': 5}
 
     def get_queryset(self):
         return self.queryset.filter(user=self.request.user).order_by('movie_id')
 
+    def _bulk_movie_ids(self, request):
+        serializer = serializers.BulkMovieIdsSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        # Repeated ids are processed once
+        return list(dict.fromkeys(serializer.validated_data['movie_ids']))
+
+    def _existing_movie_ids(self, movie_ids):
+        return set(self.get_queryset().filter(movie_id__in=movie_ids).values_list('movie_id', flat=True))
+
+    # Existing rows are read before writes, not in one transaction with them. SQLite fails transaction which reads
+    # and then writes at once with "database is locked" while other connection writes.
+    @action(detail=False, methods=['post'], url_path='bulk-add')
+    def bulk_add(self, request):
+        """Add movies missing in the list by one INSERT, status of every movie is 'added' or 'exists'"""
+        movie_ids = self._bulk_movie_ids(request)
+        existing_ids = self._existing_movie_ids(movie_ids)
+        # Rows added in the meantime by other request are skipped by database
+        self.queryset.model.objects.bulk_create(
+            [self.queryset.model(user=request.user, movie_id=movie_id)
+             for movie_id in movie_ids if movie_id not in existing_ids],
+            ignore_conflicts=True)
+        return Response([{'movie_id': movie_id, 'status': 'exists' if movie_id in existing_ids else 'added'}
+                         for movie_id in movie_ids])
+
+    @action(detail=False, methods=['post'], url_path='bulk-remove')
+    def bulk_remove(self, request):
+        """Remove movies from the list by one DELETE, status of every movie is 'removed' or 'missing'"""
+        movie_ids = self._bulk_movie_ids(request)
+        existing_ids = self._existing_movie_ids(movie_ids)
+        if existing_ids:
+            self.get_queryset().filter(movie_id__in=existing_ids).delete()
+        return Response([{'movie_id': movie_id, 'status': 'removed' if movie_id in existing_ids else 'missing'}
+                         for movie_id in movie_ids])
+
 
 class FavouriteMovieViewSet(BaseListMovieViewSet):
     """The view for favourite movie model"""
@@ -42,13 +90,20 @@ class MovieToWatchViewSet(BaseListMovieViewSet):
 
 
 class ReviewViewSet(viewsets.ModelViewSet):
-    """The view for review model"""
+    """
+    The view for review model.
+    'import' action saves reviews of user from uploaded CSV or newline delimited JSON file.
+    """
     serializer_class = serializers.ReviewSerializer
     queryset = models.Review.objects.all()
-    authentication_classes = (TokenAuthentication,)
+    authentication_classes = (CachedTokenAuthentication,)
     permission_classes = (IsAuthenticated, permissions.IsUserOrReadOnly)
     filter_backends = [DjangoFilterBackend]
     filterset_fields = ['user', 'movie_id']
+    pagination_class = pagination.ReviewCursorPagination
+    # Saving review updates rating stats of its movie, they are created for the first review,
+    # updated and deleted review is claimed by write before its stored rating is read
+    query_budgets = {'list': 2, 'retrieve': 2, 'create': 8, 'update': 11, 'partial_update': 11, 'destroy': 7}
 
     def perform_create(self, serializer):
         """Ensure that saved user is authenticated user"""
@@ -58,26 +113,143 @@ class ReviewViewSet(viewsets.ModelViewSet):
         """Ensure that saved user is authenticated user"""
         serializer.save(user=self.request.user)
 
+    def perform_destroy(self, instance):
+        """Review deleted by other request after it was read here isn't removed from rating stats again"""
+        with transaction.atomic():
+            rating = models.claim_stored_rating(instance.pk)
+            if rating is None:
+                return
+            instance._stored_rating = rating
+            instance.delete()
+
+    @action(detail=False, methods=['post'], url_path='import', parser_classes=[MultiPartParser])
+    def import_reviews(self, request):
+        upload = request.data.get('file')
+        file_format = request.data.get('format') or review_import.format_of(getattr(upload, 'name', ''))
+        if not upload or file_format not in review_import.FORMATS:
+            return Response(f"'file' is required and 'format' has to be one of {', '.join(review_import.FORMATS)}",
+                            status=status.HTTP_400_BAD_REQUEST)
+        # Uploaded file is read in batches, big uploads are kept by Django in temporary file
+        file = io.TextIOWrapper(upload.file, encoding='utf-8-sig', newline='')
+        report = review_import.import_reviews(request.user, file, file_format)
+        return Response(report.as_dict())
+
+
+class MovieRatingStatsViewSet(viewsets.ViewSet):
+    """
+    View to display rating stats of many movies at once. Movies are passed as comma separated 'movie_id' parameter,
+    movies without reviews have zero count.
+    """
+    authentication_classes = (CachedTokenAuthentication,)
+    permission_classes = (IsAuthenticated,)
+    max_movies = 100
+    query_budgets = {'list': 2}
+
+    def list(self, request):
+        movie_ids = list(dict.fromkeys(filter(None, request.query_params.get('movie_id', '').split(','))))
+        if not 1 <= len(movie_ids) <= self.max_movies:
+            return Response(f"'movie_id' parameter with 1 to {self.max_movies} comma separated ids is required",
+                            status=status.HTTP_400_BAD_REQUEST)
+        stats = models.MovieRatingStats.objects.in_bulk(movie_ids)
+        stats_list = [stats.get(movie_id, models.MovieRatingStats(movie_id=movie_id)) for movie_id in movie_ids]
+        return Response(serializers.MovieRatingStatsSerializer(stats_list, many=True).data)
+
 
 class MovieViewSet(viewsets.ViewSet):
     """
     View to display a list of movies from omdb. Provides the option of filtering the title and genre.
     Title is required.
+    Optional 'page' and 'page_size' parameters return one page of results, 'stream=1' returns
+    movies as newline delimited JSON sent while they are fetched.
+    'with_user_data=1' adds to every movie of list or page whether it's in user lists, user rating
+    and community rating.
+    'suggest' returns titles of already seen movies starting with 'q' without searching OMDb.
     """
-    authentication_classes = (TokenAuthentication,)
+    authentication_classes = (CachedTokenAuthentication,)
     permission_classes = (IsAuthenticated,)
+    # Queries of search depend on state of cache and stored movie details, so list has no query budget.
+    # Suggestions run token authentication and refresh of title index from stored details, when index isn't
+    # refreshed in background.
+    query_budgets = {'suggest': 2}
+    page_size = 10
+    max_page_size = 100
 
     def list(self, request):
-        api = Omdb_API()
         title = request.query_params.get('title')
         genre = request.query_params.get('genre')
         if not title:
             return Response("'title' parameter is required", status=status.HTTP_400_BAD_REQUEST)
+        if request.query_params.get('stream'):
+            return StreamingHttpResponse(self._stream(title, genre), content_type='application/x-ndjson')
+        if 'page' in request.query_params or 'page_size' in request.query_params:
+            return self._list_page(request, title, genre)
         try:
-            movie_list = cache.get_or_set(f'{title},{genre}',
-                                          partial(api.search_movies, title=title, genre=genre),
-                                          timeout=60 * 60)
+            movie_list = search.search_movies(title, genre)
         except Exception as e:
             return Response(f'OMDB API does not work correctly. Original message: {e}',
                             status=status.HTTP_503_SERVICE_UNAVAILABLE)
+        if request.query_params.get('with_user_data'):
+            movie_list = self._add_user_data(movie_list, request.user)
         return Response(movie_list)
+
+    @action(detail=False)
+    def suggest(self, request):
+        query = request.query_params.get('q', '')
+        if not query.strip():
+            return Response("'q' parameter is required", status=status.HTTP_400_BAD_REQUEST)
+        return Response(suggest.suggest(query))
+
+    def _list_page(self, request, title, genre):
+        try:
+            page = int(request.query_params.get('page', 1))
+            page_size = int(request.query_params.get('page_size', self.page_size))
+        except ValueError:
+            page = page_size = 0
+        if page < 1 or not 1 <= page_size <= self.max_page_size:
+            return Response(f"'page' has to be positive and 'page_size' between 1 and {self.max_page_size}",
+                            status=status.HTTP_400_BAD_REQUEST)
+        try:
+            movie_list, count = search.search_movies_page(title, genre, (page - 1) * page_size, page_size)
+        except Exception as e:
+            return Response(f'OMDB API does not work correctly. Original message: {e}',
+                            status=status.HTTP_503_SERVICE_UNAVAILABLE)
+
+        if request.query_params.get('with_user_data'):
+            movie_list = self._add_user_data(movie_list, request.user)
+        url = request.build_absolute_uri()
+        return Response({
+            'count': count,
+            'next': replace_query_param(url, 'page', page + 1) if page * page_size < count else None,
+            'previous': replace_query_param(url, 'page', page - 1) if page > 1 else None,
+            'results': movie_list,
+        })
+
+    def _add_user_data(self, movies, user):
+        """
+        Return copies of movies with user lists flags, user rating and community rating. Data of all movies
+        is read by one query per table. Movies aren't modified, they can be shared by cache.
+        """
+        movie_ids = {movie['imdbID'] for movie in movies}
+        favourite_ids = set(models.FavouriteMovie.objects.filter(user=user, movie_id__in=movie_ids)
+                            .values_list('movie_id', flat=True))
+        to_watch_ids = set(models.MovieToWatch.objects.filter(user=user, movie_id__in=movie_ids)
+                           .values_list('movie_id', flat=True))
+        user_ratings = dict(models.Review.objects.filter(user=user, movie_id__in=movie_ids)
+                            .values_list('movie_id', 'rating'))
+        stats = models.MovieRatingStats.objects.in_bulk(movie_ids)
+        empty_stats = models.MovieRatingStats()
+        return [{
+            **movie,
+            'is_favourite': movie['imdbID'] in favourite_ids,
+            'in_to_watch': movie['imdbID'] in to_watch_ids,
+            'user_rating': user_ratings.get(movie['imdbID']),
+            'average_rating': stats.get(movie['imdbID'], empty_stats).average,
+            'rating_count': stats.get(movie['imdbID'], empty_stats).count,
+        } for movie in movies]
+
+    def _stream(self, title, genre):
+        try:
+            for movie in search.iter_movies(title, genre):
+                yield json.dumps(movie) + '\n'
+        except Exception as e:
+            yield json.dumps({'error': f'OMDB API does not work correctly. Original message: {e}'}) + '\n'
@@ -10,7 +10,16 @@ https://docs.djangoproject.com/en/3.0/howto/deployment/asgi/
 import os
 
 from django.core.asgi import get_asgi_application
+from django.core.signals import request_started
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'omdb_project.settings')
 
-application = get_asgi_application()
+django_application = get_asgi_application()
+
+from core import suggest  # noqa: E402 Django has to be set up first
+from movies.asgi import AsyncMovieSearchMiddleware  # noqa: E402
+
+# Every process starts reading titles at its first request, so they are read before the first suggestion request
+request_started.connect(suggest.refresh_at_first_request)
+
+application = AsyncMovieSearchMiddleware(django_application)
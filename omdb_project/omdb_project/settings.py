@@ -44,6 +44,8 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'core.middleware.RequestTimingMiddleware',
+    'core.middleware.MetricsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -119,12 +121,81 @@ USE_TZ = True
 
 STATIC_URL = '/static/'
 
+# Lists not using other pagination are split into pages
+REST_FRAMEWORK = {
+    'DEFAULT_PAGINATION_CLASS': 'core.pagination.DefaultPagination',
+    'PAGE_SIZE': 50,
+}
+
+# Send durations of request phases (cache, OMDb requests, database queries, rendering) in Server-Timing
+# header and log them by 'core.timing' logger
+REQUEST_TIMING = False
+
+# Directory where every worker process writes its metrics, so /metrics returns sum of all processes.
+# It should be emptied before the service is started, None keeps metrics of each process separately.
+METRICS_DIR = os.environ.get('METRICS_DIR')
+METRICS_WRITE_INTERVAL = 1
+
+# Log warning when request runs more database queries than `query_budgets` of its view allow
+QUERY_BUDGET_WARNINGS = True
+
+# Number of tokens kept with their users in memory of each process and seconds after which they are read again
+TOKEN_CACHE_MAX_ENTRIES = 1000
+TOKEN_CACHE_TIMEOUT = 60
+
 # Environment variable is alternative
 OMDB_API_KEY = "WRITE YOUR API KEY HERE"
 
+# Maximum number of parallel requests sent to OMDb while handling one search
+OMDB_MAX_CONCURRENCY = 10
+
+# Seconds to wait for single OMDb response
+OMDB_REQUEST_TIMEOUT = 10
+
+# Dotted path to class sending requests to OMDb, None opens new connection for every request
+OMDB_TRANSPORT = 'core.transport.PooledTransport'
+
+# Maximum number of keep-alive connections to OMDb kept by each process
+OMDB_POOL_SIZE = 20
+
+# Seconds after which stored movie details are fetched from OMDb again
+OMDB_DETAILS_TTL = 60 * 60 * 24 * 7
+
+# Number of titles kept in memory of each process for suggestions and seconds after which titles of movie details
+# stored by other processes are read
+SUGGEST_MAX_TITLES = 50000
+SUGGEST_REFRESH_INTERVAL = 60
+
+# Search movies in local catalogue imported by import_catalogue command, OMDb is searched only for titles missing in it
+OMDB_LOCAL_CATALOGUE = False
+
+# Recently used values are kept in process memory, in front of cache shared by all processes
 CACHES = {
     'default': {
+        'BACKEND': 'core.cache_backends.TieredCache',
+        'OPTIONS': {
+            'SHARED_CACHE': 'shared',
+            'LOCAL_MAX_ENTRIES': 500,
+            'LOCAL_TIMEOUT': 60,
+        },
+    },
+    'shared': {
         'BACKEND': 'django.core.cache.backends.db.DatabaseCache',
         'LOCATION': 'my_cache_table',
-    }
+    },
 }
+
+# Requests per second sent to OMDb by all processes and maximum burst of requests, None disables the limit.
+# Limit is kept in memory of each process, every one of OMDB_RATE_LIMIT_PROCESSES worker processes sends
+# at most its part of requests. Burst is greater than number of requests of most searches of all genres.
+OMDB_RATE_LIMIT = 100
+OMDB_RATE_LIMIT_BURST = 1000
+OMDB_RATE_LIMIT_PROCESSES = 1
+
+# After this number of failed OMDb requests in a row no requests are sent for recovery timeout seconds,
+# None disables the circuit breaker
+OMDB_CIRCUIT_FAILURE_THRESHOLD = 5
+OMDB_CIRCUIT_RECOVERY_TIMEOUT = 30
+
+# Cache keeping circuit state shared by processes, it mustn't keep values in process memory
+OMDB_THROTTLING_CACHE = 'shared'
@@ -9,8 +9,14 @@ https://docs.djangoproject.com/en/3.0/howto/deployment/wsgi/
 
 import os
 
+from django.core.signals import request_started
 from django.core.wsgi import get_wsgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'omdb_project.settings')
 
 application = get_wsgi_application()
+
+from core import suggest  # noqa: E402 Django has to be set up first
+
+# Every process starts reading titles at its first request, so they are read before the first suggestion request
+request_started.connect(suggest.refresh_at_first_request)
@@ -4,11 +4,13 @@ from django.shortcuts import reverse
 from rest_framework.test import APITestCase
 from rest_framework import status
 
+from core.tests.query_budget import QueryBudgetMixin
+
 CREATE_LIST_USER_URL = reverse('user:create-list-user')
 TOKEN_URL = reverse('user:token')
 
 
-class PublicUserApiTests(APITestCase):
+class PublicUserApiTests(QueryBudgetMixin, APITestCase):
     """Test the user API (public)"""
 
     def test_create_valid_user_success(self):
@@ -26,6 +28,17 @@ class PublicUserApiTests(APITestCase):
         self.assertTrue(user.check_password(payload['password']))
         self.assertNotIn('password', res.data)
 
+    def test_list_users_pages(self):
+        """Test users are listed in pages"""
+        for number in range(3):
+            get_user_model().objects.create_user(username=f'user{number}', password='test_password')
+
+        res = self.client.get(CREATE_LIST_USER_URL, {'page': 2, 'page_size': 2})
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data['count'], 3)
+        self.assertEqual([user['username'] for user in res.data['results']], ['user2'])
+
     def test_user_exists(self):
         """"Test creating a user that already exists"""
         payload = {
@@ -88,3 +101,15 @@ class PublicUserApiTests(APITestCase):
 
         self.assertNotIn('token', res.data)
         self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_query_budgets(self):
+        """Test that user endpoints don't run more queries than their budgets allow"""
+        def add_users():
+            for number in range(10):
+                get_user_model().objects.create(username=f'user{number}')
+
+        get_user_model().objects.create(username='first_user')
+        self.assertFixedQueryCount('get', CREATE_LIST_USER_URL, add_rows=add_users)
+        self.request_within_budget('post', CREATE_LIST_USER_URL,
+                                   {'username': 'test_name', 'email': 'test@website.com', 'password': 'test_pass'})
+        self.request_within_budget('post', TOKEN_URL, {'username': 'test_name', 'password': 'test_pass'})
@@ -4,15 +4,20 @@ from rest_framework import generics
 from rest_framework.authtoken.views import ObtainAuthToken
 from rest_framework.settings import api_settings
 
+from core.authentication import CachedTokenAuthentication
 from user.serializers import UserSerializer
 
 
 class CreateUserView(generics.ListCreateAPIView):
     """The view for creating and listing users"""
+    authentication_classes = (CachedTokenAuthentication,)
     serializer_class = UserSerializer
-    queryset = get_user_model().objects.all()
+    queryset = get_user_model().objects.order_by('id')
+    query_budgets = {'get': 3, 'post': 3}
 
 
 class CreateTokenView(ObtainAuthToken):
     """Handle creating user authentication tokens"""
     renderer_classes = api_settings.DEFAULT_RENDERER_CLASSES
+    # Token is created by the first request
+    query_budgets = {'post': 5}